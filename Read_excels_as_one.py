@@ -1,23 +1,57 @@
 from __future__ import annotations
 
+import argparse
 import logging
-from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 import pandas as pd
 
+import utils.daemon as daemon
 import utils.read_data as read_data
+import utils.scanner as scanner
+from utils.accumulator import SheetAccumulator
+from utils.checkpoint import Checkpoint, fingerprint
+from utils.content_index import ContentIndex
+from utils.cube import update_industry_cube, write_firefighter_cube
 from utils.data_cleaners import clean_chems, clean_equipment
+from utils.events import EventBus, LogProgress, track
+from utils.failures import ErrorReport
+from utils.history import RunHistory
 from utils.firefighter_analysis import analyze_ff_survey_files
 from utils.industry_analysis import analyze_grouped
+from utils.names import NameNormalizer
 from utils.output_excel import output_as
-from utils.patterns import merge_sheets_by_group
+from utils.ranking import HazmatRanking
+from utils.patterns import MERGE_REQUIRED_KEYS, merge_sheets_by_group
+from utils.planner import plan_workload, print_plan
+from utils.preflight import CheckResult, preflight, print_table
+from utils.parquet_export import export_parquet
+from utils.schedule import CostModel
+from utils.spatial import write_site_inventory
+from utils.store import SurveyStore
+from utils.workers import ParsePool
+from utils.templates import TemplatePlans
+from utils.watch import Watcher
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
 # -------------------- 通用工具 --------------------
 exclude_files = ("Output", "Distribution_by_city", "test_output")
+# 這些模式的輸出不經 merge_sheets_by_group 合併
+NO_MERGE_PATTERNS = (
+    "top_ten_operating_chemicals",
+    "sort_by_location",
+    "industry_rescue_equipment",
+)
+# 各模式的讀檔階段（歷史耗時依此查詢）
+PATTERN_STAGES = {
+    "top_ten_operating_chemicals": "chems:process_folder_tree",
+    "industry_rescue_equipment": "equipment:process_folder_tree",
+    "firefighter_rescue_survey": "firefighter:process_folder_tree",
+    "苗栗縣": "firefighter:process_folder_tree",
+}
 
 
 def ensure_dir(p: Path) -> None:
@@ -27,16 +61,242 @@ def ensure_dir(p: Path) -> None:
 def list_subfolders(
     root: Path, exclude=exclude_files, specify_folders: Optional[list[str]] = None
 ) -> list[Path]:
-    excl = set(exclude)
+    folders = [Path(e.path) for e in scanner.list_dirs(root, exclude)]
     if specify_folders:
-        return [
-            p
-            for p in root.iterdir()
-            if p.is_dir()
-            and p.name not in excl
-            and any(i in p.name for i in specify_folders)
-        ]
-    return [p for p in root.iterdir() if p.is_dir() and p.name not in excl]
+        return [p for p in folders if any(i in p.name for i in specify_folders)]
+    return folders
+
+
+def shared_options(options: Optional[dict]) -> dict:
+    """
+    Returns a copy of options holding the objects shared by every stage of a run:
+    an ErrorReport for the failure policy, the TemplatePlans (saved to
+    "template_cache" when given), a ContentIndex when {"dedup": True}, a
+    SurveyStore when "store" is given as a database path, a ParsePool when
+    "parse_workers" is above 1 (or "auto", sized from CPUs and memory on first use),
+    a NameNormalizer when "name_dictionary" is given, and the EventBus receiving
+    the run's progress events.
+    """
+    options = dict(options or {})
+    if options.get("events") is None:
+        options["events"] = EventBus()
+    if options.get("error_report") is None:
+        options["error_report"] = ErrorReport(options.get("failure_policy", "skip"))
+    if options.get("template_plans") is None:
+        options["template_plans"] = TemplatePlans(options.get("template_cache"))
+    if options.get("dedup") and options.get("content_index") is None:
+        options["content_index"] = ContentIndex(
+            skip_duplicates=options.get("skip_duplicates", False)
+        )
+    if isinstance(options.get("store"), (str, Path)):
+        options["store"] = SurveyStore(options["store"])
+    if options.get("name_dictionary") and options.get("name_normalizer") is None:
+        options["name_normalizer"] = NameNormalizer(options["name_dictionary"])
+    workers = options.get("parse_workers", 1)
+    if (workers == "auto" or workers > 1) and options.get("parse_pool") is None:
+        options["parse_pool"] = ParsePool(options["parse_workers"])
+    return options
+
+
+def resolve_dir(path: Path) -> Path:
+    """Resolves a directory the way read_data.get_path does."""
+    return Path(read_data.read_data({"path_data": str(path)}).get_path())
+
+
+def with_checkpoint(options: dict, output_path: Path) -> dict:
+    """
+    Adds a Checkpoint logging to output_path/checkpoint.jsonl unless one is given.
+    With {"resume": True} finished units of the previous run are skipped.
+    """
+    if options.get("checkpoint") is None:
+        options["checkpoint"] = Checkpoint(
+            Path(output_path) / "checkpoint.jsonl", resume=options.get("resume", False)
+        )
+    return options
+
+
+def with_history(options: dict, output_path: Path) -> dict:
+    """Adds a RunHistory logging stage timings to output_path/run_history.jsonl unless one is given."""
+    if options.get("history") is None:
+        options["history"] = RunHistory(Path(output_path) / "run_history.jsonl")
+    return options
+
+
+def with_ranking(options: dict, output_path: Path) -> dict:
+    """
+    Adds a HazmatRanking of the top {"ranking": K} entries, kept in
+    output_path/hazmat_ranking.json, unless one is given or no K is set.
+    """
+    if options.get("ranking") and options.get("hazmat_ranking") is None:
+        options["hazmat_ranking"] = HazmatRanking(
+            options["ranking"], Path(output_path) / "hazmat_ranking.json"
+        )
+    return options
+
+
+def input_stats(folders: list[Path]) -> dict:
+    """Size of the workbooks read from ``folders``, as recorded in the run history."""
+    sizes = []
+    for folder in folders:
+        entries = [scanner.entry(f) for f in excel_inputs(folder)]
+        sizes.append((len(entries), sum(e.size for e in entries if e)))
+    return {
+        "input_bytes": sum(b for _, b in sizes),
+        "files": sum(n for n, _ in sizes),
+        "max_folder_bytes": max((b for _, b in sizes), default=0),
+    }
+
+
+def timed_stage(options: dict, name: str, stats: dict):
+    """
+    Context manager recording the enclosed stage in the run history, with the
+    worker count of the parse pool if the stage parsed in it (read at the end of
+    the stage, after an "auto" pool has been sized).
+    """
+    pool = options.get("parse_pool")
+    started = pool.submitted if pool is not None else 0
+
+    def workers() -> int:
+        return pool.workers if pool is not None and pool.submitted > started else 1
+
+    return options["history"].stage(
+        name, resumed=bool(options.get("resume")), workers=workers, **stats
+    )
+
+
+def job_stage(options: dict, job: str, stats: dict):
+    """Context manager emitting the start and end of a whole job on the event bus."""
+    return track(options.get("events"), job, stats["files"], stats["input_bytes"])
+
+
+def export_stage(options: dict, job: str, output_dir: Path, stats: dict) -> None:
+    """Exports the per-folder outputs of ``job`` to the "parquet" dataset directory, if set."""
+    dataset_dir = options.get("parquet")
+    if not dataset_dir:
+        return
+    unit = f"{job}:export_parquet"
+    inputs = excel_inputs(output_dir)
+    if job == "firefighter":
+        inputs = [f for city in list_subfolders(output_dir) for f in excel_inputs(city)]
+    with timed_stage(options, unit, stats):
+        options["checkpoint"].run(
+            unit, inputs, [Path(dataset_dir)], export_parquet, output_dir, dataset_dir, job
+        )
+
+
+def cube_stage(options: dict, job: str, output_dir: Path, stats: dict) -> None:
+    """
+    Writes the cube of ``job`` to output_dir/<job>_cube.csv when {"cube": True}:
+    the rollup cube of the firefighter job, or the industry cube of the chems job,
+    which is updated from the company outputs that changed.
+    """
+    if not options.get("cube"):
+        return
+    builders = {"firefighter": write_firefighter_cube, "chems": update_industry_cube}
+    unit = f"{job}:rollup_cube"
+    path = Path(output_dir) / f"{job}_cube.csv"
+    inputs = excel_inputs(output_dir)
+    if job == "firefighter":
+        inputs = [f for city in list_subfolders(output_dir) for f in excel_inputs(city)]
+    with timed_stage(options, unit, stats):
+        options["checkpoint"].run(unit, inputs, [path], builders[job], output_dir, path)
+
+
+def sites_stage(options: dict, output_dir: Path, stats: dict) -> None:
+    """
+    Writes output_dir/site_inventory.csv when {"sites": True}: the located
+    equipment sites joined to their equipment and to the chems outputs of the
+    parent directory, for utils.spatial.SiteIndex.
+    """
+    if not options.get("sites"):
+        return
+    unit = "equipment:site_inventory"
+    chems_dir = Path(output_dir).parent
+    path = Path(output_dir) / "site_inventory.csv"
+    inputs = excel_inputs(output_dir) + excel_inputs(chems_dir)
+    with timed_stage(options, unit, stats):
+        options["checkpoint"].run(
+            unit, inputs, [path], write_site_inventory, output_dir, chems_dir, path
+        )
+
+
+def ranking_stage(options: dict, output_dir: Path, stats: dict) -> None:
+    """Writes output_dir/hazmat_ranking.xlsx when {"ranking": K} (see with_ranking)."""
+    ranking = options.get("hazmat_ranking")
+    if ranking is None:
+        return
+    with timed_stage(options, "chems:hazmat_ranking", stats):
+        ranking.save()
+        params = {"folder_path": str(output_dir), "output_path": str(output_dir)}
+        output_as(ranking.report(), {**params, "file_name": "hazmat_ranking.xlsx"})
+
+
+def name_cleaner(options: dict, kind: str, columns: list[str], cleaner: Callable) -> Callable:
+    """``cleaner``, preceded by the run's NameNormalizer for ``columns`` when there is one."""
+    normalizer = options.get("name_normalizer")
+    return cleaner if normalizer is None else normalizer.cleaner(kind, columns, cleaner)
+
+
+def analysis_inputs(options: dict, sorted_path: Path) -> list:
+    """Inputs of an analyze_grouped stage: the sorted data and the name dictionary, if any."""
+    normalizer = options.get("name_normalizer")
+    if normalizer is None or normalizer.path is None:
+        return [sorted_path]
+    return [sorted_path, normalizer.path]
+
+
+def excel_inputs(folder: Path) -> list[str]:
+    """Excel files read from a folder, used to fingerprint a stage's inputs."""
+    reader = read_data.read_data({"path_data": str(folder), "folder_path": str(folder)})
+    return reader.list_excel_files(folder)
+
+
+@contextmanager
+def run_reports(options: dict, output_path: Path):
+    """Writes the error report (and duplicate report) of a run when the block exits."""
+    try:
+        yield
+    finally:
+        options["error_report"].write(output_path)
+        if options.get("template_plans") is not None:
+            options["template_plans"].save()
+        if options.get("content_index") is not None:
+            options["content_index"].write_report(output_path)
+        if options.get("name_normalizer") is not None:
+            options["name_normalizer"].write_report(output_path)
+        if options.get("parse_pool") is not None:
+            options["parse_pool"].shutdown()
+
+
+def derived_options(options: Optional[dict]) -> dict:
+    """
+    Options for stages that read generated outputs instead of submitted workbooks.
+    An "output_index" (kept by watch mode) becomes their content index, so outputs
+    that did not change since the last batch are not parsed again.
+    """
+    dedup_keys = ("dedup", "skip_duplicates", "content_index", "output_index", "store")
+    derived = {k: v for k, v in (options or {}).items() if k not in dedup_keys}
+    if (options or {}).get("output_index") is not None:
+        derived["content_index"] = options["output_index"]
+    return derived
+
+
+def collect_result(accumulator: SheetAccumulator, f: str, k, v) -> None:
+    """Adds one file's read_with_pattern result to the accumulator."""
+    if isinstance(k, (list, tuple)) and len(k) > 1:
+        for i, j in zip(k, v):
+            accumulator.add(i, j.dropna(axis=0, how="all"))
+    elif isinstance(k, (list, tuple)) and len(k) == 1:
+        # v is a list when k is a list
+        if isinstance(v, (list, tuple)) and len(v) > 0:
+            accumulator.add(k[0], v[0].dropna(axis=0, how="all"))
+        else:
+            # Fallback: treat v as a single DataFrame
+            accumulator.add(k[0], v.dropna(axis=0, how="all"))
+    elif isinstance(k, str) and k:
+        accumulator.add(k, v)
+    else:
+        logging.info(f"No data in {f}; skip.")
 
 
 def concat_list_dict(d: dict[str, list[pd.DataFrame]]) -> dict[str, pd.DataFrame]:
@@ -48,7 +308,11 @@ def concat_list_dict(d: dict[str, list[pd.DataFrame]]) -> dict[str, pd.DataFrame
 
 # -------------------- 共用流程 --------------------
 def process_folder_tree(
-    base_path: Path, out_root: str, pattern: str, filename: Optional[str] = None
+    base_path: Path,
+    out_root: str,
+    pattern: str,
+    filename: Optional[str] = None,
+    options: Optional[dict] = None,
 ) -> None:
     """
     走訪 base_path 下各子資料夾，讀檔並各自輸出一份合併檔。
@@ -60,69 +324,162 @@ def process_folder_tree(
         out_root: Output directory path for processed files
         pattern: Processing pattern to apply (e.g., 'top_ten_operating_chemicals')
         filename: Optional prefix for output filenames
+        options: Optional run options, e.g. {"memory_budget_mb": 512, "prefetch_depth": 4};
+                 also passed on to read_data. With {"dedup": True} identical workbooks
+                 are parsed once and listed in duplicate_report.csv. With a Checkpoint
+                 in {"checkpoint": ...} finished folders are recorded and skipped on resume.
+                 With {"store": "survey.sqlite"} every changed workbook's result is also
+                 loaded into the SQLite store. With a ParsePool in {"parse_pool": ...}
+                 folders and workbooks are dispatched largest first by a CostModel.
+                 With a HazmatRanking in {"hazmat_ranking": ...} every chemical output
+                 (also of a skipped folder not ranked yet) updates the ranking.
 
     Process:
         1. Iterates through each subdirectory in base_path
         2. Reads Excel files using specified pattern
-        3. Combines data from multiple sheets/files
+        3. Streams data from multiple sheets/files into a bounded-memory accumulator
         4. Outputs consolidated Excel file for each subdirectory
     """
+    options = options or {}
+    owns_index = bool(options.get("dedup")) and options.get("content_index") is None
+    owns_report = options.get("error_report") is None
+    options = shared_options(options)
+    index = options.get("content_index")
+    report = options["error_report"]
+    checkpoint = options.get("checkpoint")
+    store = options.get("store")
+    ranking = options.get("hazmat_ranking") if pattern == "top_ten_operating_chemicals" else None
+    merged = pattern not in NO_MERGE_PATTERNS
     root_reader = read_data.read_data(
         {"path_data": str(base_path), "path_output": str(out_root), "pattern": pattern}
     )
     base = Path(root_reader.get_path())
+    folders = list_subfolders(base)
+    inputs_of = {folder: root_reader.list_excel_files(folder) for folder in folders}
+    tree_inputs = [f for fs in inputs_of.values() for f in fs]
+    if index is not None:
+        # 先為可能重複（大小相同）的檔案建立雜湊索引，重複的檔案只解析一次
+        index.add_files(tree_inputs)
+    pool = options.get("parse_pool")
+    model = None
+    if pool is not None:
+        # 依估計成本由大到小派工，最後只剩小資料夾，避免單一大檔拖住其他 worker
+        model = CostModel(options.get("history"), PATTERN_STAGES.get(pattern))
+        if pool.auto:
+            pool.autosize(model.workers(f for fs in inputs_of.values() for f in fs))
+        folders.sort(key=lambda folder: model.folder_cost(inputs_of[folder]), reverse=True)
 
-    for folder in list_subfolders(base):
-        logging.info(f"Processing folder: {folder.name}")
-        file_name = (
-            f"{folder.name}.xlsx"
-            if not filename
-            else filename + "_" + f"{folder.name}.xlsx"
-        )
-        params = {
-            "path_data": str(base_path),
-            "path_output": str(out_root),
-            "folder_path": str(folder),
-            "file_name": file_name,
-            "pattern": pattern,
-        }
-        reader = read_data.read_data(params)
-        combined = defaultdict(list)
-        iterator = reader.read_excel_files()
-
-        for f, (k, v) in iterator:
-            if isinstance(k, (list, tuple)) and len(k) > 1:
-                [combined[i].append(j.dropna(axis=0, how="all")) for i, j in zip(k, v)]
-            elif isinstance(k, (list, tuple)) and len(k) == 1:
-                # v is a list when k is a list
-                if isinstance(v, (list, tuple)) and len(v) > 0:
-                    combined[k[0]].append(v[0].dropna(axis=0, how="all"))
-                else:
-                    # Fallback: treat v as a single DataFrame
-                    combined[k[0]].append(v.dropna(axis=0, how="all"))
-            elif isinstance(k, str) and k:
-                combined[k].append(v)
-            else:
-                logging.info(f"No data in {f}; skip.")
-        combined = {k: pd.concat(v, ignore_index=True) for k, v in combined.items()}
-        if len(combined.keys()) >= 1:
-            combined = (
-                merge_sheets_by_group(combined)
-                if pattern
-                not in [
-                    "top_ten_operating_chemicals",
-                    "sort_by_location",
-                    "industry_rescue_equipment",
-                ]
-                else combined
-            )
-        params["output_path"] = str(base / out_root)
-        output_as(combined, params)
+    size = sum(e.size for e in map(scanner.entry, tree_inputs) if e)
+    try:
+        with track(options["events"], "process_folder_tree", len(tree_inputs), size):
+            for n, folder in enumerate(folders):
+                logging.info(f"Processing folder: {folder.name}")
+                file_name = (
+                    f"{folder.name}.xlsx"
+                    if not filename
+                    else filename + "_" + f"{folder.name}.xlsx"
+                )
+                params = {
+                    **options,
+                    "path_data": str(base_path),
+                    "path_output": str(out_root),
+                    "folder_path": str(folder),
+                    "file_name": file_name,
+                    "pattern": pattern,
+                }
+                if model is not None:
+                    params["cost_model"] = model
+                    following = folders[n + 1 : n + 2]
+                    params["lookahead"] = inputs_of[following[0]] if following else ()
+                reader = read_data.read_data(params)
+                output_file = base / out_root / file_name
+                if _duplicates_only(index, inputs_of[folder]):
+                    # 全為其他資料夾檔案的副本時不輸出空檔
+                    logging.info(f"Skipping folder {folder.name}: every workbook is a duplicate")
+                    if checkpoint is not None:
+                        unit = f"{pattern}:{folder}->{output_file}"
+                        checkpoint.mark(unit, fingerprint(inputs_of[folder]))
+                    continue
+                if checkpoint is not None:
+                    unit = f"{pattern}:{folder}->{output_file}"
+                    inputs = reader.list_excel_files(folder)
+                    fp = fingerprint(inputs)
+                    if checkpoint.done(unit, fp, [output_file]) and (
+                        store is None or store.has_all(inputs, pattern)
+                    ):
+                        logging.info(f"Skipping finished folder: {folder.name}")
+                        if pool is not None:
+                            pool.cancel(inputs_of[folder])
+                        if ranking is not None and not ranking.has(folder.name):
+                            ranking.ingest_file(folder.name, output_file)
+                        continue
+                accumulator = SheetAccumulator(
+                    memory_budget_mb=options.get("memory_budget_mb", 512),
+                    chunk_rows=options.get("chunk_rows", 50_000),
+                    group_keys=MERGE_REQUIRED_KEYS if merged else None,
+                )
+                iterator = reader.read_excel_files()
+
+                with accumulator:
+                    for f, (k, v) in iterator:
+                        if store is not None:
+                            try:
+                                store.ingest(f, pattern, folder, k, v)
+                            except Exception as e:
+                                _record_or_raise(report, f, "store", e, pattern)
+                        try:
+                            collect_result(accumulator, f, k, v)
+                        except Exception as e:
+                            _record_or_raise(report, f, "collect", e, pattern)
+                    combined = accumulator.finalize()
+                # 單一資料夾失敗時保留其他資料夾的結果
+                stage = "merge"
+                try:
+                    if len(combined.keys()) >= 1:
+                        combined = merge_sheets_by_group(combined) if merged else combined
+                    stage = "output"
+                    params["output_path"] = str(base / out_root)
+                    output_as(combined, params)
+                except Exception as e:
+                    _record_or_raise(report, str(folder), stage, e, pattern)
+                    continue
+                if ranking is not None:
+                    # 重新提交的廠商只替換自己的前 K 名清單
+                    ranking.ingest(folder.name, combined)
+                if checkpoint is not None:
+                    checkpoint.mark(unit, fp)
+        if store is not None:
+            store.prune()
+        if ranking is not None:
+            ranking.retain(folder.name for folder in folders)
+    finally:
+        if owns_index:
+            index.write_report(base / out_root)
+        if owns_report:
+            report.write(base / out_root)
     logging.info("All folders processed successfully.")
 
 
+def _duplicates_only(index: Optional[ContentIndex], inputs: list[str]) -> bool:
+    """True when duplicates are skipped and every workbook of a folder is one."""
+    if index is None or not index.skip_duplicates or not inputs:
+        return False
+    return all(index.is_duplicate(f) for f in inputs)
+
+
+def _record_or_raise(report: ErrorReport, file: str, stage: str, error, pattern) -> None:
+    """Records a failure outside read_data and re-raises it under the "abort" policy."""
+    action = "aborted" if report.policy == "abort" else "skipped"
+    report.record(file, stage, error, action, pattern=pattern)
+    if report.policy == "abort":
+        raise error
+
+
 def sort_by_location(
-    sorted_out_name: str, base_for_sorted: Path, pattern="sort_by_location"
+    sorted_out_name: str,
+    base_for_sorted: Path,
+    pattern="sort_by_location",
+    options: Optional[dict] = None,
 ) -> Path:
     """
     讀取process_folder_tree的輸出檔，依園區（北/中/南/其他）彙整成多工作表。
@@ -131,6 +488,7 @@ def sort_by_location(
         sorted_out_name: Name for the consolidated output file
         base_for_sorted: Directory containing files to be sorted by location
         pattern: Processing pattern (default: 'sort_by_location')
+        options: Optional run options passed on to read_data
 
     Returns:
         Path to the created sorted output file
@@ -150,6 +508,7 @@ def sort_by_location(
     )
     base = Path(root_reader.get_path())
     params = {
+        **derived_options(options),
         "path_data": str(base_for_sorted),
         "path_output": str(base_for_sorted),
         "pattern": pattern,
@@ -161,13 +520,16 @@ def sort_by_location(
     buckets = {"北部園區": [], "中部園區": [], "南部園區": [], "其他": []}
     factories = {k: [] for k in buckets}
 
-    for f, (region, dfs) in reader.read_excel_files():
-        logging.info(f"Sorting file: {f} -> region = {region}")
-        buckets[region].extend(dfs)
-        factories[region].append(f)
+    inputs = reader.list_excel_files(base)
+    size = sum(e.size for e in map(scanner.entry, inputs) if e)
+    with track(params.get("events"), "sort_by_location", len(inputs), size):
+        for f, (region, dfs) in reader.read_excel_files():
+            logging.info(f"Sorting file: {f} -> region = {region}")
+            buckets[region].extend(dfs)
+            factories[region].append(f)
 
-    merged = concat_list_dict(buckets)
-    output_as(merged, params)
+        merged = concat_list_dict(buckets)
+        output_as(merged, params)
     return Path(params["output_path"]) / sorted_out_name
 
 
@@ -187,13 +549,16 @@ def main():
     output_as(combined_data, data_reader.parameters)
 
 
-def high_tech_industry_chems_main(base="../Data/科技廠救災能量", out_rel="/Output"):
+def high_tech_industry_chems_main(
+    base="../Data/科技廠救災能量", out_rel="/Output", options: Optional[dict] = None
+):
     """
     Function to handle high-tech industry chemical storage data processing.
 
     Args:
         base: Base directory containing industrial chemical data
         out_rel: Relative output directory path
+        options: Optional run options forwarded to process_folder_tree
 
     Workflow:
         1. Process each company folder using 'top_ten_operating_chemicals' pattern
@@ -208,28 +573,66 @@ def high_tech_industry_chems_main(base="../Data/科技廠救災能量", out_rel=
     """
     base_path = Path(base)
     out_root = out_rel.strip("/")
-    # 1) 逐資料夾處理
-    process_folder_tree(
-        base_path=base_path, out_root=out_root, pattern="top_ten_operating_chemicals"
-    )
-    # 2) 依園區彙整
     base_for_sorted = base_path / out_root
-    sorted_path = sort_by_location(
-        "Sorted_data.xlsx", base_for_sorted, pattern="sort_by_location"
-    )
-    # 3) 分析輸出
-    storage_cols = ["廠內最大儲存量(公斤)", "廠內最大儲存量(公升)"]
-    specs = [
-        ("化學物質名稱", storage_cols, "sort_by_hazmat.xlsx"),
-        ("容器材質", storage_cols, "sort_by_container.xlsx"),
-        ("物質儲存型態", storage_cols, "sort_by_state.xlsx"),
-    ]
-    path_output = base_path / out_root
-    analyze_grouped(sorted_path, specs, cleaner=clean_chems, path_output=path_output)
+    options = with_checkpoint(shared_options(options), resolve_dir(base_for_sorted))
+    options = with_history(options, resolve_dir(base_path) / "Output")
+    options = with_ranking(options, resolve_dir(base_for_sorted))
+    checkpoint = options["checkpoint"]
+    stats = input_stats(list_subfolders(resolve_dir(base_path)))
+    with run_reports(options, base_path / out_root), job_stage(options, "chems", stats):
+        # 1) 逐資料夾處理
+        with timed_stage(options, "chems:process_folder_tree", stats):
+            process_folder_tree(
+                base_path=base_path,
+                out_root=out_root,
+                pattern="top_ten_operating_chemicals",
+                options=options,
+            )
+        # 2) 依園區彙整
+        sorted_path = resolve_dir(base_for_sorted) / "Sorted_data.xlsx"
+        with timed_stage(options, "chems:sort_by_location", stats):
+            checkpoint.run(
+                "chems:sort_by_location",
+                excel_inputs(sorted_path.parent),
+                [sorted_path],
+                sort_by_location,
+                "Sorted_data.xlsx",
+                base_for_sorted,
+                pattern="sort_by_location",
+                options=options,
+            )
+        # 3) 分析輸出
+        storage_cols = ["廠內最大儲存量(公斤)", "廠內最大儲存量(公升)"]
+        specs = [
+            ("化學物質名稱", storage_cols, "sort_by_hazmat.xlsx"),
+            ("容器材質", storage_cols, "sort_by_container.xlsx"),
+            ("物質儲存型態", storage_cols, "sort_by_state.xlsx"),
+        ]
+        path_output = base_path / out_root
+        with timed_stage(options, "chems:analyze_grouped", stats):
+            checkpoint.run(
+                "chems:analyze_grouped",
+                analysis_inputs(options, sorted_path),
+                [sorted_path.parent / out_file for _, _, out_file in specs],
+                analyze_grouped,
+                sorted_path,
+                specs,
+                cleaner=name_cleaner(options, "chemical", ["化學物質名稱"], clean_chems),
+                path_output=path_output,
+                events=options["events"],
+            )
+        # 4) Parquet 匯出
+        export_stage(options, "chems", resolve_dir(base_for_sorted), stats)
+        # 5) 產業資料立方體（區域、園區、廠商、化學物質屬性）
+        cube_stage(options, "chems", resolve_dir(base_for_sorted), stats)
+        # 6) 危害物質排名（各區域與全國前 K 名）
+        ranking_stage(options, resolve_dir(base_for_sorted), stats)
 
 
 def high_tech_industry_rescue_equipment_main(
-    base="../Data/科技廠救災能量", out_rel="/Output/Rescue_equipment"
+    base="../Data/科技廠救災能量",
+    out_rel="/Output/Rescue_equipment",
+    options: Optional[dict] = None,
 ):
     """
     Function to handle high-tech industry rescue equipment data processing.
@@ -237,6 +640,7 @@ def high_tech_industry_rescue_equipment_main(
     Args:
         base: Base directory containing industrial rescue equipment data
         # out_rel: Relative output directory path for equipment reports
+        options: Optional run options forwarded to process_folder_tree
 
     Workflow:
         1. Process each facility folder using 'industry_rescue_equipment' pattern
@@ -252,32 +656,63 @@ def high_tech_industry_rescue_equipment_main(
     out_rel = "/Output/Rescue_equipment"
     base_path = Path(base)
     out_root = out_rel.strip("/")
+    base_for_sorted = base_path / out_root
+    options = with_checkpoint(shared_options(options), resolve_dir(base_for_sorted))
+    options = with_history(options, resolve_dir(base_path) / "Output")
+    checkpoint = options["checkpoint"]
+    stats = input_stats(list_subfolders(resolve_dir(base_path)))
 
-    # 1) 逐資料夾處理（讀取模式不同）
-    process_folder_tree(
-        base_path, out_root=out_root, pattern="industry_rescue_equipment"
-    )
+    with run_reports(options, base_path / out_root), job_stage(options, "equipment", stats):
+        # 1) 逐資料夾處理（讀取模式不同）
+        with timed_stage(options, "equipment:process_folder_tree", stats):
+            process_folder_tree(
+                base_path,
+                out_root=out_root,
+                pattern="industry_rescue_equipment",
+                options=options,
+            )
 
-    # 2) 依園區彙整
-    base_for_sorted = base_path / out_root
-    sorted_path = sort_by_location(
-        "Sorted_data.xlsx", base_for_sorted, pattern="sort_by_location"
-    )
+        # 2) 依園區彙整
+        sorted_path = resolve_dir(base_for_sorted) / "Sorted_data.xlsx"
+        with timed_stage(options, "equipment:sort_by_location", stats):
+            checkpoint.run(
+                "equipment:sort_by_location",
+                excel_inputs(sorted_path.parent),
+                [sorted_path],
+                sort_by_location,
+                "Sorted_data.xlsx",
+                base_for_sorted,
+                pattern="sort_by_location",
+                options=options,
+            )
 
-    # 3) 分析輸出
-    specs = [
-        ("證照", ["證照數量"], "sort_by_certificate.xlsx"),
-        ("演練", ["演練數量"], "sort_by_training.xlsx"),
-        ("應變設備", ["應變設備數量", "應變設備可支援數量"], "sort_by_equipment.xlsx"),
-    ]
-    path_output = base_path / out_root
-    analyze_grouped(
-        sorted_path, specs, cleaner=clean_equipment, path_output=path_output
-    )
+        # 3) 分析輸出
+        specs = [
+            ("證照", ["證照數量"], "sort_by_certificate.xlsx"),
+            ("演練", ["演練數量"], "sort_by_training.xlsx"),
+            ("應變設備", ["應變設備數量", "應變設備可支援數量"], "sort_by_equipment.xlsx"),
+        ]
+        path_output = base_path / out_root
+        with timed_stage(options, "equipment:analyze_grouped", stats):
+            checkpoint.run(
+                "equipment:analyze_grouped",
+                analysis_inputs(options, sorted_path),
+                [sorted_path.parent / out_file for _, _, out_file in specs],
+                analyze_grouped,
+                sorted_path,
+                specs,
+                cleaner=name_cleaner(options, "equipment", ["應變設備"], clean_equipment),
+                path_output=path_output,
+                events=options["events"],
+            )
+        # 4) Parquet 匯出
+        export_stage(options, "equipment", resolve_dir(base_for_sorted), stats)
+        # 5) 廠商位置索引（經緯度、應變設備與化學物質）
+        sites_stage(options, resolve_dir(base_for_sorted), stats)
 
 
 def firefighter_training_survey_main(
-    base="../Data/消防機關救災能量", out_rel="../Output"
+    base="../Data/消防機關救災能量", out_rel="../Output", options: Optional[dict] = None
 ):
     """
     Function to handle firefighters' rescue capability data processing.
@@ -285,6 +720,7 @@ def firefighter_training_survey_main(
     Args:
         base: Base directory containing firefighter survey data
         out_rel: Relative output directory path
+        options: Optional run options forwarded to process_folder_tree
 
     Expected folder structure:
         base_path/cities/Division/files.xlsx
@@ -304,51 +740,388 @@ def firefighter_training_survey_main(
         {"path_data": str(base), "path_output": str(out_root), "pattern": ""}
     )
     base_path = Path(root_reader.get_path())
-    # 1) 逐大隊資料夾處理
-    for cities in list_subfolders(base_path, exclude=exclude_files + ("Raw_data",)):
-        if "苗栗縣" in str(cities):
-            pattern = "苗栗縣"
-        else:
-            pattern = "firefighter_rescue_survey"
-        logging.info(f"Processing city folder: {cities.name}")
-        city_path = base / cities.name
-        city_out_root = out_root + f"/{cities.name}"
-        process_folder_tree(
-            base_path=city_path,
-            out_root=city_out_root,
-            pattern=pattern,
-            filename=cities.name,
+    options = with_checkpoint(shared_options(options), base_path / "Output")
+    options = with_history(options, base_path / "Output")
+    checkpoint = options["checkpoint"]
+    index = options.get("content_index")
+    city_folders = list_subfolders(base_path, exclude=exclude_files + ("Raw_data",))
+    stats = input_stats([d for cities in city_folders for d in list_subfolders(cities)])
+    if index is not None:
+        # 跨縣市建立內容雜湊索引（一次比對所有大隊的檔案大小）
+        index.add_files(
+            f
+            for cities in city_folders
+            for division in list_subfolders(cities)
+            for f in root_reader.list_excel_files(division)
         )
-    # 2) 逐縣市資料夾處理
-    out_root = "Distribution_by_city"
-    path_output = out_root
-    base_path = base / Path("Output")
-    # Only process if Output directory exists
-
-    process_folder_tree(
-        base_path=base_path,
-        out_root=out_root,
-        pattern="default",
+    with run_reports(options, base_path / "Output"), job_stage(options, "firefighter", stats):
+        # 1) 逐大隊資料夾處理
+        with timed_stage(options, "firefighter:process_folder_tree", stats):
+            for cities in city_folders:
+                if "苗栗縣" in str(cities):
+                    pattern = "苗栗縣"
+                else:
+                    pattern = "firefighter_rescue_survey"
+                logging.info(f"Processing city folder: {cities.name}")
+                city_path = base / cities.name
+                city_out_root = out_root + f"/{cities.name}"
+                process_folder_tree(
+                    base_path=city_path,
+                    out_root=city_out_root,
+                    pattern=pattern,
+                    filename=cities.name,
+                    options=options,
+                )
+        # 2) 逐縣市資料夾處理
+        out_root = "Distribution_by_city"
+        path_output = out_root
+        base_path = base / Path("Output")
+        # Only process if Output directory exists
+
+        with timed_stage(options, "firefighter:distribution_by_city", stats):
+            process_folder_tree(
+                base_path=base_path,
+                out_root=out_root,
+                pattern="default",
+                options=derived_options(options),
+            )
+        # 3) 依縣市彙整
+        specs = ["化災搶救基礎班", "化災搶救進階班", "化災搶救指揮官班", "化災搶救教官班"]
+        out_root = Path("/Output/Distribution_by_city")
+        base_path = Path(root_reader.get_path())
+        # Only analyze if Output directory exists
+
+        city_outputs = list_subfolders(base_path / "Output")
+        with timed_stage(options, "firefighter:analyze_ff_survey_files", stats):
+            checkpoint.run(
+                "firefighter:analyze_ff_survey_files",
+                [f for city in city_outputs for f in excel_inputs(city)],
+                [Path(f"{base_path}{out_root}") / "Grouped_data.xlsx"],
+                analyze_ff_survey_files,
+                base_path,
+                specs,
+                out_root=out_root,
+                pattern="default",
+                filename="Grouped_data.xlsx",
+                events=options["events"],
+            )
+        # 4) Parquet 匯出
+        export_stage(options, "firefighter", base_path / "Output", stats)
+        # 5) 多層級彙總（大隊→縣市→全國）
+        cube_stage(options, "firefighter", base_path / "Output", stats)
+
+
+# -------------------- 命令列 --------------------
+JOBS = {
+    "firefighter": ("../Data/消防機關救災能量", "../Output"),
+    "chems": ("../Data/科技廠救災能量", "/Output"),
+    "equipment": ("../Data/科技廠救災能量", "/Output/Rescue_equipment"),
+    "industry": ("../Data/科技廠救災能量", "/Output"),
+}
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Excel data processing pipelines")
+    parser.add_argument("job", nargs="?", default="firefighter", choices=JOBS)
+    parser.add_argument("--base", help="Base data directory (default depends on job)")
+    parser.add_argument("--out", help="Relative output directory (default depends on job)")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run, skipping folders and stages that already finished",
     )
-    # 3) 依縣市彙整
-    specs = ["化災搶救基礎班", "化災搶救進階班", "化災搶救指揮官班", "化災搶救教官班"]
-    out_root = Path("/Output/Distribution_by_city")
-    base_path = Path(root_reader.get_path())
-    # Only analyze if Output directory exists
-
-    analyze_ff_survey_files(
-        base_path,
-        specs,
-        out_root=out_root,
-        pattern="default",
-        filename="Grouped_data.xlsx",
+    parser.add_argument(
+        "--failure-policy", choices=("skip", "retry", "abort"), default="skip"
+    )
+    parser.add_argument("--dedup", action="store_true", help="Parse identical workbooks once")
+    parser.add_argument(
+        "--skip-duplicates",
+        action="store_true",
+        help="With --dedup, leave duplicate workbooks out of the aggregates",
+    )
+    parser.add_argument("--memory-budget-mb", type=float, default=512)
+    parser.add_argument("--prefetch-depth", type=int, default=2)
+    parser.add_argument(
+        "--parse-workers",
+        type=lambda v: v if v == "auto" else int(v),
+        default=1,
+        help="Worker processes parsing workbooks ('auto': from CPUs and available memory)",
+    )
+    parser.add_argument(
+        "--template-cache",
+        help="JSON file keeping the extraction plans of known survey templates between runs",
+    )
+    parser.add_argument(
+        "--store", help="SQLite database the per-file results are loaded into (incrementally)"
+    )
+    parser.add_argument(
+        "--parquet",
+        help="Directory of partitioned Parquet datasets written after each job (needs pyarrow)",
+    )
+    parser.add_argument(
+        "--cube",
+        action="store_true",
+        help="Also write the cube of the firefighter or chems job (<job>_cube.csv)",
+    )
+    parser.add_argument(
+        "--ranking",
+        type=int,
+        metavar="K",
+        help="Also write the top K chemicals and companies per region (hazmat_ranking.xlsx)",
+    )
+    parser.add_argument(
+        "--sites",
+        action="store_true",
+        help="Also write the located sites with their equipment and chemicals (site_inventory.csv)",
+    )
+    parser.add_argument(
+        "--name-dictionary",
+        help="CSV of canonical chemical and equipment names (kind, canonical, alias) that "
+        "names are mapped to before grouping",
     )
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="Check sheet names, anchors and headers of every workbook first; run only if all pass",
+    )
+    parser.add_argument(
+        "--preflight-only",
+        action="store_true",
+        help="Only print the pre-flight table (exit code 1 when a workbook fails)",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: estimate files, rows, runtime and peak memory from workbook metadata",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker count projected by --plan"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and update the outputs whenever workbooks are added or changed",
+    )
+    parser.add_argument(
+        "--stall-after",
+        type=float,
+        default=300.0,
+        help="Warn when a running stage reports no progress for this many seconds (0: never)",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a warm local job service; later runs are sent to it while it is running",
+    )
+    parser.add_argument(
+        "--local", action="store_true", help="Run in this process even when a job service runs"
+    )
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls")
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=10.0,
+        help="Quiet seconds after the last change before a batch is processed",
+    )
+    return parser
 
 
-if __name__ == "__main__":
-    base = "../Test2"  # "../Data/消防機關救災能量"  # "../Data/科技廠救災能量" #
-    root_out = "/../Output"
+def options_from_args(args: argparse.Namespace) -> dict:
+    return {
+        "resume": args.resume,
+        "failure_policy": args.failure_policy,
+        "dedup": args.dedup or args.skip_duplicates,
+        "skip_duplicates": args.skip_duplicates,
+        "memory_budget_mb": args.memory_budget_mb,
+        "prefetch_depth": args.prefetch_depth,
+        "parse_workers": args.parse_workers,
+        "template_cache": args.template_cache,
+        "store": args.store,
+        "parquet": args.parquet,
+        "cube": args.cube,
+        "ranking": args.ranking,
+        "name_dictionary": args.name_dictionary,
+        "sites": args.sites,
+    }
+
+
+JOB_PATTERNS = {
+    "chems": ("top_ten_operating_chemicals",),
+    "equipment": ("industry_rescue_equipment",),
+    "industry": ("top_ten_operating_chemicals", "industry_rescue_equipment"),
+}
+
+
+JOB_STAGES = {
+    "chems": ["chems:process_folder_tree", "chems:sort_by_location", "chems:analyze_grouped"],
+    "equipment": [
+        "equipment:process_folder_tree",
+        "equipment:sort_by_location",
+        "equipment:analyze_grouped",
+    ],
+    "firefighter": [
+        "firefighter:process_folder_tree",
+        "firefighter:distribution_by_city",
+        "firefighter:analyze_ff_survey_files",
+    ],
+}
+JOB_STAGES["industry"] = JOB_STAGES["chems"] + JOB_STAGES["equipment"]
+
+
+def job_inputs(job: str, base_path: Path) -> list[tuple[str, Path, list[str]]]:
+    """(pattern, folder, workbooks) for every folder the input stage of a job reads."""
+    units = []
+    if job == "firefighter":
+        for city in list_subfolders(base_path, exclude=exclude_files + ("Raw_data",)):
+            pattern = "苗栗縣" if "苗栗縣" in str(city) else "firefighter_rescue_survey"
+            units.extend((pattern, d, excel_inputs(d)) for d in list_subfolders(city))
+        return units
+    for folder in list_subfolders(base_path):
+        units.extend((pattern, folder, excel_inputs(folder)) for pattern in JOB_PATTERNS[job])
+    return units
+
+
+def preflight_job(job: str, base: Optional[str]) -> list[CheckResult]:
+    """
+    Checks the structure of every workbook a job would read, without parsing them.
+
+    Company folders in which no workbook has the sheets of a pattern are reported
+    as a failed row for the folder.
+    """
+    units = job_inputs(job, resolve_dir(Path(base or JOBS[job][0])))
+    results = preflight((f, pattern) for pattern, _, files in units for f in files)
+    if job == "firefighter":
+        return results
+    for pattern, folder, inputs in units:
+        statuses = {r.status for r in results if r.pattern == pattern and r.file in inputs}
+        if statuses <= {"n/a"}:
+            results.append(
+                CheckResult(
+                    str(folder), pattern, "fail", ("no workbook with the sheets of this pattern",)
+                )
+            )
+    return results
+
+
+def plan_job(job: str, base: Optional[str], workers: int = 1) -> dict:
+    """
+    Dry run: estimates files, sheets, rows, runtime and peak memory of a job from
+    workbook metadata and the timings of past runs (Output/run_history.jsonl).
+    """
+    base_path = resolve_dir(Path(base or JOBS[job][0]))
+    units = [
+        (PATTERN_STAGES[p], str(folder), files) for p, folder, files in job_inputs(job, base_path)
+    ]
+    history = RunHistory(base_path / "Output" / "run_history.jsonl")
+    return plan_workload(units, JOB_STAGES[job], history, workers)
+
 
-    firefighter_training_survey_main(base, root_out)
-    # high_tech_industry_chems_main(base="../Test/科技廠救災能量")
-    # high_tech_industry_rescue_equipment_main(base="../Test/科技廠救災能量")
+def run_job(job: str, base: Optional[str], out_rel: Optional[str], options: dict) -> None:
+    default_base, default_out = JOBS[job]
+    base = base or default_base
+    out_rel = out_rel or default_out
+    if job == "firefighter":
+        firefighter_training_survey_main(base, out_rel, options=options)
+    elif job == "chems":
+        high_tech_industry_chems_main(base, out_rel, options=options)
+    elif job == "equipment":
+        high_tech_industry_rescue_equipment_main(base, out_rel, options=options)
+    else:
+        high_tech_industry_chems_main(base, out_rel, options=options)
+        high_tech_industry_rescue_equipment_main(base, options=options)
+
+
+def watch_job(
+    job: str,
+    base: Optional[str],
+    out_rel: Optional[str],
+    options: dict,
+    interval: float = 5.0,
+    settle: float = 10.0,
+    max_batches: Optional[int] = None,
+) -> None:
+    """
+    Keeps the outputs of a job up to date while workbooks arrive.
+
+    Every batch reruns the job in resume mode against the same checkpoint log, so
+    only folders with new or changed workbooks are rebuilt and only the sort /
+    analyze stages whose inputs changed are refreshed. Parsed workbooks and folder
+    outputs are kept in content indexes for the whole session, so unchanged files
+    in a rebuilt folder are not parsed again.
+
+    Args:
+        job: Key of JOBS
+        base: Base data directory (default depends on job)
+        out_rel: Relative output directory (default depends on job)
+        options: Run options (see README)
+        interval: Seconds between polls
+        settle: Quiet seconds that close a batch of changes
+        max_batches: Stop after this many batches (None = run until interrupted)
+    """
+    base = base or JOBS[job][0]
+    session = dict(options)
+    session["resume"] = True
+    session["dedup"] = True
+    session["content_index"] = ContentIndex(
+        skip_duplicates=options.get("skip_duplicates", False), retain=True
+    )
+    session["output_index"] = ContentIndex(retain=True)
+
+    def update(changed=()):
+        scanner.clear_cache()
+        run_job(job, base, out_rel, dict(session))
+
+    update()  # 先補上離線期間的變更
+    exclude = exclude_files + (("Raw_data",) if job == "firefighter" else ())
+    watcher = Watcher(
+        [resolve_dir(Path(base))], update, interval=interval, settle=settle, exclude=exclude
+    )
+    try:
+        watcher.run(max_batches=max_batches)
+    except KeyboardInterrupt:
+        logging.info("Watch mode stopped")
+
+
+def cli(argv: Optional[list[str]] = None) -> None:
+    args = build_arg_parser().parse_args(argv)
+    if args.plan:
+        print_plan(plan_job(args.job, args.base, args.workers))
+        return
+    if args.preflight or args.preflight_only:
+        results = preflight_job(args.job, args.base)
+        print_table(results)
+        if any(r.status == "fail" for r in results):
+            raise SystemExit(1)
+        if args.preflight_only:
+            return
+    if args.serve:
+        daemon.JobServer(run_job).serve()
+        return
+    options = options_from_args(args)
+    options["events"] = EventBus()
+    progress = LogProgress(options["events"], stall_after=args.stall_after)
+    # 有常駐服務時交由其執行，省去載入模組與重建快取的時間
+    client = None if args.local or args.watch else daemon.connect()
+    try:
+        if client is not None:
+            logging.info(f"Sending the {args.job} job to the job service on port {client.port}")
+            client.run(args.job, args.base, args.out, options, events=options["events"])
+        elif args.watch:
+            watch_job(
+                args.job,
+                args.base,
+                args.out,
+                options,
+                interval=args.interval,
+                settle=args.settle,
+            )
+        else:
+            run_job(args.job, args.base, args.out, options)
+    finally:
+        progress.close()
+
+
+if __name__ == "__main__":
+    # e.g. python Read_excels_as_one.py firefighter --base ../Data/消防機關救災能量 --resume
+    #      python Read_excels_as_one.py industry --watch --settle 30
+    cli()
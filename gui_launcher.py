@@ -13,12 +13,17 @@ Project_A/
 import logging
 import os
 import sys
+import threading
+import time
 import tkinter as tk
 from pathlib import Path
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 
 import yaml
 
+import utils.daemon as daemon
+import utils.scanner as scanner
+from utils.events import EventBus, FileDone, StageFinished, StageStarted
 from Read_excels_as_one import (
     firefighter_training_survey_main,
     high_tech_industry_rescue_equipment_main,
@@ -109,7 +114,12 @@ class ConfigManager:
                 "output": "/../Output",
                 "enabled": True,
             },
-            "general": {"auto_run": False, "show_console": True},
+            "scan": {"include": [], "exclude": ["~$*", ".~*"]},
+            "general": {
+                "auto_run": False,
+                "show_console": True,
+                "failure_policy": "skip",
+            },
         }
 
     def save_config(self):
@@ -135,6 +145,7 @@ class ExcelProcessorGUI:
         # Load configuration
         self.config_manager = ConfigManager(self.exe_dir / "config.yaml")
         self.config = self.config_manager.config
+        self.apply_scan_rules()
 
         # Save original stdout/stderr
         self.original_stdout = sys.stdout
@@ -143,12 +154,49 @@ class ExcelProcessorGUI:
         # Configure logging
         self.setup_logging()
 
+        # Progress events of the running analysis
+        self.events = EventBus()
+        self.events.subscribe(self.on_progress_event)
+        self._progress_drawn = 0.0
+
         # Create UI
         self.create_ui()
 
         # Show executable location
         self.log_message(f"Working Directory: {self.exe_dir}", "INFO")
 
+    def apply_scan_rules(self):
+        """Apply the scan include/exclude rules from the configuration"""
+        scan = self.config.get("scan") or {}
+        scanner.configure(include=scan.get("include"), exclude=scan.get("exclude"))
+
+    def run_options(self):
+        """Build the run options passed to the analysis functions"""
+        general = self.config.get("general") or {}
+        return {
+            "failure_policy": general.get("failure_policy", "skip"),
+            "resume": self.resume_var.get(),
+            "events": self.events,
+        }
+
+    def run_job(self, job, main, base, out_rel=None):
+        """Run a job in the local job service when one is running, otherwise in this process"""
+        client = daemon.connect()
+        if client is None:
+            kwargs = {} if out_rel is None else {"out_rel": out_rel}
+            main(base=base, options=self.run_options(), **kwargs)
+            return
+        self.log_message(f"Sending the {job} job to the job service", "INFO")
+        scan = self.config.get("scan") or {}
+        client.run(
+            job,
+            base,
+            out_rel,
+            self.run_options(),
+            events=self.events,
+            scan={"include": scan.get("include"), "exclude": scan.get("exclude")},
+        )
+
     def setup_logging(self):
         """Configure logging"""
         logging.getLogger().handlers.clear()
@@ -286,6 +334,13 @@ class ExcelProcessorGUI:
             variable=self.verbose_var,
         ).pack()
 
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            verbose_frame,
+            text="Resume interrupted run (skip folders and stages that already finished)",
+            variable=self.resume_var,
+        ).pack()
+
         # Config buttons
         config_button_frame = ttk.Frame(main_frame)
         config_button_frame.grid(row=6, column=0, columnspan=3, pady=5)
@@ -309,12 +364,48 @@ class ExcelProcessorGUI:
         )
         self.log_text.pack(fill=tk.BOTH, expand=True)
 
+        # Progress of the running stage
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.grid(row=8, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="determinate", maximum=100)
+        self.progress_bar.pack(fill=tk.X)
+        self.progress_var = tk.StringVar(value="Idle")
+        ttk.Label(progress_frame, textvariable=self.progress_var, font=("Arial", 9)).pack(
+            anchor=tk.W
+        )
+
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
         main_frame.rowconfigure(6, weight=1)
 
+    def on_progress_event(self, event):
+        """Update the progress bar and throughput from a pipeline event"""
+        if threading.current_thread() is not threading.main_thread():
+            return  # Tk may only be touched from the main thread
+        now = time.monotonic()
+        if isinstance(event, FileDone) and now - self._progress_drawn < 0.2:
+            return
+        if not isinstance(event, (StageStarted, StageFinished, FileDone)):
+            return
+        self._progress_drawn = now
+        p = self.events.progress()
+        if p.stage is None:
+            self.progress_bar.configure(mode="determinate", value=100)
+            self.progress_var.set("Finished")
+        elif p.total:
+            self.progress_bar.configure(mode="determinate", value=100 * min(p.done / p.total, 1))
+            self.progress_var.set(
+                f"{p.stage}: {p.done}/{p.total} files - "
+                f"{p.files_per_second:.1f} files/s, {p.rows_per_second:.0f} rows/s"
+            )
+        else:
+            self.progress_bar.configure(mode="indeterminate")
+            self.progress_bar.step(5)
+            self.progress_var.set(f"{p.stage}: {p.done} files - {p.files_per_second:.1f} files/s")
+        self.root.update_idletasks()
+
     def log_message(self, message, level="INFO"):
         """Add a message to the log text widget"""
         self.log_text.configure(state="normal")
@@ -397,6 +488,7 @@ class ExcelProcessorGUI:
             "Confirm Reset", "Reset all settings to default values?"
         ):
             self.config = self.config_manager.get_default_config()
+            self.apply_scan_rules()
             self.ff_base_var.set(self.config["firefighter"]["base"])
             self.ff_output_var.set(self.config["firefighter"]["output"])
             self.ff_enabled_var.set(self.config["firefighter"]["enabled"])
@@ -429,7 +521,7 @@ class ExcelProcessorGUI:
             self.log_message(f"Base: {base}", "INFO")
             self.log_message(f"Output: {output}\n", "INFO")
 
-            firefighter_training_survey_main(base=base, out_rel=output)
+            self.run_job("firefighter", firefighter_training_survey_main, base, output)
 
             self.log_message("\n✓ Firefighter analysis completed!", "INFO")
             messagebox.showinfo(
@@ -465,11 +557,11 @@ class ExcelProcessorGUI:
 
             # Run chemical storage analysis first
             self.log_message("Step 1: Chemical Storage Analysis", "INFO")
-            high_tech_industry_chems_main(base=base, out_rel=output)
+            self.run_job("chems", high_tech_industry_chems_main, base, output)
 
             # Then run rescue equipment analysis
             self.log_message("\nStep 2: Rescue Equipment Analysis", "INFO")
-            high_tech_industry_rescue_equipment_main(base=base)
+            self.run_job("equipment", high_tech_industry_rescue_equipment_main, base)
 
             self.log_message("\n✓ Industry analysis completed!", "INFO")
             messagebox.showinfo("Success", "Industry analysis completed successfully!")
@@ -497,7 +589,7 @@ class ExcelProcessorGUI:
                     self.log_message("=" * 60, "INFO")
                     self.log_message("FIREFIGHTER ANALYSIS", "INFO")
                     self.log_message("=" * 60, "INFO")
-                    firefighter_training_survey_main(base=base, out_rel=output)
+                    self.run_job("firefighter", firefighter_training_survey_main, base, output)
                     results.append("✓ Firefighter analysis completed")
                 else:
                     results.append(f"✗ Firefighter: Directory not found: {base}")
@@ -516,7 +608,7 @@ class ExcelProcessorGUI:
                     self.log_message("INDUSTRY ANALYSIS", "INFO")
                     self.log_message("=" * 60, "INFO")
                     self.log_message("Step 1: Chemical Storage Analysis", "INFO")
-                    high_tech_industry_chems_main(base=base, out_rel=output)
+                    self.run_job("chems", high_tech_industry_chems_main, base, output)
                     self.log_message("\nStep 2: Rescue Equipment Analysis", "INFO")
                     
                     results.append("✓ Industry analysis completed")
@@ -0,0 +1,58 @@
+"""Tests for the bounded-memory sheet accumulator"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.accumulator import SheetAccumulator
+from utils.patterns import MERGE_REQUIRED_KEYS, merge_sheets_by_group
+
+
+def make_frames(n_files=20):
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(n_files):
+        frames.append(
+            pd.DataFrame(
+                {
+                    "項次": rng.integers(1, 4, 30).astype(float),
+                    "設備名稱": rng.choice(["水帶", "空氣呼吸器", "瞄子"], 30),
+                    "數量": rng.integers(0, 10, 30).astype(float),
+                }
+            )
+        )
+    return frames
+
+
+def test_running_group_sum_matches_concat():
+    """Folding with running group-sums gives the same merged result"""
+    frames = make_frames()
+    expected = merge_sheets_by_group({"火災搶救設備": pd.concat(frames, ignore_index=True)})
+
+    acc = SheetAccumulator(chunk_rows=50, group_keys=MERGE_REQUIRED_KEYS)
+    for df in frames:
+        acc.add("火災搶救設備", df)
+    result = merge_sheets_by_group(acc.finalize())
+
+    pd.testing.assert_frame_equal(result["火災搶救設備"], expected["火災搶救設備"])
+
+
+def test_spill_to_disk_keeps_rows_and_order():
+    """Over budget, group-summed sheets spill without losing rows; concatenated ones stay"""
+    frames = make_frames()
+    expected = merge_sheets_by_group({"火災搶救設備": pd.concat(frames, ignore_index=True)})
+    acc = SheetAccumulator(memory_budget_mb=0.001, group_keys=MERGE_REQUIRED_KEYS)
+    for df in frames:
+        acc.add("火災搶救設備", df)
+        acc.add("Sheet1", df)
+    assert acc._spilled["火災搶救設備"] and not acc._spilled["Sheet1"]
+    tmp = acc._tmp
+    result = merge_sheets_by_group(acc.finalize())
+
+    pd.testing.assert_frame_equal(result["火災搶救設備"], expected["火災搶救設備"])
+    pd.testing.assert_frame_equal(result["Sheet1"], pd.concat(frames, ignore_index=True))
+    assert tmp is not None and not tmp.exists()
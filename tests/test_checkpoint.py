@@ -0,0 +1,49 @@
+"""Tests for checkpoint and resume"""
+
+import shutil
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Read_excels_as_one import high_tech_industry_chems_main
+from utils.checkpoint import Checkpoint, fingerprint
+
+COMPANIES = Path(__file__).parent / "test_data" / "sample_company"
+
+
+def test_resume_skips_finished_units(tmp_path):
+    """Finished units are skipped on resume until their inputs change"""
+    data = tmp_path / "a.xlsx"
+    data.write_bytes(b"1")
+    log = tmp_path / "checkpoint.jsonl"
+    calls = []
+
+    Checkpoint(log).run("stage", [data], [], calls.append, 1)
+    with open(log, "a", encoding="utf-8") as f:
+        f.write('{"unit": "torn')  # interrupted write
+    Checkpoint(log, resume=True).run("stage", [data], [], calls.append, 2)
+    assert calls == [1]
+
+    data.write_bytes(b"22")  # rewritten in place: the folder's listing stays cached
+    Checkpoint(log, resume=True).run("stage", [data], [], calls.append, 3)
+    assert calls == [1, 3]
+
+
+def test_fresh_run_discards_old_log(tmp_path):
+    """Without resume the previous log is discarded"""
+    log = tmp_path / "checkpoint.jsonl"
+    Checkpoint(log).mark("stage", fingerprint([]))
+    assert not Checkpoint(log).done("stage", fingerprint([]))
+    assert not log.exists()
+
+
+def test_resume_rebuilds_deleted_reports(tmp_path):
+    """A finished stage whose report was deleted runs again on resume"""
+    base = tmp_path / "company"
+    shutil.copytree(COMPANIES, base, ignore=shutil.ignore_patterns("Output"))
+    high_tech_industry_chems_main(str(base), "/Output")
+    report = base / "Output" / "sort_by_hazmat.xlsx"
+    report.unlink()
+    high_tech_industry_chems_main(str(base), "/Output", options={"resume": True})
+    assert report.exists()
@@ -0,0 +1,46 @@
+"""Tests for the columnar record builder"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.columns import ColumnBuilder
+
+
+def test_builder_types_and_pads_ragged_columns():
+    """Float fields are float64, numeric columns inferred, text stays object; NaN pads"""
+    b = ColumnBuilder(floats=("count",))
+    b.extend("name", ["a", "b", "c"])
+    b.extend("content", [["x"], [None]])
+    b.extend("count", np.array(["1", "2"], dtype=object).astype(float))
+    b.append("qty", 5)
+    df = b.frame()
+
+    assert list(df.columns) == ["name", "content", "count", "qty"]
+    assert df["count"].dtype == "float64" and df["qty"].dtype == "float64"
+    assert df["name"].dtype == object and df["content"][1] == [None]
+    assert np.isnan(df["count"][2]) and np.isnan(df["qty"][1])
+
+    b.extend("count", [3.0, 4.0])  # still extendable after frame()
+    b.replace("name", ["z"])
+    df = b.frame()
+    assert df["count"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert df["name"][0] == "z" and len(df) == 4
+    assert df.columns[0] == "name"
+
+
+def test_short_columns_are_padded_by_type():
+    """Object columns are padded with None, float and numeric columns with NaN"""
+    b = ColumnBuilder(floats=("count",))
+    b.extend("name", ["a", 1])
+    b.extend("content", [["x"]])
+    b.extend("count", [1.0])
+    b.extend("qty", [1, None, 3, 4])
+    df = b.frame()
+    assert df["name"].dtype == object and df["name"].tolist()[2:] == [None, None]
+    assert df["content"].tolist()[1:] == [None, None, None]
+    assert df["count"].dtype == "float64" and df["count"][1:].isna().all()
+    assert df["qty"].dtype == "float64" and np.isnan(df["qty"][1])
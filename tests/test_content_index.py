@@ -0,0 +1,51 @@
+"""Tests for duplicate detection by content hash"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Read_excels_as_one import process_folder_tree
+from utils import content_index, scanner
+
+COMPANIES = Path(__file__).parent / "test_data" / "sample_company"
+
+
+def _tree_with_copy(tmp_path) -> Path:
+    base = tmp_path / "company"
+    shutil.copytree(COMPANIES, base, ignore=shutil.ignore_patterns("Output"))
+    shutil.copytree(base / "Company_A", base / "Company_C")
+    scanner.clear_cache()
+    return base
+
+
+def test_copied_folder_is_parsed_once_or_skipped(tmp_path, monkeypatch):
+    """Copies reuse the first parse; with skip_duplicates a folder of copies writes nothing"""
+    hashed = []
+    hash_file = content_index.hash_file
+    monkeypatch.setattr(content_index, "hash_file", lambda p: hashed.append(p) or hash_file(p))
+    base = _tree_with_copy(tmp_path)
+    process_folder_tree(base, "Output", "top_ten_operating_chemicals", options={"dedup": True})
+    # Only same-size files are hashed up front; the others from the read-ahead bytes
+    assert sorted(Path(p).parent.name for p in hashed) == ["Company_A"] * 2 + ["Company_C"] * 2
+    out = base / "Output"
+    report = pd.read_csv(out / "duplicate_report.csv", encoding="utf-8-sig")
+    assert len(report) == 2
+    pairs = zip(report["canonical"], report["duplicate"])
+    assert all("Company_A" in c and "Company_C" in d for c, d in pairs)
+    original = pd.read_excel(out / "Company_A.xlsx", sheet_name=None)
+    copy = pd.read_excel(out / "Company_C.xlsx", sheet_name=None)
+    assert original.keys() == copy.keys()
+    for sheet in original:
+        pd.testing.assert_frame_equal(original[sheet], copy[sheet])
+
+    base = _tree_with_copy(tmp_path / "skip")
+    options = {"dedup": True, "skip_duplicates": True, "failure_policy": "abort"}
+    process_folder_tree(base, "Output", "top_ten_operating_chemicals", options=options)
+    out = base / "Output"
+    assert (out / "Company_A.xlsx").exists() and (out / "Company_B.xlsx").exists()
+    assert not (out / "Company_C.xlsx").exists()
+    assert not (out / "error_report.json").exists()
@@ -0,0 +1,73 @@
+"""Tests for the rollup cubes"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Read_excels_as_one import firefighter_training_survey_main, high_tech_industry_chems_main
+from utils.cube import (
+    FIREFIGHTER_HIERARCHY,
+    FIREFIGHTER_LEVELS,
+    INDUSTRY_DIMENSIONS,
+    INDUSTRY_MEASURES,
+    FactCube,
+    RollupCube,
+    update_industry_cube,
+)
+
+SURVEY = Path(__file__).parent / "test_data" / "sample_firefighter_survey"
+COMPANIES = Path(__file__).parent / "test_data" / "sample_company"
+
+
+def test_firefighter_cube_matches_city_summary(tmp_path):
+    """City cells equal analyze_ff_survey_files' 彙整 rows; nation sums cities; reload is lossless"""
+    base = tmp_path / "survey"
+    shutil.copytree(SURVEY, base, ignore=shutil.ignore_patterns("Output"))
+    firefighter_training_survey_main(base=str(base), out_rel="../Output", options={"cube": True})
+    path = base / "Output" / "firefighter_cube.csv"
+    cube = RollupCube.load(path, FIREFIGHTER_HIERARCHY, FIREFIGHTER_LEVELS)
+
+    grouped = pd.read_excel(
+        base / "Output" / "Distribution_by_city" / "Grouped_data.xlsx", sheet_name=None
+    )
+    for city, sheet in grouped.items():
+        summary = sheet[sheet.iloc[:, 0] == "彙整"].set_index(sheet.columns[1])
+        for measure in ("編制數量", "化災搶救基礎班", "未受訓"):
+            cells = cube.slice("city", measure, city=city).set_index("item")["value"]
+            for role, value in cells.items():
+                assert summary.loc[measure, role] == value, (city, measure, role)
+
+    cities = cube.slice("city", "編制數量").groupby("item")["value"].sum()
+    nation = cube.slice("nation", "編制數量").set_index("item")["value"]
+    pd.testing.assert_series_equal(nation.sort_index(), cities.sort_index(), check_names=False)
+    assert ("消防車輛設備", "水庫消防車") in cube.table("division").columns
+
+
+def test_industry_cube_rollups_and_incremental_update(tmp_path):
+    """Region x state roll-up equals sort_by_state; a removed company drops only its cells"""
+    base = tmp_path / "company"
+    shutil.copytree(COMPANIES, base, ignore=shutil.ignore_patterns("Output"))
+    high_tech_industry_chems_main(base=str(base), out_rel="/Output", options={"cube": True})
+    output = base / "Output"
+    path = output / "chems_cube.csv"
+    load = lambda: FactCube.load(path, INDUSTRY_DIMENSIONS, INDUSTRY_MEASURES, "company")
+    cube = load()
+
+    by_state = pd.read_excel(output / "sort_by_state.xlsx", sheet_name=None)
+    for region, sheet in by_state.items():
+        cells = cube.rollup("state", region=region).set_index("state")["max_kg"]
+        for state, kg in sheet.set_index("物質儲存型態")["廠內最大儲存量(公斤)"].items():
+            assert cells.get(state, 0) == kg, (region, state)
+    assert cube.rollup()["rows"].iloc[0] == cube.cells["rows"].sum()
+
+    companies = sorted(cube.cells["company"].unique())
+    kept = cube.slice(company=companies[1:])
+    (output / f"{companies[0]}.xlsx").unlink()
+    update_industry_cube(output, path)
+    updated = load()
+    assert set(updated.digests) == set(companies[1:])
+    pd.testing.assert_frame_equal(updated.cells, kept.astype(updated.cells.dtypes))
@@ -0,0 +1,77 @@
+"""Tests for the warm local job service"""
+
+import json
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Read_excels_as_one import run_job
+from utils import daemon
+from utils.events import EventBus, FileDone
+
+COMPANIES = Path(__file__).parent / "test_data" / "sample_company"
+
+
+def test_jobs_sent_to_the_service_stream_progress_and_reuse_parsed_workbooks(
+    tmp_path, monkeypatch
+):
+    """A client finds the service by its state file; events come back; a bad token is refused"""
+    monkeypatch.setenv("READ_EXCELS_DAEMON", str(tmp_path / "daemon.json"))
+    assert daemon.connect() is None
+
+    base = tmp_path / "company"
+    shutil.copytree(COMPANIES, base, ignore=shutil.ignore_patterns("Output"))
+    server = daemon.JobServer(run_job)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    try:
+        client = None
+        for _ in range(50):
+            client = daemon.connect()
+            if client is not None:
+                break
+            threading.Event().wait(0.1)
+        assert client is not None
+
+        bus = EventBus()
+        done = []
+        bus.subscribe(lambda e: isinstance(e, FileDone) and done.append(e.file))
+        client.run("chems", str(base), "/Output", {"failure_policy": "skip"}, events=bus)
+        assert done and (base / "Output" / "sort_by_hazmat.xlsx").exists()
+
+        client.run("chems", str(base), "/Output", {}, events=EventBus())
+        assert len(server.sessions) == 1  # the second run reused the first run's index
+        index = next(iter(server.sessions.values()))["content_index"]
+        assert all(index.digest(str(p)) for p in base.glob("Company_*/*.xlsx"))
+
+        forged = daemon.JobClient(client.port, "wrong")
+        assert not forged.ping()
+    finally:
+        server.shutdown()
+        thread.join(5)
+    assert not (tmp_path / "daemon.json").exists()
+
+
+def test_printed_output_goes_to_the_client_and_sessions_are_bounded(tmp_path, monkeypatch, capsys):
+    """A job's print() output is sent to its client; old sessions are dropped"""
+    monkeypatch.setenv("READ_EXCELS_DAEMON", str(tmp_path / "daemon.json"))
+    server = daemon.JobServer(lambda job, base, out, options: print("寫入 report.xlsx"), max_sessions=2)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    try:
+        client = daemon.JobClient(server.port, server.token)
+        conn, stream = client._request({"job": "chems", "base": "a", "out": None}, 5)
+        with conn, stream:
+            messages = [json.loads(line) for line in stream]
+        assert {"log": "寫入 report.xlsx", "level": "INFO"} in messages
+        assert "report.xlsx" not in capsys.readouterr().out
+
+        for base in ("b", "a", "c"):
+            server.session("chems", base, None, {})
+        assert [key[1] for key in server.sessions] == ["a", "c"]
+    finally:
+        server.shutdown()
+        thread.join(5)
@@ -0,0 +1,31 @@
+"""Tests for the output equivalence harness"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.equivalence import RunResult, compare_outputs, regressions
+
+
+def test_compare_tolerances_row_order_and_regressions():
+    """Float noise and declared row-order changes pass; real changes and slowdowns fail"""
+    expected = {"Output/a.xlsx": {"s": pd.DataFrame([["名稱", "數量"], ["x", 1.0], ["y", 2.0]])}}
+    noisy = {"Output/a.xlsx": {"s": pd.DataFrame([["名稱", "數量"], ["x", 1.0 + 1e-12], ["y", 2.0]])}}
+    swapped = {"Output/a.xlsx": {"s": pd.DataFrame([["名稱", "數量"], ["y", 2.0], ["x", 1.0]])}}
+    changed = {"Output/a.xlsx": {"s": pd.DataFrame([["名稱", "數量"], ["x", 1.5], ["y", 2.0]])}}
+
+    assert compare_outputs(expected, noisy) == []
+    assert len(compare_outputs(expected, swapped)) == 4
+    assert compare_outputs(expected, swapped, unordered=("Output/a.xlsx::s",)) == []
+    diff = compare_outputs(expected, changed)
+    assert [(d.where, d.expected, d.actual) for d in diff] == [("row 1, column 1", 1.0, 1.5)]
+    assert compare_outputs(expected, {})[0].where == "file"
+
+    base = RunResult(expected, 10.0, {"chems:sort_by_location": 10.0}, 100.0)
+    fast = RunResult(expected, 9.0, {"chems:sort_by_location": 9.0}, 110.0)
+    slow = RunResult(expected, 20.0, {"chems:sort_by_location": 20.0}, 200.0)
+    assert regressions(base, fast) == []
+    assert len(regressions(base, slow)) == 3
@@ -0,0 +1,44 @@
+"""Tests for the progress event API"""
+
+import multiprocessing
+import shutil
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Read_excels_as_one import process_folder_tree
+from utils.events import EventBus, FileDone, QueueSink, StageFinished, StageStarted
+
+COMPANY = Path(__file__).parent / "test_data" / "sample_company"
+
+
+def _child(sink):
+    sink.emit(FileDone("child.xlsx", True, 0.0))
+
+
+def test_folder_tree_emits_stage_and_file_events(tmp_path):
+    """One FileDone per input workbook inside the stage; events of a child process arrive"""
+    base = tmp_path / "company"
+    shutil.copytree(COMPANY, base, ignore=shutil.ignore_patterns("Output"))
+    events = EventBus()
+    seen = []
+    events.subscribe(seen.append)
+    events.subscribe(lambda event: 1 / 0)  # a broken listener does not stop the run
+
+    process_folder_tree(base, "Output", "top_ten_operating_chemicals", options={"events": events})
+
+    started, finished = seen[0], seen[-1]
+    assert isinstance(started, StageStarted) and started.stage == "process_folder_tree"
+    assert isinstance(finished, StageFinished) and finished.ok
+    assert sum(isinstance(e, FileDone) for e in seen) == started.files > 0
+    assert events.progress().files_per_second > 0
+
+    queue = multiprocessing.Queue()
+    listener = events.listen(queue)
+    child = multiprocessing.Process(target=_child, args=(QueueSink(queue),))
+    child.start()
+    child.join()
+    queue.put(None)
+    listener.join(timeout=10)
+    assert seen[-1].file == "child.xlsx"
@@ -0,0 +1,41 @@
+"""Tests for used-range trimming"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.extent import used_ranges
+from utils.read_data import read_data
+
+
+def test_phantom_rows_are_not_read(tmp_path):
+    """Formatting down to far rows/columns is trimmed; the frames stay the same"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "設備"
+    ws.append(["設備名稱", "數量"])
+    for i in range(5):
+        ws.append([f"設備{i}", f"1,00{i}"])
+    fill = PatternFill("solid", fgColor="FFFF00")
+    for r in range(10, 5001):
+        ws.cell(r, 1).fill = fill
+    ws.cell(20, 80).fill = fill
+    wb.create_sheet("空白")
+    path = tmp_path / "phantom.xlsx"
+    wb.save(path)
+
+    ranges = used_ranges(path)
+    assert ranges["設備"][:2] == (6, 2)
+    assert ranges["設備"].declared_rows == 5000
+    assert ranges["空白"].rows == 0
+
+    keys, values = read_data({}).read_one_excel(str(path))
+    expected = pd.read_excel(path, sheet_name=None, thousands=",")
+    assert keys == list(expected)
+    for got, want in zip(values, expected.values()):
+        pd.testing.assert_frame_equal(got, want)
@@ -0,0 +1,75 @@
+"""Tests for the per-file failure policies and the error report"""
+
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import read_data
+from utils.failures import ErrorReport
+
+COMPANY = Path(__file__).parent / "test_data" / "sample_company" / "Company_A"
+CHEMICALS = COMPANY / "公共危險物品運作調查表.xlsx"
+
+
+def _read(folder, policy, pattern="top_ten_operating_chemicals"):
+    report = ErrorReport(policy)
+    reader = read_data.read_data(
+        {
+            "folder_path": str(folder),
+            "pattern": pattern,
+            "error_report": report,
+            "retry_delay": 0,
+        }
+    )
+    return [Path(f).name for f, _ in reader.read_excel_files()], report
+
+
+def test_skip_keeps_other_results_and_writes_the_report(tmp_path):
+    """A broken workbook is left out and listed in error_report.json; abort re-raises"""
+    shutil.copy(CHEMICALS, tmp_path / "good.xlsx")
+    (tmp_path / "broken.xlsx").write_bytes(b"not a workbook")
+
+    files, report = _read(tmp_path, "skip")
+    assert files == ["good.xlsx"]
+    out = json.loads(report.write(tmp_path / "Output").read_text(encoding="utf-8"))
+    assert out["policy"] == "skip"
+    assert [Path(f).name for f in out["failed_files"]] == ["broken.xlsx"]
+    (error,) = out["errors"]
+    assert (error["stage"], error["action"]) == ("read", "skipped")
+    assert error["error_type"] and error["traceback"]
+
+    with pytest.raises(ValueError):
+        _read(tmp_path, "abort")
+
+
+def test_retry_reads_again_but_not_after_pattern_errors(tmp_path, monkeypatch):
+    """A read that fails once is recovered from disk; a missing marker row is not retried"""
+    shutil.copy(CHEMICALS, tmp_path / "good.xlsx")
+    original = read_data.read_data.read_one_excel
+    failed = []
+
+    def flaky(self, file_path, engine=None, name=None):
+        if not failed:
+            failed.append(name)
+            raise OSError("file is still being copied")
+        return original(self, file_path, engine, name)
+
+    monkeypatch.setattr(read_data.read_data, "read_one_excel", flaky)
+    files, report = _read(tmp_path, "retry")
+    assert files == ["good.xlsx"] and failed
+    assert [r["action"] for r in report.records] == ["retrying", "recovered"]
+    assert report.failed_files() == []
+
+    training = tmp_path / "training"
+    training.mkdir()
+    sheet = pd.DataFrame({"a": ["x"], "b": ["演練"]})
+    sheet.to_excel(training / "no_marker.xlsx", sheet_name="證照及演練", index=False)
+    files, report = _read(training, "retry", pattern="industry_rescue_equipment")
+    assert files == []
+    assert [(r["stage"], r["action"]) for r in report.records] == [("pattern", "skipped")]
@@ -0,0 +1,51 @@
+"""Tests for the dictionary-based name normalization"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.data_cleaners import clean_chems
+from utils.names import REVIEW, NameNormalizer, normalize_name
+
+
+def test_names_map_to_dictionary_entries_and_near_misses_are_reported(tmp_path):
+    """Width and space variants and aliases merge; similar names are only listed for review"""
+    dictionary = tmp_path / "names.csv"
+    pd.DataFrame(
+        [
+            ["chemical", "光阻剝離劑(STM80)", ""],
+            ["chemical", "異丙醇", "IPA"],
+            ["chemical", "氫氧化四甲基銨溶液", "TMAH"],
+            ["chemical", "Sulfuric acid 98%", ""],
+            ["equipment", "空氣呼吸器", "SCBA"],
+        ],
+        columns=["kind", "canonical", "alias"],
+    ).to_csv(dictionary, index=False)
+    names = NameNormalizer(dictionary)
+
+    assert normalize_name(" 異丙醇 （廢液） ") == "異丙醇(廢液)"
+    assert names.match("chemical", "ＩＰＡ").name == "異丙醇"
+    assert names.match("chemical", "光阻剝離劑 (STM80)").name == "光阻剝離劑(STM80)"
+    different = {
+        "氫氧化四乙基銨溶液": "氫氧化四甲基銨溶液",
+        "光阻剝離劑(STM81)": "光阻剝離劑(STM80)",
+        "Sulfuric acid 96%": "Sulfuric acid 98%",
+    }
+    for name, entry in different.items():
+        m = names.match("chemical", name)
+        assert m.name == name and m.suggestion == entry and REVIEW <= m.score < 1.0
+    assert names.match("equipment", "ipa").name == "ipa"  # other kind
+    near = names.match("chemical", "異丙醇(廢液)")
+    assert near.name == "異丙醇(廢液)" and near.suggestion == "異丙醇"
+
+    df = pd.DataFrame(
+        {"化學物質名稱": ["IPA", " 異丙醇", 7], "廠內最大儲存量(公斤)": ["10", "20", "3"]}
+    )
+    cleaned = names.cleaner("chemical", ["化學物質名稱"], clean_chems)(df)
+    assert cleaned["化學物質名稱"].tolist() == ["異丙醇", "異丙醇", "7"]
+
+    report = pd.read_csv(names.write_report(tmp_path), encoding="utf-8-sig")
+    assert sorted(report["name"]) == sorted([*different, "異丙醇(廢液)"])
@@ -0,0 +1,69 @@
+"""Tests for atomic, locked output writes"""
+
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import scanner
+from utils.output_excel import _break_lock, output_as, output_lock
+
+
+def test_concurrent_writes_are_whole_and_hidden(tmp_path):
+    """Parallel writers never interleave; failed writes leave the old file and no temp files"""
+    target = tmp_path / "Sorted_data.xlsx"
+    params = {
+        "folder_path": str(tmp_path),
+        "output_path": str(tmp_path),
+        "file_name": target.name,
+    }
+
+    def write(n):
+        output_as({"北部園區": pd.DataFrame({"n": [n] * 200})}, params)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    df = pd.read_excel(target)
+    assert len(df) == 200 and df["n"].nunique() == 1
+
+    with pytest.raises(ValueError):
+        output_as({}, params)
+    assert pd.read_excel(target)["n"].nunique() == 1
+    assert [p.name for p in tmp_path.iterdir()] == [target.name]
+
+    with output_lock(target) as lock:
+        assert lock.exists()
+        with pytest.raises(TimeoutError):
+            with output_lock(target, timeout=0.2):
+                pass
+        scanner.clear_cache()
+        assert [e.name for e in scanner.list_files(tmp_path)] == [target.name]
+    assert not lock.exists()
+
+
+def test_lock_of_a_dead_writer_is_broken_but_a_fresh_one_is_kept(tmp_path):
+    """A lock whose process has exited is removed at once; breaking it never deletes a newer lock"""
+    target = tmp_path / "Sorted_data.xlsx"
+    lock = tmp_path / f"{scanner.WRITE_PREFIX}{target.name}.lock"
+    writer = subprocess.Popen([sys.executable, "-c", "pass"])
+    writer.wait()
+    dead = f"{socket.gethostname()} {writer.pid} 2026-01-01T00:00:00"
+    lock.write_text(dead, encoding="utf-8")
+    start = time.monotonic()
+    with output_lock(target, timeout=5):
+        assert time.monotonic() - start < 1
+        fresh = lock.read_text(encoding="utf-8")
+        assert fresh != dead
+        _break_lock(lock, dead)  # a second waiter that also saw the dead lock
+        assert lock.read_text(encoding="utf-8") == fresh
+    assert list(tmp_path.iterdir()) == []
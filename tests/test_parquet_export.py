@@ -0,0 +1,54 @@
+"""Tests for the Parquet dataset export"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.parquet_export import SCHEMAS, export_parquet, industry_tables
+
+
+def _company_output(path: Path) -> None:
+    df = pd.DataFrame(
+        {
+            "化學物質名稱": ["乙醇", "丙酮"],
+            "容器材質": ["非金屬容器", "金屬容器"],
+            "廠內最大儲存量(公斤)": ["1,200", None],
+            "廠內最大儲存量(公升)": [200, 30],
+        }
+    )
+    with pd.ExcelWriter(path) as writer:
+        df.to_excel(writer, sheet_name="竹科", index=False)
+
+
+def test_industry_tables_have_fixed_typed_schema(tmp_path):
+    """Rows carry region/park/company keys; quantities become float columns"""
+    _company_output(tmp_path / "Company_A.xlsx")
+    pd.DataFrame({"x": [1]}).to_excel(tmp_path / "Sorted_data.xlsx", index=False)
+
+    df = industry_tables(tmp_path, "chems")["industry_chemicals"]
+
+    assert list(df.columns) == list(SCHEMAS["industry_chemicals"])
+    assert df[["region", "park", "company"]].drop_duplicates().values.tolist() == [
+        ["北部園區", "竹科", "Company_A"]
+    ]
+    assert df["max_kg"].dtype == "float64"
+    assert df["max_kg"].tolist()[0] == 1200.0 and pd.isna(df["max_kg"].tolist()[1])
+    assert df["max_l"].tolist() == [200.0, 30.0]
+    assert df["pressure_kg_cm2"].isna().all()
+
+
+def test_export_writes_partitions(tmp_path):
+    """Datasets are partitioned by region and park and read back with pruning"""
+    pytest.importorskip("pyarrow")
+    _company_output(tmp_path / "Company_A.xlsx")
+
+    export_parquet(tmp_path, tmp_path / "parquet", "chems")
+
+    table = tmp_path / "parquet" / "industry_chemicals"
+    assert (table / "region=北部園區" / "park=竹科").is_dir()
+    back = pd.read_parquet(table, filters=[("region", "=", "北部園區")])
+    assert sorted(back["name"]) == ["丙酮", "乙醇"]
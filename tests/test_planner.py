@@ -0,0 +1,33 @@
+"""Tests for the dry-run workload planner"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.history import RunHistory
+from utils.planner import makespan, plan_workload
+
+COMPANY = Path(__file__).parent / "test_data" / "sample_company"
+
+
+def test_plan_uses_history_rates(tmp_path):
+    """Input-stage estimates scale with recorded seconds per MB; LPT packs folders"""
+    assert makespan([4, 3, 3, 2], 2) == 6
+    folders = sorted(p for p in COMPANY.iterdir() if p.is_dir() and p.name != "Output")
+    units = [
+        ("chems:process_folder_tree", str(f), [str(x) for x in sorted(f.glob("*.xlsx"))])
+        for f in folders
+    ]
+    history = RunHistory(tmp_path / "run_history.jsonl")
+    history.append(
+        {"stage": "chems:process_folder_tree", "seconds": 10.0, "input_bytes": 1048576,
+         "files": 1, "workers": 1, "ok": True}
+    )
+    plan = plan_workload(units, ["chems:process_folder_tree"], history, workers=1)
+
+    stage = plan["stages"][0]
+    assert stage["history_runs"] == 1
+    assert stage["files"] == sum(len(u[2]) for u in units) > 0
+    assert stage["rows"] > 0
+    assert abs(stage["seconds"] - stage["bytes"] / 1048576 * 10.0) < 1e-6
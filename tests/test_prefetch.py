@@ -0,0 +1,80 @@
+"""Tests for the background read-ahead of workbooks"""
+
+import io
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import prefetch
+from utils.prefetch import Prefetcher
+
+
+def _files(tmp_path, n, size=100):
+    paths = []
+    for i in range(n):
+        path = tmp_path / f"f{i}.xlsx"
+        path.write_bytes(bytes([i]) * size)
+        paths.append(str(path))
+    return paths
+
+
+def _tracking(monkeypatch):
+    started = []
+    lock = threading.Lock()
+    original = prefetch.read_bytes
+
+    def read_bytes(path):
+        with lock:
+            started.append(path)
+        return original(path)
+
+    monkeypatch.setattr(prefetch, "read_bytes", read_bytes)
+    return started
+
+
+def _read_ahead(started, n, expected):
+    """Files started beyond the yielded one, once the expected reads had time to start."""
+    for _ in range(200):
+        if len(started) - n - 1 >= expected:
+            break
+        threading.Event().wait(0.01)
+    return len(started) - n - 1
+
+
+def test_results_come_back_in_order_within_depth_and_byte_bounds(tmp_path, monkeypatch):
+    """While a file is parsed, ``depth`` files are read ahead, within ``max_bytes`` (but one)"""
+    paths = _files(tmp_path, 8)
+    started = _tracking(monkeypatch)
+    for n, (path, source) in enumerate(Prefetcher(paths, depth=3)):
+        assert path == paths[n]
+        assert isinstance(source, io.BytesIO) and source.getvalue() == bytes([n]) * 100
+        assert _read_ahead(started, n, min(3, 7 - n)) == min(3, 7 - n)
+
+    started.clear()
+    for n, _ in enumerate(Prefetcher(paths, depth=8, max_bytes=250)):
+        assert _read_ahead(started, n, min(1, 7 - n)) == min(1, 7 - n)  # 100 held + 100 ahead
+
+    started.clear()
+    for n, _ in enumerate(Prefetcher(paths, depth=8, max_bytes=10)):
+        assert _read_ahead(started, n, min(1, 7 - n)) == min(1, 7 - n)  # still one in flight
+
+def test_read_errors_reach_the_caller(tmp_path, monkeypatch):
+    """OSError yields the path for the parser to report; other errors are raised"""
+    paths = _files(tmp_path, 3)
+    missing = str(tmp_path / "missing.xlsx")
+    sources = dict(Prefetcher([paths[0], missing, paths[1]], depth=2))
+    assert sources[missing] == missing
+    assert sources[paths[1]].getvalue() == bytes([1]) * 100
+
+    def read_bytes(path):
+        if path == paths[1]:
+            raise ValueError("bad read")
+        return b""
+
+    monkeypatch.setattr(prefetch, "read_bytes", read_bytes)
+    with pytest.raises(ValueError, match="bad read"):
+        list(Prefetcher(paths, depth=2))
@@ -0,0 +1,34 @@
+"""Tests for the pre-flight workbook check"""
+
+import shutil
+import sys
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.preflight import preflight
+
+SURVEY = Path(__file__).parent / "test_data" / "sample_firefighter_survey"
+
+
+def test_detects_missing_anchor_and_renamed_header(tmp_path):
+    """A lost anchor row and a renamed header column fail only the broken files"""
+    files = []
+    for i, src in enumerate(sorted(SURVEY.rglob("*.xlsx"))[:3]):
+        dst = tmp_path / f"{i}.xlsx"
+        shutil.copy(src, dst)
+        files.append(str(dst))
+    wb = load_workbook(files[1])
+    wb["國內證書"]["C1"] = "大隊長(兼)"
+    for row in wb["基本資料"].iter_rows():
+        if row[0].value and "救災能量" in str(row[0].value):
+            row[0].value = None
+    wb.save(files[1])
+
+    results = preflight((f, "firefighter_rescue_survey") for f in files)
+
+    assert [r.status for r in results] == ["pass", "fail", "pass"]
+    problems = " ".join(results[1].problems)
+    assert "救災能量" in problems and "國內證書" in problems
@@ -0,0 +1,40 @@
+"""Tests for the top-K hazardous inventory ranking"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.ranking import NATION, HazmatRanking
+
+KG = "廠內最大儲存量(公斤)"
+
+
+def sheet(*rows):
+    return pd.DataFrame(rows, columns=["化學物質名稱", KG, "管制量倍數"])
+
+
+def test_ranking_merges_company_lists_and_replaces_resubmissions(tmp_path):
+    """Top K equals a full sort; a resubmitted or removed company only changes its own entries"""
+    ranking = HazmatRanking(k=2, path=tmp_path / "hazmat_ranking.json")
+    ranking.ingest("A", {"新竹科學園區": sheet(["硫酸", 500, 2], ["硫酸", 100, 1], ["氨", 50, 1])})
+    ranking.ingest("B", {"台南科學園區": sheet(["氯氣", "1,000", 5], ["氫氟酸", 300, None])})
+    ranking.ingest("C", {"竹南科學園區": sheet(["氨", 400, 3]), "高雄科學園區": sheet(["硫酸", 20, 1])})
+
+    assert [e[0] for e in ranking.top_chemicals(KG)] == [1000.0, 600.0]
+    assert ranking.top_chemicals(KG, "北部園區")[0] == (600.0, "A", "新竹科學園區", "硫酸")
+    assert ranking.top_companies(KG, "北部園區") == [(650.0, "A"), (400.0, "C")]
+    assert ranking.top_companies("管制量倍數", NATION)[0] == (5.0, "B")
+
+    ranking.ingest("B", {"台南科學園區": sheet(["氯氣", 10, 1])})
+    assert ranking.top_chemicals(KG)[0] == (600.0, "A", "新竹科學園區", "硫酸")
+    ranking.retain(["A", "B"])
+    assert [c for _, c in ranking.top_companies(KG)] == ["A", "B"]
+
+    ranking.save()
+    assert HazmatRanking(k=2, path=ranking.path).companies == ranking.companies
+    assert not HazmatRanking(k=3, path=ranking.path).companies  # lists too short for k=3
+    report = ranking.report()
+    assert list(report)[0] == NATION and set(report) == {NATION, "北部園區", "南部園區"}
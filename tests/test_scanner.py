@@ -0,0 +1,37 @@
+"""Tests for the shared directory scanner"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utils.scanner as scanner
+
+
+def test_list_with_glob_rules(tmp_path):
+    """Configured and per-call exclude patterns apply to files and folders"""
+    (tmp_path / "Company_A").mkdir()
+    (tmp_path / "Output").mkdir()
+    (tmp_path / "a.xlsx").write_bytes(b"12345")
+    (tmp_path / "~$a.xlsx").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("x")
+    try:
+        scanner.configure(exclude=["~$*"])
+        files = scanner.list_files(tmp_path, include=["*.xlsx"])
+        dirs = scanner.list_dirs(tmp_path, exclude=("Output",))
+    finally:
+        scanner.configure()
+
+    assert [e.name for e in files] == ["a.xlsx"]
+    assert files[0].size is None and scanner.entry(files[0].path).size == 5
+    assert [e.name for e in dirs] == ["Company_A"]
+
+
+def test_cached_listing_sees_new_files(tmp_path):
+    """A cached listing is refreshed after invalidate()"""
+    (tmp_path / "a.xlsx").write_bytes(b"")
+    assert len(scanner.list_files(tmp_path)) == 1
+    (tmp_path / "b.xlsx").write_bytes(b"")
+    scanner.invalidate(tmp_path)
+    assert sorted(e.name for e in scanner.list_files(tmp_path)) == ["a.xlsx", "b.xlsx"]
+    assert [e.name for e in scanner.walk(tmp_path.parent) if e.name == "b.xlsx"]
@@ -0,0 +1,87 @@
+"""Tests for the cost model ordering and sizing parallel parsing"""
+
+import ctypes
+import json
+import shutil
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from Read_excels_as_one import high_tech_industry_chems_main
+from utils import history, scanner, schedule
+from utils.history import RunHistory, peak_rss_mb
+from utils.schedule import DEFAULT_SECONDS_PER_SHEET, CostModel
+
+
+def test_cost_orders_largest_first_and_bounds_workers(tmp_path):
+    """Size and sheet count both add cost; history sets seconds per MB; workers <= files"""
+    big = tmp_path / "big.xlsx"
+    pd.DataFrame({"a": range(20000)}).to_excel(big, index=False)
+    many = tmp_path / "many.xlsx"
+    with pd.ExcelWriter(many) as w:
+        for i in range(3):
+            pd.DataFrame({"a": [i]}).to_excel(w, sheet_name=f"s{i}", index=False)
+    one = tmp_path / "one.xlsx"
+    pd.DataFrame({"a": [1]}).to_excel(one, index=False)
+
+    history = RunHistory(tmp_path / "run_history.jsonl")
+    history.append(
+        {"stage": "chems:process_folder_tree", "seconds": 10.0, "input_bytes": 1048576,
+         "files": 1, "workers": 1, "ok": True}
+    )
+    model = CostModel(history, "chems:process_folder_tree")
+    assert model.seconds_per_mb == 10.0
+    paths = [str(one), str(many), str(big)]
+    assert model.largest_first(paths) == [str(big), str(many), str(one)]
+    assert model.cost(many) - model.cost(one) > 2 * DEFAULT_SECONDS_PER_SHEET * 0.99
+    assert 1 <= model.workers(paths) <= 3
+
+
+def test_history_records_pool_workers_and_rates_are_per_worker(tmp_path):
+    """A 2-worker run records workers=2 for the parsing stage; rates scale time by workers"""
+    base = tmp_path / "company"
+    companies = Path(__file__).parent / "test_data" / "sample_company"
+    shutil.copytree(companies, base, ignore=shutil.ignore_patterns("Output"))
+    scanner.clear_cache()
+    high_tech_industry_chems_main(base=str(base), options={"parse_workers": 2})
+    lines = (base / "Output" / "run_history.jsonl").read_text(encoding="utf-8").splitlines()
+    workers = {r["stage"]: r["workers"] for r in map(json.loads, lines)}
+    assert workers["chems:process_folder_tree"] == 2
+    assert workers["chems:analyze_grouped"] == 1
+
+    history = RunHistory(tmp_path / "run_history.jsonl")
+    history.append(
+        {"stage": "chems:process_folder_tree", "seconds": 10.0, "input_bytes": 1048576,
+         "files": 1, "workers": 2, "ok": True}
+    )
+    assert CostModel(history, "chems:process_folder_tree").seconds_per_mb == 20.0
+
+
+
+@pytest.mark.skipif(history.resource is None, reason="no rusage on this platform")
+def test_peak_memory_counts_finished_child_processes(monkeypatch):
+    """A finished worker process's peak memory is part of the measured peak"""
+    usage = {history.resource.RUSAGE_SELF: 100, history.resource.RUSAGE_CHILDREN: 300}
+    monkeypatch.setattr(history.os, "uname", lambda: SimpleNamespace(sysname="Linux"))
+    monkeypatch.setattr(
+        history.resource, "getrusage", lambda who: SimpleNamespace(ru_maxrss=usage[who] * 1024)
+    )
+    assert peak_rss_mb() == 400
+
+
+def test_available_memory_on_windows(monkeypatch):
+    """On Windows the available memory comes from GlobalMemoryStatusEx"""
+
+    def status(ref):
+        assert ref._obj.dwLength == ctypes.sizeof(ref._obj)
+        ref._obj.ullAvailPhys = 3 * 1024**3
+        return 1
+
+    monkeypatch.setattr(schedule, "_kernel32", lambda: SimpleNamespace(GlobalMemoryStatusEx=status))
+    monkeypatch.setattr(schedule.os, "name", "nt")
+    assert schedule.available_memory_mb() == 3072
@@ -0,0 +1,77 @@
+"""Tests for the site grid index"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import spatial
+from utils.spatial import INVENTORY_COLUMNS, SiteIndex, haversine_km, parse_coordinate
+
+
+def test_radius_and_nearest_queries_match_a_full_scan():
+    """Grid queries return the same sites as measuring every site; capacities are summed"""
+    assert abs(parse_coordinate("121°01'25.0") - 121.023611) < 1e-6
+    assert parse_coordinate("24.8") == 24.8 and parse_coordinate("未填") is None
+
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(22.0, 25.3, 300)
+    lon = rng.uniform(120.0, 121.9, 300)
+    rows = []
+    for i in range(300):
+        site = [f"C{i}", "園區", "北部園區", lat[i], lon[i]]
+        rows.append(site + ["equipment", "滅火器", 10.0, float(i % 3), None, None])
+        if i % 2:
+            rows.append(site + ["equipment", "自攜式空氣呼吸器(SCBA)", 2.0, 1.0, None, None])
+    index = SiteIndex(pd.DataFrame(rows, columns=INVENTORY_COLUMNS))
+
+    distances = haversine_km(24.78, 121.0, lat, lon)
+    found = index.within(24.78, 121.0, 30.0)
+    assert sorted(found.sites["company"]) == sorted(f"C{i}" for i in np.flatnonzero(distances <= 30))
+    assert found.sites["distance_km"].is_monotonic_increasing
+
+    scba = index.within(24.78, 121.0, 30.0, "equipment", "空氣呼吸器")
+    expected = [i for i in np.flatnonzero(distances <= 30) if i % 2]
+    assert sorted(scba.sites["company"]) == sorted(f"C{i}" for i in expected)
+    assert scba.totals["available"] == len(expected)
+
+    nearest = index.nearest(24.78, 121.0, 5, "equipment", "SCBA")
+    odd = np.arange(1, 300, 2)
+    assert list(nearest.sites["company"]) == [f"C{i}" for i in odd[np.argsort(distances[odd])][:5]]
+
+
+def test_chemicals_join_the_site_of_their_park(monkeypatch):
+    """Two sites of one company in one region each get only their own park's chemicals"""
+    keys = ["company", "park", "region"]
+    basic = pd.DataFrame(
+        [
+            ["C", "竹科", "北部園區", "經度", "121.0"],
+            ["C", "竹科", "北部園區", "緯度", "24.8"],
+            ["C", "竹南", "北部園區", "經度", "120.9"],
+            ["C", "竹南", "北部園區", "緯度", "24.7"],
+        ],
+        columns=[*keys, "field", "value"],
+    )
+    equipment = pd.DataFrame(columns=[*keys, "name", "quantity", "available"])
+    chemicals = pd.DataFrame(
+        [
+            ["C", "新竹科學園區", "北部園區", "異丙醇", 10.0, 0.0],
+            ["C", "竹南園區", "北部園區", "丙酮", 5.0, 0.0],
+            ["C", "龍潭園區", "北部園區", "乙醇", 1.0, 0.0],
+        ],
+        columns=[*keys, "name", "max_kg", "max_l"],
+    )
+    tables = {
+        "equipment": {"industry_basic_info": basic, "industry_equipment": equipment},
+        "chems": {"industry_chemicals": chemicals},
+    }
+    monkeypatch.setattr(spatial, "industry_tables", lambda path, job: tables[job])
+
+    inventory = spatial.site_inventory("equipment", "chems")
+    parks = dict(zip(inventory["name"], inventory["park"]))
+    assert parks == {"異丙醇": "竹科", "丙酮": "竹南", "乙醇": "竹南"}  # 龍潭: no site, first one
+    index = SiteIndex(inventory)
+    assert index.within(24.8, 121.0, 200.0, "chemical").totals["max_kg"] == 16.0
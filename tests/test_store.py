@@ -0,0 +1,39 @@
+"""Tests for the SQLite survey store"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utils.scanner as scanner
+from utils.store import SurveyStore
+
+
+def test_incremental_ingest_and_report(tmp_path):
+    """Unchanged workbooks are not loaded twice; reports group by park region"""
+    workbook = tmp_path / "Company_A" / "chems.xlsx"
+    workbook.parent.mkdir()
+    workbook.write_bytes(b"x")
+    df = pd.DataFrame(
+        {
+            "化學物質名稱": ["乙醇", "異丙醇", "乙醇"],
+            "廠內最大儲存量(公斤)": [1000, "5 kg", None],
+            "廠內最大儲存量(公升)": [None, None, 200],
+        }
+    )
+    store = SurveyStore(tmp_path / "survey.sqlite")
+    args = ("top_ten_operating_chemicals", workbook.parent, ["新竹科學園區"], df)
+    assert store.ingest(workbook, *args)
+    assert not store.ingest(workbook, *args)
+
+    report = store.report("sort_by_hazmat")["北部園區"]
+    assert report["化學物質名稱"].tolist() == ["乙醇", "異丙醇"]
+    assert report["廠內最大儲存量(公斤)"].tolist() == [1000.0, 5.0]
+
+    workbook.unlink()
+    scanner.invalidate(workbook.parent)
+    assert store.prune() == 1
+    assert store.query("SELECT COUNT(*) AS n FROM chemicals")["n"][0] == 0
+    store.close()
@@ -0,0 +1,27 @@
+"""Tests for template plans"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.templates import TemplatePlans
+
+
+def test_cached_offset_is_checked_before_reuse(tmp_path):
+    """A cached marker row is reused while its own cell still holds the marker, else searched again"""
+    plans = TemplatePlans(tmp_path / "plans.json")
+    first = pd.DataFrame({"項目": ["a", "b", "救災能量", "c"]})
+    moved = pd.DataFrame({"項目": ["a", "救災能量", "b", "c"]})
+
+    plan = plans.plan(["基本資料"], [first])
+    assert plans.row(plan, "救災能量", first, 0, "救災能量") == 2
+    assert plans.row(plan, "救災能量", first, 0, "救災能量") == 2
+    assert plans.hits == 1
+    assert plans.row(plans.plan(["基本資料"], [moved]), "救災能量", moved, 0, "救災能量") == 1
+
+    plans.save()
+    reloaded = TemplatePlans(tmp_path / "plans.json")
+    assert len(reloaded) == 1
@@ -0,0 +1,54 @@
+"""Tests for watch mode polling"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.watch import Watcher
+
+
+def test_changes_close_together_form_one_batch(tmp_path):
+    """Files written within the settle period are handled as one batch"""
+    (tmp_path / "Output").mkdir()
+    (tmp_path / "a.xlsx").write_bytes(b"1")
+    batches = []
+    watcher = Watcher(
+        [tmp_path], batches.append, interval=0.02, settle=0.3, exclude=("Output",)
+    )
+
+    def arrive():
+        time.sleep(0.1)
+        (tmp_path / "b.xlsx").write_bytes(b"2")
+        (tmp_path / "Output" / "b.xlsx").write_bytes(b"2")
+        time.sleep(0.1)
+        (tmp_path / "a.xlsx").write_bytes(b"11")
+
+    threading.Thread(target=arrive).start()
+    watcher.run(max_batches=1)
+
+    assert batches == [[str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")]]
+
+
+def test_files_written_during_a_batch_and_failed_batches_are_handled_next(tmp_path):
+    """The pre-batch snapshot stays the baseline; a failed batch joins the next one"""
+    (tmp_path / "a.xlsx").write_bytes(b"1")
+    batches = []
+
+    def on_batch(paths):
+        batches.append(paths)
+        if len(batches) == 1:
+            (tmp_path / "b.xlsx").write_bytes(b"2")  # arrives while the batch runs
+            raise OSError("output is open in Excel")
+
+    watcher = Watcher([tmp_path], on_batch, interval=0.02, settle=0.1)
+    threading.Timer(0.1, lambda: (tmp_path / "a.xlsx").write_bytes(b"11")).start()
+    guard = threading.Timer(10, watcher.stop)  # fail instead of waiting for a lost file
+    guard.start()
+    watcher.run(max_batches=2)
+    guard.cancel()
+
+    a, b = str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")
+    assert batches == [[a], [a, b]]
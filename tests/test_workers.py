@@ -0,0 +1,70 @@
+"""Tests for parsing in worker processes with shared-memory results"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import read_data
+from utils.workers import SEGMENT_PREFIX, ParsePool, export, load
+
+SAMPLE = sorted((Path(__file__).parent / "test_data" / "sample_company").rglob("*.xlsx"))[0]
+CHEMICALS = SAMPLE.parent / "公共危險物品運作調查表.xlsx"
+
+
+def _segments():
+    return [n for n in os.listdir("/dev/shm") if n.startswith(SEGMENT_PREFIX)]
+
+
+@pytest.mark.skipif(
+    not Path("/dev/shm").is_dir() or multiprocessing.get_start_method() != "fork",
+    reason="needs POSIX shared memory and forked workers",
+)
+def test_pool_results_match_and_crashes_leave_no_segments(monkeypatch):
+    """Frames rebuilt from shared memory equal in-process parsing; a dead worker is survived"""
+    params = {"read_all_sheets": True}
+    keys, values = read_data.read_data(params).read_one_excel(str(SAMPLE))
+    original = read_data.read_data.read_one_excel
+
+    def crash_on_marker(self, path, engine=None, name=None):
+        if "crash" in str(path):
+            os._exit(1)
+        return original(self, path, engine, name)
+
+    monkeypatch.setattr(read_data.read_data, "read_one_excel", crash_on_marker)
+    pool = ParsePool(2)
+    try:
+        got_keys, got_values = pool.submit(str(SAMPLE), params).result()
+        assert got_keys == keys
+        for got, want in zip(got_values, values):
+            pd.testing.assert_frame_equal(got, want)
+
+        with pytest.raises(BrokenProcessPool):
+            pool.submit("crash.xlsx", params).result()
+        assert pool.submit(str(SAMPLE), params).result()[0] == keys
+        assert _segments() == []
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.skipif(not Path("/dev/shm").is_dir(), reason="needs POSIX shared memory")
+def test_text_columns_go_out_of_band():
+    """Text and object columns travel in the segment; the header only holds the layout"""
+    keys, values = read_data.read_data({"read_all_sheets": True}).read_one_excel(str(CHEMICALS))
+    frames = [pd.concat([df] * 200, ignore_index=True) for df in values]
+    for frames in (frames, [df.astype(object) for df in frames]):
+        result = export((keys, frames), f"{SEGMENT_PREFIX}_test_{os.getpid()}")
+        assert len(result.header) * 20 < sum(result.sizes)
+        got_keys, got_values = load(result)
+        assert got_keys == keys
+        for got, want in zip(got_values, frames):
+            pd.testing.assert_frame_equal(got, want)
+            cells = zip(got.to_numpy().ravel(), want.to_numpy().ravel())
+            assert all(type(a) is type(b) for a, b in cells)
+    assert _segments() == []
@@ -0,0 +1,164 @@
+"""Bounded-memory accumulation of per-file sheet tables."""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from utils.patterns import sum_group_columns
+
+
+class SheetAccumulator:
+    """
+    Collects the DataFrames produced for each sheet while files are read and
+    concatenates them at the end, without holding every per-file frame twice.
+
+    Frames are buffered per sheet and folded into one block every ``chunk_rows``
+    rows. Sheets that merge_sheets_by_group reduces with a plain group-sum are
+    folded with a running group-sum instead, so they only keep one row per group.
+    When the buffered data exceeds ``memory_budget_mb`` the largest group-summed
+    sheets are spilled to pickle files in a temporary directory and read back by
+    finalize().
+
+    The budget does not bound sheets that are only concatenated (chemicals,
+    equipment lists): finalize() returns all of their rows as one DataFrame, so
+    they stay in memory and are never spilled, and the concatenation copies them
+    once more.
+
+    Usage:
+        acc = SheetAccumulator(memory_budget_mb=256, group_keys=MERGE_REQUIRED_KEYS)
+        acc.add("消防車輛設備", df)
+        combined = acc.finalize()
+    """
+
+    def __init__(
+        self,
+        memory_budget_mb: float = 512,
+        chunk_rows: int = 50_000,
+        group_keys: Optional[list[str]] = None,
+        spill_dir: Optional[str] = None,
+    ):
+        """
+        Args:
+            memory_budget_mb: In-memory budget for buffered frames before spilling
+            chunk_rows: Number of buffered rows after which a sheet is folded into one block
+            group_keys: Sheets that get running group-sums (merge_sheets_by_group keys);
+                        leave empty when the result is not merged afterwards
+            spill_dir: Parent directory for spill files (default: system temp dir)
+        """
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.chunk_rows = chunk_rows
+        self.group_keys = list(group_keys or [])
+        self.spill_dir = spill_dir
+        self._frames = defaultdict(list)  # sheet -> in-memory frames, oldest first
+        self._spilled = defaultdict(list)  # sheet -> pickle paths, oldest first
+        self._rows = defaultdict(int)  # sheet -> rows added since the last fold
+        self._sizes = defaultdict(int)  # sheet -> bytes held in memory
+        self._order = {}  # sheet -> None, preserves first-seen order
+        self._summed = set()  # sheets folded with a running group-sum
+        self._tmp: Optional[Path] = None
+        self._n_spills = 0
+
+    @property
+    def memory_usage(self) -> int:
+        """Bytes currently held in memory across all sheets."""
+        return sum(self._sizes.values())
+
+    def add(self, sheet: str, df: pd.DataFrame) -> None:
+        """Adds the rows of one file's table for ``sheet``."""
+        self._order.setdefault(sheet, None)
+        self._frames[sheet].append(df)
+        self._sizes[sheet] += _frame_bytes(df)
+        self._rows[sheet] += len(df)
+        if self._rows[sheet] >= self.chunk_rows:
+            self._fold(sheet)
+        if self.memory_usage > self.memory_budget:
+            self._reduce()
+
+    def finalize(self) -> dict[str, pd.DataFrame]:
+        """Returns one concatenated DataFrame per sheet and removes spill files."""
+        try:
+            combined = {}
+            for sheet in self._order:
+                parts = [pd.read_pickle(p) for p in self._spilled[sheet]]
+                parts.extend(self._frames[sheet])
+                combined[sheet] = pd.concat(parts, ignore_index=True)
+            return combined
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Drops buffered data and deletes the spill directory."""
+        self._frames.clear()
+        self._spilled.clear()
+        self._sizes.clear()
+        if self._tmp is not None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            self._tmp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _fold(self, sheet: str) -> None:
+        """Concatenates the buffered frames of a sheet, group-summing when allowed."""
+        frames = self._frames[sheet]
+        block = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        n_keys = sum_group_columns(sheet, self.group_keys) if self.group_keys else 0
+        if n_keys and block.shape[1] > n_keys and _summable(block, n_keys):
+            group_keys = block.columns[:n_keys].tolist()
+            block = block.groupby(
+                group_keys, as_index=False, dropna=False, sort=False
+            ).sum()
+            self._summed.add(sheet)
+        self._frames[sheet] = [block]
+        self._sizes[sheet] = _frame_bytes(block)
+        self._rows[sheet] = 0
+
+    def _reduce(self) -> None:
+        """Folds every sheet, then spills the largest group-summed ones until within budget."""
+        for sheet in list(self._frames):
+            if self._frames[sheet]:
+                self._fold(sheet)
+        for sheet in sorted(self._sizes, key=self._sizes.get, reverse=True):
+            if self.memory_usage <= self.memory_budget:
+                break
+            if self._frames[sheet] and sheet in self._summed:
+                self._spill(sheet)
+
+    def _spill(self, sheet: str) -> None:
+        if self._tmp is None:
+            self._tmp = Path(tempfile.mkdtemp(prefix="read_excels_", dir=self.spill_dir))
+        self._n_spills += 1
+        path = self._tmp / f"spill_{self._n_spills}.pkl"
+        frames = self._frames[sheet]
+        block = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        block.to_pickle(path)
+        logging.info(
+            f"Spilled {len(block)} rows of {sheet} to disk "
+            f"({self._sizes[sheet] / 1024 / 1024:.1f} MB)"
+        )
+        self._spilled[sheet].append(path)
+        self._frames[sheet] = []
+        self._sizes[sheet] = 0
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _summable(df: pd.DataFrame, n_keys: int) -> bool:
+    """A running group-sum is only exact when every summed column is numeric."""
+    values = df.iloc[:, n_keys:]
+    return all(
+        pd.api.types.is_numeric_dtype(t) or pd.api.types.is_bool_dtype(t)
+        for t in values.dtypes
+    )
@@ -0,0 +1,103 @@
+"""Checkpoints of finished work units so interrupted runs can resume."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from utils import scanner
+
+
+def fingerprint(paths: Iterable) -> str:
+    """Hash of the name, size and mtime of each path (missing paths count as absent)."""
+    h = hashlib.sha1()
+    for p in sorted(str(p) for p in paths):
+        e = scanner.entry(p)
+        h.update(f"{p}|{e.size}|{e.mtime}\n".encode() if e else f"{p}|-\n".encode())
+    return h.hexdigest()
+
+
+class Checkpoint:
+    """
+    Append-only log of finished units (a folder of a stage, or a whole stage).
+
+    Every finished unit is appended as one JSON line and flushed to disk, so a
+    crash or reboot loses at most the unit in progress; a torn last line is
+    ignored when the log is read back. A unit counts as done on resume only if
+    its input fingerprint is unchanged and its outputs still exist, so changed
+    inputs and the stages downstream of them are redone automatically.
+    """
+
+    def __init__(self, path, resume: bool = False):
+        """
+        Args:
+            path: Checkpoint log file (e.g. Output/checkpoint.jsonl)
+            resume: Continue from the existing log; otherwise start a new one
+        """
+        self.path = Path(path)
+        self.resume = resume
+        self._done: dict[str, str] = {}
+        self._lock = threading.Lock()
+        if resume and self.path.exists():
+            self._load()
+            logging.info(f"Resuming from {self.path} ({len(self._done)} finished units)")
+        elif self.path.exists():
+            self.path.unlink()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from an interrupted run
+                self._done[rec["unit"]] = rec["fingerprint"]
+
+    def done(self, unit: str, fp: str, outputs: Iterable = ()) -> bool:
+        """True when resuming and ``unit`` finished with the same input fingerprint."""
+        if not self.resume or self._done.get(unit) != fp:
+            return False
+        return all(Path(o).exists() for o in outputs)
+
+    def mark(self, unit: str, fp: str) -> None:
+        """Records ``unit`` as finished."""
+        rec = {
+            "unit": unit,
+            "fingerprint": fp,
+            "time": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._done[unit] = fp
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def run(
+        self,
+        unit: str,
+        inputs: Iterable,
+        outputs: Iterable,
+        fn: Callable,
+        *args,
+        **kwargs,
+    ) -> Optional[object]:
+        """
+        Calls ``fn(*args, **kwargs)`` unless ``unit`` already finished with the same
+        inputs, then records it. Returns fn's result, or None when skipped.
+        """
+        outputs = list(outputs)
+        fp = fingerprint(inputs)
+        if self.done(unit, fp, outputs):
+            logging.info(f"Skipping finished unit: {unit}")
+            return None
+        result = fn(*args, **kwargs)
+        self.mark(unit, fp)
+        return result
@@ -0,0 +1,98 @@
+"""Column-wise building of extracted records into typed DataFrames."""
+
+from __future__ import annotations
+
+import numbers
+from array import array
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+
+def _numeric(values: list) -> bool:
+    """True when every non-missing value is a (non-boolean) number."""
+    found = False
+    for v in values:
+        if v is None or (isinstance(v, float) and v != v):
+            continue
+        if isinstance(v, bool) or not isinstance(v, numbers.Number):
+            return False
+        found = True
+    return found
+
+
+class ColumnBuilder:
+    """
+    Collects ragged field values per column and builds the DataFrame directly.
+
+    Replaces a defaultdict(list) turned into a frame with
+    from_dict(orient="index").transpose(), which builds an all-object table and
+    then copies it once more. Fields declared as floats are appended into
+    array("d") buffers and become float64 columns; other columns become float64
+    when they hold only numbers and stay object (not "str") otherwise. Shorter columns are
+    padded by their type: float columns with NaN, object columns with None. Columns keep
+    the order in which their fields were first used.
+    """
+
+    def __init__(self, floats: Iterable[str] = ()):
+        """
+        Args:
+            floats: Fields whose values are always numbers
+        """
+        self.floats = set(floats)
+        self._columns: dict[str, Union[array, list]] = {}
+
+    def _column(self, field: str) -> Union[array, list]:
+        col = self._columns.get(field)
+        if col is None:
+            col = array("d") if field in self.floats else []
+            self._columns[field] = col
+        return col
+
+    def extend(self, field: str, values) -> None:
+        col = self._column(field)
+        if isinstance(col, array) and isinstance(values, np.ndarray):
+            col.frombytes(np.ascontiguousarray(values, dtype="float64").tobytes())
+        else:
+            col.extend(values)
+
+    def append(self, field: str, value) -> None:
+        self._column(field).append(value)
+
+    def replace(self, field: str, values) -> None:
+        """Sets the values of ``field``, dropping earlier ones (the column keeps its place)."""
+        self._columns[field] = array("d") if field in self.floats else []
+        self.extend(field, values)
+
+    def __len__(self) -> int:
+        return max((len(c) for c in self._columns.values()), default=0)
+
+    def frame(self) -> pd.DataFrame:
+        """The records as a DataFrame; the builder can be extended further afterwards."""
+        n = len(self)
+        data = {}
+        for field, col in self._columns.items():
+            if isinstance(col, array):
+                out = np.full(n, np.nan)
+                out[: len(col)] = np.frombuffer(col, dtype="float64")
+            elif _numeric(col):
+                out = np.full(n, np.nan)
+                out[: len(col)] = np.asarray(col, dtype="float64")
+            else:
+                out = np.empty(n, dtype=object)  # None-filled: the padding
+                out[: len(col)] = col if all(np.ndim(v) == 0 for v in col) else _cells(col)
+                # Explicit object dtype: text columns are not inferred as "str", whose
+                # missing-value and grouping semantics differ from the object frames
+                # the patterns have always produced
+                out = pd.Series(out, dtype=object, copy=False)
+            data[field] = out
+        return pd.DataFrame(data, index=pd.RangeIndex(n), copy=False)
+
+
+def _cells(values: list) -> np.ndarray:
+    """Object array holding each value as one cell, also lists and arrays."""
+    out = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        out[i] = v
+    return out
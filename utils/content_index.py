@@ -0,0 +1,182 @@
+"""Content-hash index of input workbooks for duplicate detection and parse reuse."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+from utils import scanner
+
+HASH_CHUNK = 1024 * 1024
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ContentIndex:
+    """
+    Maps every input workbook to the SHA-256 of its bytes.
+
+    The first path indexed for a digest is its canonical copy; later paths with
+    the same digest are duplicates (the same workbook submitted to another park
+    folder or under another file name). Each distinct byte stream is parsed once:
+    load() keeps the parsed sheets while further copies are still to be read and
+    hands out copies, so patterns that modify their input cannot affect each other.
+    """
+
+    def __init__(self, skip_duplicates: bool = False, retain: bool = False):
+        """
+        Args:
+            skip_duplicates: If True, readers leave duplicates out of the aggregates
+            retain: Keep parsed results after the last copy was read (for long-lived processes)
+        """
+        self.skip_duplicates = skip_duplicates
+        self.retain = retain
+        self._digests = {}  # path -> digest
+        self._stats = {}  # path -> (size, mtime) the digest was computed for
+        self._paths = defaultdict(list)  # digest -> paths in indexing order
+        self._remaining = defaultdict(int)  # digest -> copies not yet loaded
+        self._results = {}  # digest -> (keys, values)
+        self._lock = threading.Lock()
+
+    def add(self, path: str, data: Optional[bytes] = None) -> str:
+        """
+        Indexes one file and returns its digest. Re-adding an unchanged path is a no-op.
+
+        Args:
+            path: Workbook path
+            data: File contents when already in memory (avoids reading the file again)
+        """
+        path = str(path)
+        e = scanner.entry(path)
+        if e is None:
+            raise FileNotFoundError(path)
+        stat_key = (e.size, e.mtime)
+        with self._lock:
+            if self._stats.get(path) == stat_key:
+                return self._digests[path]
+        digest = hash_bytes(data) if data is not None else hash_file(path)
+        with self._lock:
+            old = self._digests.get(path)
+            if old is not None and path in self._paths[old]:
+                self._paths[old].remove(path)
+                self._remaining[old] = max(self._remaining[old] - 1, 0)
+                if not self._paths[old]:
+                    # The file changed and no other copy has the old content
+                    self._results.pop(old, None)
+            self._digests[path] = digest
+            self._stats[path] = stat_key
+            self._paths[digest].append(path)
+            self._remaining[digest] += 1
+        return digest
+
+    def add_files(self, paths) -> None:
+        """
+        Indexes the files among ``paths`` that can be copies of another one before
+        any of them is read, so the canonical copy and the parse reuse are known up
+        front. Only files of equal size can be copies; the others are indexed by
+        add() as they are read, from the bytes already in memory, so their content
+        is read once. Paths are indexed in sorted order, so the canonical copy does
+        not depend on the order folders are listed in.
+        """
+        listed = {str(p) for p in paths}
+        entries = [(p, scanner.entry(p)) for p in sorted(listed)]
+        with self._lock:
+            sizes = Counter(st[0] for p, st in self._stats.items() if p not in listed)
+        sizes.update(e.size for _, e in entries if e is not None)
+        for path, e in entries:
+            if e is not None and sizes[e.size] > 1:
+                self.add(path)
+
+    def digest(self, path: str) -> Optional[str]:
+        return self._digests.get(str(path))
+
+    def canonical(self, path: str) -> str:
+        """Returns the first indexed path with the same content as ``path``."""
+        digest = self._digests.get(str(path))
+        return self._paths[digest][0] if digest else str(path)
+
+    def is_duplicate(self, path: str) -> bool:
+        return self.canonical(path) != str(path)
+
+    def load(self, path: str, read: Callable[[], tuple[list, list]]) -> tuple[list, list]:
+        """
+        Returns the parsed sheets of ``path``, calling ``read`` only for the first
+        copy of its content.
+
+        Args:
+            path: Indexed workbook path
+            read: Parses the workbook and returns (sheet names, DataFrames)
+        """
+        digest = self._digests.get(str(path))
+        if digest is None:
+            return read()
+        with self._lock:
+            cached = self._results.get(digest)
+        try:
+            if cached is not None:
+                logging.info(f"Reusing parsed content of {self.canonical(path)} for {path}")
+                keys, values = cached
+                return list(keys), [_copy(v) for v in values]
+            result = read()
+            with self._lock:
+                if self.retain or self._remaining[digest] > 1:
+                    self._results[digest] = (list(result[0]), [_copy(v) for v in result[1]])
+            return result
+        finally:
+            self._release(digest)
+
+    def duplicates(self) -> dict[str, list[str]]:
+        """Digest -> paths, for every content that was indexed more than once."""
+        return {d: list(p) for d, p in self._paths.items() if len(p) > 1}
+
+    def duplicate_report(self) -> pd.DataFrame:
+        rows = []
+        for digest, paths in self.duplicates().items():
+            for dup in paths[1:]:
+                rows.append(
+                    {
+                        "sha256": digest,
+                        "canonical": paths[0],
+                        "duplicate": dup,
+                        "size": self._stats[dup][0],
+                    }
+                )
+        return pd.DataFrame(rows, columns=["sha256", "canonical", "duplicate", "size"])
+
+    def write_report(self, output_path: Path, file_name: str = "duplicate_report.csv") -> Optional[Path]:
+        """Writes the duplicate report as CSV; returns its path, or None without duplicates."""
+        report = self.duplicate_report()
+        if report.empty:
+            return None
+        os.makedirs(output_path, exist_ok=True)
+        out = Path(output_path) / file_name
+        report.to_csv(out, index=False, encoding="utf-8-sig")
+        logging.warning(f"⚠️  {len(report)} duplicate workbook(s) found, see {out}")
+        return out
+
+    def _release(self, digest: str) -> None:
+        with self._lock:
+            self._remaining[digest] = max(self._remaining[digest] - 1, 0)
+            if not self.retain and self._remaining[digest] == 0:
+                self._results.pop(digest, None)
+
+
+def _copy(value):
+    return value.copy() if isinstance(value, pd.DataFrame) else value
@@ -0,0 +1,383 @@
+"""
+Rollup cubes: every measure pre-aggregated at every level of a unit hierarchy,
+and fact cubes of additive measures over attribute dimensions.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+from utils.content_index import hash_file
+from utils.parquet_export import UNKNOWN, firefighter_tables, industry_tables, output_workbooks
+
+ALL = "*"  # member of a hierarchy column above the level of a row
+CUBE_COLUMNS = ["measure", "item", "value"]
+
+FIREFIGHTER_HIERARCHY = ("city", "division")
+FIREFIGHTER_LEVELS = ("nation", "city", "division")  # by depth in the hierarchy
+TRAINING_CLASSES = ("化災搶救基礎班", "化災搶救進階班", "化災搶救指揮官班", "化災搶救教官班")
+STAFFING = "編制數量"
+UNTRAINED = "未受訓"
+
+INDUSTRY_DIMENSIONS = ("region", "park", "company", "name", "container", "state")
+INDUSTRY_MEASURES = ("max_kg", "max_l", "control_multiple")
+ROWS = "rows"  # measure counting the fact rows summed into a cell
+
+
+class RollupCube:
+    """
+    Long table of (level, hierarchy members, measure, item, value) rows.
+
+    ``hierarchy`` lists the unit columns from the top down (e.g. city, division)
+    and ``levels`` names each depth, from the whole data set (depth 0) to the
+    finest unit. Rows above the finest level hold ALL in the columns below their
+    level, so any level or unit is a filter on the table, not a rescan.
+    """
+
+    def __init__(self, cells: pd.DataFrame, hierarchy: tuple, levels: tuple):
+        self.cells = cells
+        self.hierarchy = tuple(hierarchy)
+        self.levels = tuple(levels)
+
+    @classmethod
+    def build(
+        cls,
+        facts: pd.DataFrame,
+        hierarchy: tuple,
+        levels: tuple,
+        derive: Optional[Callable[[pd.DataFrame, list], pd.DataFrame]] = None,
+    ) -> "RollupCube":
+        """
+        Aggregates ``facts`` (hierarchy columns + measure, item, value) at every level.
+
+        Args:
+            facts: Finest-level rows; values of the same unit, measure and item are summed
+            hierarchy: Unit columns from the top down
+            levels: Name of each depth, len(hierarchy) + 1 names
+            derive: Called with the summed rows of one level and its key columns;
+                    returns extra rows for measures that are not additive (computed
+                    per level from the sums, never summed themselves)
+        """
+        frames = []
+        for depth in range(len(hierarchy), -1, -1):
+            keys = list(hierarchy[:depth])
+            g = (
+                facts.groupby(keys + ["measure", "item"], sort=False, dropna=False)["value"]
+                .sum(min_count=1)
+                .reset_index()
+            )
+            if derive is not None:
+                g = pd.concat([g, derive(g, keys)], ignore_index=True)
+            for col in hierarchy[depth:]:
+                g[col] = ALL
+            g.insert(0, "level", levels[depth])
+            frames.append(g[["level", *hierarchy, *CUBE_COLUMNS]])
+        cells = pd.concat(frames, ignore_index=True)
+        return cls(cells, hierarchy, levels)
+
+    def slice(
+        self,
+        level: str,
+        measure: Optional[str] = None,
+        item: Optional[str] = None,
+        **members: str,
+    ) -> pd.DataFrame:
+        """
+        Rows of one level, optionally for one measure, item and unit.
+
+        Args:
+            level: One of self.levels
+            members: Hierarchy members, e.g. city="雲林縣"
+        """
+        if level not in self.levels:
+            raise ValueError(f"Unknown level {level!r}; expected one of {self.levels}")
+        mask = self.cells["level"] == level
+        for col, value in (("measure", measure), ("item", item), *members.items()):
+            if col not in self.cells:
+                raise ValueError(f"Unknown column {col!r}")
+            if value is not None:
+                mask &= self.cells[col] == value
+        return self.cells[mask].reset_index(drop=True)
+
+    def table(self, level: str, measures: Optional[list[str]] = None) -> pd.DataFrame:
+        """
+        One row per unit of ``level`` and one column per (measure, item).
+
+        Measures and items keep their order of first appearance.
+        """
+        rows = self.slice(level)
+        if measures is not None:
+            rows = rows[rows["measure"].isin(measures)]
+        depth = self.levels.index(level)
+        keys = list(self.hierarchy[:depth]) or ["level"]
+        wide = rows.pivot_table(
+            index=keys, columns=["measure", "item"], values="value", aggfunc="sum", sort=False
+        )
+        return wide
+
+    def save(self, path) -> Path:
+        """Writes the cube as UTF-8 CSV (readable in Excel) via a temporary file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".~{path.name}.{os.getpid()}.tmp")
+        self.cells.to_csv(tmp, index=False, encoding="utf-8-sig")
+        os.replace(tmp, path)
+        logging.info(f"Wrote {len(self.cells)} cube cell(s) to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path, hierarchy: tuple, levels: tuple) -> "RollupCube":
+        text = {c: "string" for c in ("level", *hierarchy, "measure", "item")}
+        cells = pd.read_csv(path, dtype=text, encoding="utf-8-sig", keep_default_na=False)
+        cells["value"] = pd.to_numeric(cells["value"], errors="coerce")
+        return cls(cells, hierarchy, levels)
+
+
+def firefighter_facts(output_dir) -> pd.DataFrame:
+    """
+    Division-level measures from the per-division outputs of the firefighter job.
+
+    Staffing (編制數量) and each training class are counted per role; a class
+    counts every certificate row whose name contains it, at every unit level and
+    in every certificate sheet, as analyze_ff_survey_files does. Equipment
+    quantities are summed per item with the equipment sheet as the measure.
+    """
+    tables = firefighter_tables(output_dir)
+    keys = list(FIREFIGHTER_HIERARCHY)
+    staff = tables["firefighter_staffing"]
+    parts = [staff[keys].assign(measure=STAFFING, item=staff["role"], value=staff["count"])]
+    certs = tables["firefighter_certificates"]
+    for name in TRAINING_CLASSES:
+        rows = certs[certs["name"].str.contains(name, regex=False, na=False)]
+        parts.append(rows[keys].assign(measure=name, item=rows["role"], value=rows["count"]))
+    equipment = tables["firefighter_equipment"]
+    parts.append(
+        equipment[keys].assign(
+            measure=equipment["category"], item=equipment["name"], value=equipment["quantity"]
+        )
+    )
+    facts = pd.concat(parts, ignore_index=True)
+    return facts[facts["item"].notna()].reset_index(drop=True)
+
+
+def untrained(sums: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """未受訓 per role: staffing minus the four training classes, not below zero."""
+    by = keys + ["item"]
+    staff = sums[sums["measure"] == STAFFING].set_index(by)["value"]
+    trained = (
+        sums[sums["measure"].isin(TRAINING_CLASSES)].groupby(by, sort=False)["value"].sum()
+    )
+    value = staff.sub(trained.reindex(staff.index).fillna(0)).clip(lower=0)
+    return value.reset_index().assign(measure=UNTRAINED)
+
+
+def firefighter_cube(output_dir) -> RollupCube:
+    """Rollup cube of the firefighter job over division -> city -> nation."""
+    return RollupCube.build(
+        firefighter_facts(output_dir), FIREFIGHTER_HIERARCHY, FIREFIGHTER_LEVELS, untrained
+    )
+
+
+def write_firefighter_cube(output_dir, path) -> Path:
+    return firefighter_cube(output_dir).save(path)
+
+
+class FactCube:
+    """
+    Base cuboid of additive measures: one cell per combination of the dimensions
+    that occurs in the facts, holding the measures summed over its rows.
+
+    A roll-up over any subset of the dimensions groups the base cells instead of
+    the facts, so queries never re-read the outputs, and each roll-up is kept
+    until the cells change. ``digests`` maps each source of facts (a value of the
+    ``key`` dimension) to the digest it was built from; update() replaces the
+    cells of changed sources only.
+    """
+
+    def __init__(
+        self,
+        cells: pd.DataFrame,
+        dimensions: tuple,
+        measures: tuple,
+        key: str,
+        digests: Optional[dict] = None,
+    ):
+        self.cells = cells
+        self.dimensions = tuple(dimensions)
+        self.measures = tuple(measures)
+        self.key = key
+        self.digests = dict(digests or {})
+        self._rollups: dict = {}
+
+    @staticmethod
+    def aggregate(facts: pd.DataFrame, dimensions: tuple, measures: tuple) -> pd.DataFrame:
+        """Sums ``facts`` per combination of ``dimensions``; missing members become UNKNOWN."""
+        dims = list(dimensions)
+        facts = facts.assign(
+            **{d: facts[d].astype(object).where(facts[d].notna(), UNKNOWN) for d in dims},
+            **{ROWS: 1.0},
+        )
+        cells = (
+            facts.groupby(dims, sort=True)[[*measures, ROWS]].sum(min_count=1).reset_index()
+        )
+        return cells[[*dims, *measures, ROWS]]
+
+    @classmethod
+    def build(
+        cls,
+        facts: pd.DataFrame,
+        dimensions: tuple,
+        measures: tuple,
+        key: str,
+        digests: Optional[dict] = None,
+    ) -> "FactCube":
+        return cls(cls.aggregate(facts, dimensions, measures), dimensions, measures, key, digests)
+
+    def update(self, facts: pd.DataFrame, digests: dict) -> list[str]:
+        """
+        Replaces the cells of every source whose digest differs from ``digests``
+        and drops sources no longer in it.
+
+        Args:
+            facts: Fact rows of (at least) the changed sources
+            digests: Current digest of every source
+
+        Returns:
+            The sources whose cells were replaced or dropped
+        """
+        stale = sorted(
+            {k for k, d in digests.items() if self.digests.get(k) != d}
+            | (set(self.digests) - set(digests))
+        )
+        fresh = facts[facts[self.key].isin(stale)]
+        kept = self.cells[~self.cells[self.key].isin(stale)]
+        parts = [kept, self.aggregate(fresh, self.dimensions, self.measures)]
+        self.cells = (
+            pd.concat([p for p in parts if len(p)] or [kept], ignore_index=True)
+            .sort_values(list(self.dimensions), kind="stable")
+            .reset_index(drop=True)
+        )
+        self.digests = dict(digests)
+        self._rollups.clear()
+        return stale
+
+    def _mask(self, members: dict) -> pd.Series:
+        mask = pd.Series(True, index=self.cells.index)
+        for dim, value in members.items():
+            if dim not in self.dimensions:
+                raise ValueError(f"Unknown dimension {dim!r}; expected one of {self.dimensions}")
+            if isinstance(value, (list, tuple, set, frozenset)):
+                mask &= self.cells[dim].isin(list(value))
+            else:
+                mask &= self.cells[dim] == value
+        return mask
+
+    def slice(self, **members) -> pd.DataFrame:
+        """
+        Base cells of the given members, e.g. region="竹科", state=["液體", "氣體"].
+        """
+        return self.cells[self._mask(members)].reset_index(drop=True)
+
+    def rollup(self, by=(), **members) -> pd.DataFrame:
+        """
+        Measures summed over every dimension not in ``by``, within the given members.
+
+        Args:
+            by: Dimensions kept, e.g. ("region", "state"); () gives the grand total
+            members: Filter on any dimension, as for slice()
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        for dim in by:
+            if dim not in self.dimensions:
+                raise ValueError(f"Unknown dimension {dim!r}; expected one of {self.dimensions}")
+        cache_key = (tuple(by), tuple(sorted((d, _hashable(v)) for d, v in members.items())))
+        if cache_key not in self._rollups:
+            cells = self.cells[self._mask(members)]
+            values = [*self.measures, ROWS]
+            if by:
+                result = cells.groupby(by, sort=True)[values].sum(min_count=1).reset_index()
+            else:
+                result = cells[values].sum(min_count=1).to_frame().T
+            self._rollups[cache_key] = result
+        return self._rollups[cache_key].copy()
+
+    def save(self, path) -> Path:
+        """
+        Writes the cells as UTF-8 CSV and the digests to <path>.json, each via a
+        temporary file. The CSV goes first: after a crash in between, the old
+        digests only make the next update rebuild more sources than needed.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".~{path.name}.{os.getpid()}.tmp")
+        self.cells.to_csv(tmp, index=False, encoding="utf-8-sig")
+        os.replace(tmp, path)
+        manifest = _manifest(path)
+        tmp = manifest.with_name(f".~{manifest.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "digests": self.digests}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, manifest)
+        logging.info(f"Wrote {len(self.cells)} cube cell(s) to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path, dimensions: tuple, measures: tuple, key: str) -> "FactCube":
+        """Reads a saved cube; without its digests every source counts as changed."""
+        cells = pd.read_csv(
+            path,
+            dtype={d: "object" for d in dimensions},
+            encoding="utf-8-sig",
+            keep_default_na=False,
+        )
+        for col in (*measures, ROWS):
+            cells[col] = pd.to_numeric(cells[col], errors="coerce")
+        digests = {}
+        manifest = _manifest(path)
+        if manifest.exists():
+            with open(manifest, "r", encoding="utf-8") as f:
+                digests = json.load(f).get("digests", {})
+        return cls(cells, dimensions, measures, key, digests)
+
+
+def _hashable(value):
+    return tuple(sorted(value)) if isinstance(value, (list, tuple, set, frozenset)) else value
+
+
+def _manifest(path) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.name}.json")
+
+
+def industry_facts(output_dir, paths: Optional[list] = None) -> pd.DataFrame:
+    """Chemical rows of the per-company outputs of the chems job, one per stored chemical."""
+    chems = industry_tables(output_dir, "chems", paths)["industry_chemicals"]
+    chems = chems[chems["name"].notna()]
+    return chems[[*INDUSTRY_DIMENSIONS, *INDUSTRY_MEASURES]].reset_index(drop=True)
+
+
+def update_industry_cube(output_dir, path) -> Path:
+    """
+    Brings the industry cube at ``path`` up to date with the company outputs in
+    ``output_dir``, reading only the outputs whose bytes changed since the cube
+    was saved (all of them when there is no cube yet).
+    """
+    outputs = {p.stem: p for p in output_workbooks(output_dir)}
+    digests = {company: hash_file(str(p)) for company, p in outputs.items()}
+    cube = None
+    if Path(path).exists() and _manifest(path).exists():
+        cube = FactCube.load(path, INDUSTRY_DIMENSIONS, INDUSTRY_MEASURES, "company")
+    changed = [c for c, d in digests.items() if cube is None or cube.digests.get(c) != d]
+    facts = industry_facts(output_dir, [outputs[c] for c in changed])
+    if cube is None:
+        cube = FactCube.build(facts, INDUSTRY_DIMENSIONS, INDUSTRY_MEASURES, "company", digests)
+        logging.info(f"Industry cube built from {len(changed)} company output(s)")
+    else:
+        stale = cube.update(facts, digests)
+        logging.info(f"Industry cube: {len(stale)} of {len(digests)} company output(s) updated")
+    return cube.save(path)
@@ -0,0 +1,329 @@
+"""Warm local job service: runs jobs sent over a localhost socket and streams their progress."""
+
+from __future__ import annotations
+
+import hmac
+import io
+import json
+import logging
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, Optional
+
+from utils import events as progress_events
+from utils import scanner
+from utils.content_index import ContentIndex
+from utils.events import EventBus
+from utils.templates import TemplatePlans
+
+HOST = "127.0.0.1"
+CONNECT_TIMEOUT = 2.0
+# Warm sessions (job and data directories) kept; the least recently used is dropped
+MAX_SESSIONS = 4
+# Event types a client may rebuild from the stream
+EVENT_TYPES = {
+    cls.__name__: cls
+    for cls in (
+        progress_events.StageStarted,
+        progress_events.StageFinished,
+        progress_events.FileDone,
+        progress_events.RowsProcessed,
+        progress_events.BytesRead,
+    )
+}
+
+
+def state_path() -> Path:
+    """File announcing the running service (port and token), readable by this user only."""
+    return Path(os.environ.get("READ_EXCELS_DAEMON", Path.home() / ".read_excels_daemon.json"))
+
+
+def _send(stream, message: dict) -> None:
+    stream.write((json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+class _StreamLog(logging.Handler):
+    """Forwards the log records of a job to its client."""
+
+    def __init__(self, send: Callable[[dict], None]):
+        super().__init__(logging.INFO)
+        self.send = send
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.send({"log": record.getMessage(), "level": record.levelname})
+        except Exception:
+            pass  # client gone; the job keeps running
+
+
+class _StreamOutput(io.TextIOBase):
+    """Forwards what a job prints to its client, line by line, instead of the service's stdout."""
+
+    def __init__(self, send: Callable[[dict], None]):
+        self.send = send
+        self.buffer = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            self._send(line)
+        return len(text)
+
+    def flush(self) -> None:
+        if self.buffer:
+            self._send(self.buffer)
+            self.buffer = ""
+
+    def _send(self, line: str) -> None:
+        try:
+            self.send({"log": line, "level": "INFO"})
+        except Exception:
+            pass  # client gone; the job keeps running
+
+
+class JobServer(socketserver.ThreadingTCPServer):
+    """
+    Runs jobs for local clients in one long-lived process, so imports, parsed
+    workbooks (a retained ContentIndex per job and data directory, as in watch
+    mode), digests and template plans stay warm between runs. Only the
+    ``max_sessions`` most recently used sessions are kept, since a retained
+    index holds the parsed sheets of every workbook of its data directory.
+
+    A request is one JSON line {"token", "job", "base", "out", "options", "scan"}
+    (scan: the include / exclude rules of scanner.configure); the reply is a
+    JSON line per progress event ({"event", "fields"}) and log record ({"log",
+    "level"}; what the job prints comes back the same way), then {"done": true,
+    "ok", "error"}. Jobs run one at a time;
+    {"token", "ping": true} answers {"ok": true} at once. Only 127.0.0.1 is
+    bound and every request must carry the token of the state file.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        run_job: Callable,
+        port: int = 0,
+        token: Optional[str] = None,
+        max_sessions: int = MAX_SESSIONS,
+    ):
+        """
+        Args:
+            run_job: Called as run_job(job, base, out, options)
+            port: Port on 127.0.0.1 (0 picks a free one)
+            token: Shared secret (default: a random one)
+            max_sessions: Warm sessions kept before the least recently used is dropped
+        """
+        super().__init__((HOST, port), _Handler)
+        self.run_job = run_job
+        self.token = token or secrets.token_hex(16)
+        self.max_sessions = max_sessions
+        self.sessions: OrderedDict[tuple, dict] = OrderedDict()
+        self.job_lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def session(self, job: str, base, out, options: dict) -> dict:
+        """Warm objects shared by every run of ``job`` on the same directories."""
+        key = (job, base, out, bool(options.get("skip_duplicates")), options.get("template_cache"))
+        if key in self.sessions:
+            self.sessions.move_to_end(key)
+        else:
+            while len(self.sessions) >= self.max_sessions:
+                self.sessions.popitem(last=False)
+            self.sessions[key] = {
+                "content_index": ContentIndex(
+                    skip_duplicates=options.get("skip_duplicates", False), retain=True
+                ),
+                "output_index": ContentIndex(retain=True),
+                "template_plans": TemplatePlans(options.get("template_cache")),
+            }
+        return self.sessions[key]
+
+    def announce(self) -> Path:
+        """Writes the state file clients find the service by."""
+        path = state_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".~{path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"port": self.port, "token": self.token, "pid": os.getpid()}, f)
+        os.replace(tmp, path)
+        return path
+
+    def serve(self) -> None:
+        """Announces the service and handles jobs until interrupted (Ctrl+C or SIGTERM)."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, _interrupt)
+        path = self.announce()
+        logging.info(f"Job service listening on {HOST}:{self.port} (state in {path})")
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Job service stopped")
+        finally:
+            self.server_close()
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    if json.load(f).get("pid") == os.getpid():
+                        path.unlink()
+            except (OSError, ValueError):
+                pass
+
+
+def _interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: JobServer
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8") or "{}")
+        except ValueError:
+            return
+        if not hmac.compare_digest(str(request.get("token", "")), self.server.token):
+            _send(self.wfile, {"done": True, "ok": False, "error": "invalid token"})
+            return
+        if request.get("ping"):
+            _send(self.wfile, {"ok": True, "pid": os.getpid()})
+            return
+        send_lock = threading.Lock()
+
+        def send(message: dict) -> None:
+            with send_lock:
+                _send(self.wfile, message)
+
+        job, base, out = request.get("job"), request.get("base"), request.get("out")
+        options = dict(request.get("options") or {})
+        with self.server.job_lock:
+            options.update(self.server.session(job, base, out, options))
+            bus = EventBus()
+            bus.subscribe(
+                lambda e: send({"event": type(e).__name__, "fields": e._asdict()})
+            )
+            options["events"] = bus
+            handler = _StreamLog(send)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            root = logging.getLogger()
+            root.addHandler(handler)
+            output = _StreamOutput(send)
+            try:
+                # Listings are checked again per job: a file overwritten in place
+                # leaves its folder's mtime unchanged
+                scanner.configure(**(request.get("scan") or {}))
+                scanner.clear_cache()
+                with redirect_stdout(output):
+                    self.server.run_job(job, base, out, options)
+                result = {"done": True, "ok": True}
+            except Exception as e:
+                logging.exception(f"Job {job} failed")
+                result = {"done": True, "ok": False, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                output.flush()
+                root.removeHandler(handler)
+        try:
+            send(result)
+        except OSError:
+            pass
+
+
+class JobClient:
+    """Sends jobs to the running JobServer found through its state file."""
+
+    def __init__(self, port: int, token: str):
+        self.port = port
+        self.token = token
+
+    def _request(self, message: dict, timeout: Optional[float]):
+        conn = socket.create_connection((HOST, self.port), timeout=CONNECT_TIMEOUT)
+        conn.settimeout(timeout)
+        stream = conn.makefile("rwb")
+        _send(stream, {"token": self.token, **message})
+        return conn, stream
+
+    def ping(self) -> bool:
+        try:
+            conn, stream = self._request({"ping": True}, CONNECT_TIMEOUT)
+            with conn, stream:
+                return bool(json.loads(stream.readline().decode("utf-8") or "{}").get("ok"))
+        except (OSError, ValueError):
+            return False
+
+    def run(
+        self,
+        job: str,
+        base: Optional[str],
+        out: Optional[str],
+        options: dict,
+        events: Optional[EventBus] = None,
+        scan: Optional[dict] = None,
+    ) -> None:
+        """
+        Runs ``job`` in the service, re-emitting its progress events on ``events``
+        and its log records on this process's logging. Raises RuntimeError when
+        the job fails or the connection is lost before it finished.
+
+        Args:
+            options: Run options; only JSON values are sent (no shared objects)
+            scan: Include / exclude rules for the scanner (default: none)
+        """
+        request = {
+            "job": job,
+            "base": base,
+            "out": out,
+            "options": {k: v for k, v in options.items() if _is_json(v)},
+            "scan": scan or {},
+        }
+        conn, stream = self._request(request, None)
+        with conn, stream:
+            for line in stream:
+                message = json.loads(line.decode("utf-8"))
+                if "event" in message:
+                    cls = EVENT_TYPES.get(message["event"])
+                    if events is not None and cls is not None:
+                        events.emit(cls(**message["fields"]))
+                elif "log" in message:
+                    level = logging.getLevelName(message.get("level", "INFO"))
+                    logging.log(level if isinstance(level, int) else logging.INFO, message["log"])
+                elif message.get("done"):
+                    if not message.get("ok"):
+                        error = message.get("error")
+                        raise RuntimeError(f"Job {job} failed in the job service: {error}")
+                    return
+        raise RuntimeError(f"Lost the job service before job {job} finished")
+
+
+def _is_json(value) -> bool:
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def connect() -> Optional[JobClient]:
+    """A client of the running service, or None when no service answers."""
+    try:
+        with open(state_path(), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        client = JobClient(int(state["port"]), str(state["token"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return client if client.ping() else None
@@ -0,0 +1,292 @@
+"""
+Output equivalence and performance check of a candidate configuration.
+
+Runs a job twice on copies of the same input tree, once with the serial code
+path and once with the candidate options, then compares every output sheet
+cell by cell and the stage timings and peak memory of the two runs.
+
+Usage:
+    python -m utils.equivalence industry --base ../Data/科技廠救災能量 \\
+        --candidate '{"prefetch_depth": 4, "dedup": true}'
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import math
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from utils.history import RunHistory
+
+REPO = Path(__file__).resolve().parent.parent
+# The serial code path: no read-ahead, no content index, no cached plans
+BASELINE_OPTIONS = {"prefetch_depth": 0}
+JOBS = ("chems", "equipment", "industry", "firefighter")
+UNREADABLE = "<unreadable workbook>"
+
+_RUNNER = """
+import json, sys
+sys.path.insert(0, {repo!r})
+from Read_excels_as_one import run_job
+from utils.history import peak_rss_mb
+run_job({job!r}, {base!r}, None, json.loads({options!r}))
+print("@@" + json.dumps({{"peak_mb": peak_rss_mb()}}))
+"""
+
+
+class Difference(NamedTuple):
+    file: str
+    sheet: Optional[str]
+    where: str  # "file", "sheet", "shape" or "row r, column c"
+    expected: object
+    actual: object
+
+
+class RunResult(NamedTuple):
+    outputs: dict  # relative path -> {sheet: DataFrame}
+    seconds: float
+    stages: dict  # stage -> seconds, from run_history.jsonl
+    peak_mb: Optional[float]
+
+
+def snapshot(root) -> dict[str, dict[str, pd.DataFrame]]:
+    """
+    Every sheet of every workbook under an Output folder of ``root``, read
+    without a header (workbooks that cannot be read hold one UNREADABLE sheet).
+    """
+    root = Path(root)
+    out = {}
+    for path in sorted(root.rglob("*.xlsx")):
+        rel = path.relative_to(root).as_posix()
+        if "Output" not in path.relative_to(root).parts or path.name.startswith("~$"):
+            continue
+        try:
+            out[rel] = pd.read_excel(path, sheet_name=None, header=None)
+        except Exception as e:
+            # Compared like a sheet, so both runs must fail the same way
+            out[rel] = {UNREADABLE: pd.DataFrame([[type(e).__name__]])}
+    return out
+
+
+def run_config(job: str, src, options: dict, workdir) -> RunResult:
+    """
+    Runs ``job`` in a fresh interpreter on a copy of ``src`` under ``workdir``.
+
+    A separate process keeps the runs from sharing caches and gives each its own
+    peak memory.
+    """
+    work = Path(workdir) / "input"
+    shutil.copytree(src, work)
+    code = _RUNNER.format(
+        repo=str(REPO), job=job, base=str(work), options=json.dumps(options, ensure_ascii=False)
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=str(workdir), capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{job} failed with {options}:\n{proc.stderr[-2000:]}")
+    marker = [line for line in proc.stdout.splitlines() if line.startswith("@@")]
+    peak = json.loads(marker[-1][2:])["peak_mb"] if marker else None
+    stages = {}
+    for path in work.rglob("run_history.jsonl"):
+        for rec in RunHistory(path).records():
+            stages[rec["stage"]] = stages.get(rec["stage"], 0.0) + rec["seconds"]
+    return RunResult(snapshot(work), sum(stages.values()), stages, peak)
+
+
+def _same(a, b, rtol: float, atol: float) -> bool:
+    if pd.isna(a) and pd.isna(b):
+        return True
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=rtol, abs_tol=atol)
+    return a == b
+
+
+def _sorted_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Header row first, then the remaining rows in a canonical order."""
+    body = df.iloc[1:]
+    order = body.astype(str).apply(tuple, axis=1).sort_values().index
+    return pd.concat([df.iloc[:1], body.loc[order]]).reset_index(drop=True)
+
+
+def compare_outputs(
+    expected: dict,
+    actual: dict,
+    rtol: float = 1e-9,
+    atol: float = 1e-9,
+    unordered: tuple = (),
+) -> list[Difference]:
+    """
+    Cell-by-cell comparison of two snapshots.
+
+    Args:
+        expected: Snapshot of the baseline run
+        actual: Snapshot of the candidate run
+        rtol, atol: Tolerances for numeric cells (NaN equals NaN)
+        unordered: Glob patterns of "file" or "file::sheet" whose row order may
+                   differ; their rows below the header are sorted before comparing
+    """
+    diffs = []
+    for file in sorted(set(expected) | set(actual)):
+        if file not in actual or file not in expected:
+            diffs.append(Difference(file, None, "file", file in expected, file in actual))
+            continue
+        for sheet in list(dict.fromkeys([*expected[file], *actual[file]])):
+            a, b = expected[file].get(sheet), actual[file].get(sheet)
+            if a is None or b is None:
+                diffs.append(Difference(file, sheet, "sheet", a is not None, b is not None))
+                continue
+            if a.shape != b.shape:
+                diffs.append(Difference(file, sheet, "shape", a.shape, b.shape))
+                continue
+            if any(
+                fnmatch.fnmatch(f"{file}::{sheet}", p) or fnmatch.fnmatch(file, p)
+                for p in unordered
+            ):
+                a, b = _sorted_rows(a), _sorted_rows(b)
+            rows = zip(a.itertuples(index=False), b.itertuples(index=False))
+            for r, (ra, rb) in enumerate(rows):
+                for c, (x, y) in enumerate(zip(ra, rb)):
+                    if not _same(x, y, rtol, atol):
+                        diffs.append(Difference(file, sheet, f"row {r}, column {c}", x, y))
+    return diffs
+
+
+def regressions(
+    baseline: RunResult,
+    candidate: RunResult,
+    max_slowdown: float = 1.25,
+    max_memory: float = 1.25,
+    min_seconds: float = 1.0,
+) -> list[str]:
+    """
+    Performance regressions of the candidate.
+
+    Stage and total times count as regressions when they exceed the baseline by
+    more than ``max_slowdown`` and by at least ``min_seconds`` (short stages are
+    too noisy to judge); peak memory when it exceeds it by ``max_memory``.
+    """
+    found = []
+    times = [("total", baseline.seconds, candidate.seconds)] + [
+        (s, t, candidate.stages.get(s)) for s, t in baseline.stages.items()
+    ]
+    for name, before, after in times:
+        if after is not None and after > max(before * max_slowdown, before + min_seconds):
+            found.append(f"{name}: {after:.2f}s vs {before:.2f}s baseline")
+    before, after = baseline.peak_mb, candidate.peak_mb
+    if before and after and after > before * max_memory:
+        found.append(f"peak memory: {after:.0f} MB vs {before:.0f} MB baseline")
+    return found
+
+
+def check(
+    job: str,
+    src,
+    candidate: dict,
+    baseline: Optional[dict] = None,
+    rtol: float = 1e-9,
+    atol: float = 1e-9,
+    unordered: tuple = (),
+    max_slowdown: float = 1.25,
+    max_memory: float = 1.25,
+    min_seconds: float = 1.0,
+) -> dict:
+    """
+    Runs the baseline and the candidate options on copies of ``src`` and compares them.
+
+    Returns:
+        dict: {"ok", "differences", "regressions", "baseline", "candidate"}; ok is
+              False when an output differs or performance regressed
+    """
+    with tempfile.TemporaryDirectory(prefix="equivalence_") as tmp:
+        baseline = BASELINE_OPTIONS if baseline is None else baseline
+        base_run = run_config(job, src, dict(baseline), Path(tmp) / "baseline")
+        cand_run = run_config(job, src, dict(candidate), Path(tmp) / "candidate")
+    diffs = compare_outputs(base_run.outputs, cand_run.outputs, rtol, atol, unordered)
+    slow = regressions(base_run, cand_run, max_slowdown, max_memory, min_seconds)
+    summary = lambda r: {
+        "seconds": r.seconds,
+        "stages": r.stages,
+        "peak_mb": r.peak_mb,
+        "files": len(r.outputs),
+    }
+    return {
+        "ok": not diffs and not slow,
+        "differences": diffs,
+        "regressions": slow,
+        "baseline": summary(base_run),
+        "candidate": summary(cand_run),
+    }
+
+
+def print_report(result: dict, limit: int = 20) -> None:
+    b, c = result["baseline"], result["candidate"]
+    print(f"{'Stage':<40} {'Baseline s':>10} {'Candidate s':>11}")
+    for stage, seconds in b["stages"].items():
+        after = c["stages"].get(stage, float("nan"))
+        print(f"{stage:<40} {seconds:>10.2f} {after:>11.2f}")
+    print(f"{'total':<40} {b['seconds']:>10.2f} {c['seconds']:>11.2f}")
+    if b["peak_mb"] and c["peak_mb"]:
+        print(f"{'peak memory (MB)':<40} {b['peak_mb']:>10.0f} {c['peak_mb']:>11.0f}")
+    else:
+        print(f"{'peak memory (MB)':<40} not measured on this platform")
+    for d in result["differences"][:limit]:
+        print(f"DIFF {d.file} [{d.sheet}] {d.where}: {d.expected!r} != {d.actual!r}")
+    if len(result["differences"]) > limit:
+        print(f"... {len(result['differences']) - limit} more difference(s)")
+    for r in result["regressions"]:
+        print(f"SLOWER {r}")
+    outputs = "DIFFERENT" if result["differences"] else "EQUIVALENT"
+    speed = "performance regressed" if result["regressions"] else "no performance regression"
+    print(f"{outputs} ({b['files']} output file(s)), {speed}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("job", choices=JOBS)
+    parser.add_argument("--base", required=True, help="Input tree (copied; never modified)")
+    parser.add_argument("--candidate", default="{}", help="Options of the candidate run (JSON)")
+    parser.add_argument(
+        "--baseline",
+        default=json.dumps(BASELINE_OPTIONS),
+        help="Options of the baseline run (JSON)",
+    )
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--atol", type=float, default=1e-9)
+    parser.add_argument(
+        "--unordered",
+        action="append",
+        default=[],
+        help="Glob of 'file' or 'file::sheet' whose row order may differ (repeatable)",
+    )
+    parser.add_argument("--max-slowdown", type=float, default=1.25)
+    parser.add_argument("--max-memory", type=float, default=1.25)
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    result = check(
+        args.job,
+        args.base,
+        json.loads(args.candidate),
+        json.loads(args.baseline),
+        rtol=args.rtol,
+        atol=args.atol,
+        unordered=tuple(args.unordered),
+        max_slowdown=args.max_slowdown,
+        max_memory=args.max_memory,
+        min_seconds=args.min_seconds,
+    )
+    print_report(result)
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
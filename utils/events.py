@@ -0,0 +1,251 @@
+"""Typed progress events of a run, with rolling throughput, for the GUI and the CLI."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, NamedTuple, Optional, Union
+
+
+class StageStarted(NamedTuple):
+    stage: str
+    files: int  # workbooks the stage will read (0 when unknown)
+    bytes: int
+    time: float
+
+
+class StageFinished(NamedTuple):
+    stage: str
+    seconds: float
+    ok: bool
+    time: float
+
+
+class FileDone(NamedTuple):
+    file: str
+    ok: bool  # False when the workbook failed and was skipped
+    time: float
+
+
+class RowsProcessed(NamedTuple):
+    file: str
+    rows: int
+    time: float
+
+
+class BytesRead(NamedTuple):
+    file: str
+    bytes: int
+    time: float
+
+
+Event = Union[StageStarted, StageFinished, FileDone, RowsProcessed, BytesRead]
+
+
+class Progress(NamedTuple):
+    stage: Optional[str]  # innermost running stage
+    done: int  # workbooks finished in that stage
+    total: int  # workbooks it will read (0 when unknown)
+    files_per_second: float
+    rows_per_second: float
+    idle_seconds: float  # since the last event
+
+
+class Throughput:
+    """Rolling files and rows per second over the last ``window`` seconds."""
+
+    def __init__(self, window: float = 30.0):
+        self.window = window
+        self.started = time.monotonic()
+        self._samples: deque = deque()  # (time, files, rows)
+
+    def add(self, now: float, files: int = 0, rows: int = 0) -> None:
+        self._samples.append((now, files, rows))
+        while self._samples and self._samples[0][0] < now - self.window:
+            self._samples.popleft()
+
+    def rates(self, now: Optional[float] = None) -> tuple[float, float]:
+        """(files per second, rows per second)."""
+        now = time.monotonic() if now is None else now
+        recent = [s for s in self._samples if s[0] >= now - self.window]
+        span = max(min(self.window, now - self.started), 1e-6)
+        return sum(s[1] for s in recent) / span, sum(s[2] for s in recent) / span
+
+
+class QueueSink:
+    """
+    Emits into a multiprocessing queue, for events of another process.
+
+    Pass it to the child when the process starts (or use a Manager queue) and
+    call EventBus.listen() with the same queue in the parent.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def emit(self, event: Event) -> None:
+        self.queue.put(event)
+
+
+class EventBus:
+    """
+    Delivers progress events to listeners and keeps rolling throughput.
+
+    emit() may be called from any thread; listeners are called in the emitting
+    thread, one event at a time, and a failing listener is logged, not raised.
+    Events of worker processes arrive through a queue (see QueueSink).
+    """
+
+    def __init__(self, window: float = 30.0):
+        """
+        Args:
+            window: Seconds over which files/s and rows/s are averaged
+        """
+        self.throughput = Throughput(window)
+        self._listeners: list[Callable[[Event], None]] = []
+        self._stages: list[list] = []  # [stage, total, done] of the running stages
+        self._last = time.monotonic()
+        self._lock = threading.RLock()
+
+    def subscribe(self, listener: Callable[[Event], None]) -> Callable[[Event], None]:
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: Callable[[Event], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def emit(self, event: Event) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._last = now
+            if isinstance(event, StageStarted):
+                self._stages.append([event.stage, event.files, 0])
+            elif isinstance(event, StageFinished):
+                for i in range(len(self._stages) - 1, -1, -1):
+                    if self._stages[i][0] == event.stage:
+                        del self._stages[i]
+                        break
+            elif isinstance(event, FileDone):
+                if self._stages:
+                    self._stages[-1][2] += 1
+                self.throughput.add(now, files=1)
+            elif isinstance(event, RowsProcessed):
+                self.throughput.add(now, rows=event.rows)
+            for listener in list(self._listeners):
+                try:
+                    listener(event)
+                except Exception as e:
+                    logging.warning(f"⚠️  Progress listener failed: {type(e).__name__}: {e}")
+
+    @contextmanager
+    def stage(self, name: str, files: int = 0, size: int = 0):
+        """Emits StageStarted and StageFinished (ok=False when the block raises)."""
+        start = time.monotonic()
+        self.emit(StageStarted(name, files, size, time.time()))
+        ok = False
+        try:
+            yield self
+            ok = True
+        finally:
+            self.emit(StageFinished(name, time.monotonic() - start, ok, time.time()))
+
+    def file_read(self, file: str, rows: int, size: int) -> None:
+        """Emits BytesRead, RowsProcessed and FileDone for a workbook that was read."""
+        now = time.time()
+        self.emit(BytesRead(str(file), size, now))
+        self.emit(RowsProcessed(str(file), rows, now))
+        self.emit(FileDone(str(file), True, now))
+
+    def file_failed(self, file: str) -> None:
+        self.emit(FileDone(str(file), False, time.time()))
+
+    def progress(self) -> Progress:
+        with self._lock:
+            stage, total, done = self._stages[-1] if self._stages else (None, 0, 0)
+            files, rows = self.throughput.rates()
+            return Progress(stage, done, total, files, rows, time.monotonic() - self._last)
+
+    def running(self) -> bool:
+        with self._lock:
+            return bool(self._stages)
+
+    def listen(self, queue) -> threading.Thread:
+        """Re-emits events put on ``queue`` by other processes until None is put."""
+
+        def forward():
+            while True:
+                event = queue.get()
+                if event is None:
+                    return
+                self.emit(event)
+
+        thread = threading.Thread(target=forward, name="event-listener", daemon=True)
+        thread.start()
+        return thread
+
+
+def track(events: Optional[EventBus], name: str, files: int = 0, size: int = 0):
+    """EventBus.stage, or a no-op without an event bus."""
+    return events.stage(name, files, size) if events is not None else nullcontext()
+
+
+class LogProgress:
+    """
+    CLI listener: logs files/s and rows/s at most every ``every`` seconds and a
+    summary when a stage ends, and warns when a running stage emits nothing for
+    ``stall_after`` seconds.
+    """
+
+    def __init__(self, events: EventBus, every: float = 10.0, stall_after: float = 300.0):
+        self.events = events
+        self.every = every
+        self.stall_after = stall_after
+        self._logged = 0.0
+        self._done = {}  # running stage -> workbooks read so far, for the summary
+        self._stop = threading.Event()
+        events.subscribe(self)
+        if stall_after:
+            threading.Thread(target=self._watch, name="stall-watch", daemon=True).start()
+
+    def __call__(self, event: Event) -> None:
+        if isinstance(event, StageStarted):
+            self._done[event.stage] = 0
+        elif isinstance(event, FileDone):
+            for name in self._done:
+                self._done[name] += 1
+            p = self.events.progress()
+            if time.monotonic() - self._logged >= self.every:
+                self._logged = time.monotonic()
+                total = f"/{p.total}" if p.total else ""
+                logging.info(
+                    f"[{p.stage}] {p.done}{total} file(s), "
+                    f"{p.files_per_second:.2f} files/s, {p.rows_per_second:.0f} rows/s"
+                )
+        elif isinstance(event, StageFinished):
+            done = self._done.pop(event.stage, 0)
+            status = "finished" if event.ok else "failed"
+            logging.info(
+                f"[{event.stage}] {status}: {done} file(s) read in {event.seconds:.1f}s "
+                f"({done / max(event.seconds, 1e-6):.2f} files/s)"
+            )
+
+    def _watch(self) -> None:
+        warned = False
+        while not self._stop.wait(min(self.stall_after, 5.0)):
+            p = self.events.progress()
+            stalled = self.events.running() and p.idle_seconds >= self.stall_after
+            if stalled and not warned:
+                logging.warning(
+                    f"⚠️  No progress in [{p.stage}] for {p.idle_seconds:.0f}s; the run may be stalled"
+                )
+            warned = stalled
+
+    def close(self) -> None:
+        self._stop.set()
+        self.events.unsubscribe(self)
@@ -0,0 +1,131 @@
+"""Real data extent of worksheets, read from the sheet XML without building cells."""
+
+from __future__ import annotations
+
+import io
+import logging
+import posixpath
+import re
+import zipfile
+from typing import NamedTuple, Optional
+from xml.etree import ElementTree
+
+# Sheets whose declared dimension exceeds the used range by this factor (and at
+# least SLACK_ROWS rows or SLACK_COLS columns) are logged
+LOG_FACTOR = 2
+SLACK_ROWS = 1000
+SLACK_COLS = 50
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# A cell holding a value: <c r="B3" ...>, an optional formula, then <v> or <is>.
+# Styled empty cells (<c r="B3" s="2"/>) have neither and do not count.
+_VALUE_CELL = re.compile(
+    rb'<c\b[^>]*?\br="([A-Z]{1,3})([0-9]+)"[^>]*(?<!/)>\s*'
+    rb"(?:<f\b[^>]*/>\s*|<f\b[^>]*>[^<]*</f>\s*)?<(?:v|is)\b"
+)
+_VALUE_TAG = re.compile(rb"<(?:v|is)\b")
+_DIMENSION = re.compile(rb'<dimension\s+ref="(?:[A-Z]+[0-9]+:)?([A-Z]+)([0-9]+)"')
+
+
+class UsedRange(NamedTuple):
+    rows: int  # last Excel row holding a value (0 for an empty sheet)
+    cols: int  # last column holding a value
+    declared_rows: int  # from the sheet's <dimension> record (0 if missing)
+    declared_cols: int
+
+
+def column_number(letters: bytes) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ch - 64
+    return n
+
+
+def _sheet_parts(zf: zipfile.ZipFile) -> dict[str, str]:
+    """Sheet name -> worksheet part, in workbook order."""
+    rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): r.get("Target") for r in rels.iter(f"{_NS_PKG}Relationship")}
+    book = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    parts = {}
+    for sheet in book.iter(f"{_NS_MAIN}sheet"):
+        target = targets.get(sheet.get(f"{_NS_REL}id"))
+        if target is None:
+            continue
+        part = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+        parts[sheet.get("name")] = posixpath.normpath(part)
+    return parts
+
+
+def sheet_range(xml: bytes) -> Optional[UsedRange]:
+    """
+    Used range of one worksheet part.
+
+    Returns None when the extent cannot be established with certainty (e.g. a
+    prefixed namespace or cells without a reference), so the caller reads the
+    sheet as declared.
+    """
+    if b"<sheetData" not in xml:
+        return None
+    rows = cols = found = 0
+    for m in _VALUE_CELL.finditer(xml):
+        found += 1
+        rows = max(rows, int(m.group(2)))
+        cols = max(cols, column_number(m.group(1)))
+    # Every value must have been attributed to a cell reference
+    if found != len(_VALUE_TAG.findall(xml)):
+        return None
+    dim = _DIMENSION.search(xml)
+    declared = (int(dim.group(2)), column_number(dim.group(1))) if dim else (0, 0)
+    return UsedRange(rows, cols, *declared)
+
+
+def sheet_count(path) -> int:
+    """Number of sheets of an .xlsx/.xlsm workbook, from its workbook part (0 if unknown)."""
+    if not str(path).lower().endswith((".xlsx", ".xlsm")):
+        return 0
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return len(_sheet_parts(zf))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError, OSError):
+        return 0
+
+
+def used_ranges(source, name: str = "") -> Optional[dict[str, Optional[UsedRange]]]:
+    """
+    Used range of every sheet of an .xlsx/.xlsm workbook.
+
+    Args:
+        source: Path or in-memory buffer of the workbook
+        name: Name used in log messages
+
+    Returns:
+        dict: Sheet name -> UsedRange (None for sheets that could not be measured),
+              or None if the source is not an OOXML workbook
+    """
+    if isinstance(source, io.BytesIO):
+        source.seek(0)
+    elif not str(source).lower().endswith((".xlsx", ".xlsm")):
+        return None
+    try:
+        with zipfile.ZipFile(source) as zf:
+            ranges = {s: sheet_range(zf.read(part)) for s, part in _sheet_parts(zf).items()}
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError, OSError) as e:
+        logging.debug(f"No used range for {name or source}: {type(e).__name__}: {e}")
+        return None
+    finally:
+        if isinstance(source, io.BytesIO):
+            source.seek(0)
+    for sheet, r in ranges.items():
+        if r is None:
+            continue
+        if r.declared_rows > max(LOG_FACTOR * r.rows, r.rows + SLACK_ROWS) or (
+            r.declared_cols > max(LOG_FACTOR * r.cols, r.cols + SLACK_COLS)
+        ):
+            logging.info(
+                f"Trimmed {name or source} [{sheet}]: declared {r.declared_rows}x"
+                f"{r.declared_cols}, data in {r.rows}x{r.cols}"
+            )
+    return ranges
@@ -0,0 +1,124 @@
+"""Per-file failure policy and machine-readable error report for a run."""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import logging
+import os
+import threading
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+FAILURE_POLICIES = ("skip", "retry", "abort")
+# Seconds before a failed read is tried again (a workbook still being copied or saved)
+RETRY_DELAY = 2.0
+
+# pandas engines per extension, in the order they are tried
+EXCEL_ENGINES = {
+    ".xlsx": ("openpyxl", "calamine"),
+    ".xlsm": ("openpyxl", "calamine"),
+    ".xls": ("xlrd", "calamine"),
+    ".ods": ("odf", "calamine"),
+}
+ENGINE_MODULES = {
+    "openpyxl": "openpyxl",
+    "calamine": "python_calamine",
+    "xlrd": "xlrd",
+    "odf": "odf",
+}
+
+
+def fallback_engines(file_path: str) -> list[str]:
+    """Installed engines other than the default one for this file type."""
+    engines = EXCEL_ENGINES.get(Path(str(file_path)).suffix.lower(), ())
+    return [
+        e for e in engines[1:] if importlib.util.find_spec(ENGINE_MODULES[e]) is not None
+    ]
+
+
+class ErrorReport:
+    """
+    Collects the failures of one run so that bad inputs can be fixed and only
+    they rerun, while the results of every other file are kept.
+
+    Policies:
+        skip:  log the failure, leave the file out and continue
+        retry: read the file again from disk after RETRY_DELAY (a workbook that was
+               still being copied, synced or saved), then with the other installed
+               pandas engines (python-calamine, see requirements-optional.txt), then
+               skip; pattern errors are not retried, the same sheets fail again
+        abort: record the failure and re-raise (previous behaviour)
+    """
+
+    def __init__(self, policy: str = "skip"):
+        if policy not in FAILURE_POLICIES:
+            raise ValueError(f"Unknown failure policy {policy!r}; use one of {FAILURE_POLICIES}")
+        self.policy = policy
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.records: list[dict] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(1 for r in self.records if r["action"] != "recovered")
+
+    def record(
+        self,
+        file: str,
+        stage: str,
+        error: BaseException,
+        action: str,
+        pattern: Optional[str] = None,
+        engine: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            file: Workbook (or folder, for folder-level stages) that failed
+            stage: "read", "pattern", "collect", "store", "merge" or "output"
+            error: The exception raised
+            action: "skipped", "retrying", "recovered" or "aborted"
+            pattern: Processing pattern in use
+            engine: pandas engine used for the attempt (None for the default engine)
+        """
+        rec = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "file": str(file),
+            "stage": stage,
+            "pattern": pattern,
+            "engine": engine,
+            "action": action,
+            "error_type": type(error).__name__,
+            "message": str(error),
+            "traceback": "".join(
+                traceback.format_exception(type(error), error, error.__traceback__)
+            ),
+        }
+        with self._lock:
+            self.records.append(rec)
+        log = logging.info if action == "recovered" else logging.error
+        log(f"{stage} failed for {file} ({type(error).__name__}: {error}); {action}")
+
+    def failed_files(self) -> list[str]:
+        recovered = {r["file"] for r in self.records if r["action"] == "recovered"}
+        return sorted({r["file"] for r in self.records} - recovered)
+
+    def write(self, output_path, file_name: str = "error_report.json") -> Optional[Path]:
+        """Writes the report as JSON; returns its path, or None when nothing failed."""
+        if not self.records:
+            return None
+        os.makedirs(output_path, exist_ok=True)
+        out = Path(output_path) / file_name
+        report = {
+            "started": self.started,
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "policy": self.policy,
+            "failed_files": self.failed_files(),
+            "errors": self.records,
+        }
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        if len(self):
+            logging.warning(f"⚠️  {len(self)} failure(s) during this run, see {out}")
+        return out
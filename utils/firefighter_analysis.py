@@ -7,6 +7,8 @@ from typing import Optional, Union
 import pandas as pd
 
 import utils.read_data as read_data
+import utils.scanner as scanner
+from utils.events import EventBus, track
 from utils.output_excel import output_as
 
 exclude_files = ("Output", "Distribution_by_city")
@@ -14,8 +16,7 @@ exclude_files = ("Output", "Distribution_by_city")
 
 def list_subfolders(root: Path, exclude: tuple = exclude_files) -> list[Path]:
     """Lists subdirectories excluding specified folder names."""
-    excl = set(exclude)
-    return [p for p in root.iterdir() if p.is_dir() and p.name not in excl]
+    return [Path(e.path) for e in scanner.list_dirs(root, exclude)]
 
 
 def analyze_ff_survey_files(
@@ -24,6 +25,7 @@ def analyze_ff_survey_files(
     out_root: Optional[Path],
     pattern: str = "default",
     filename: Optional[str] = None,
+    events: Optional[EventBus] = None,
 ) -> None:
     """
     Analyzes firefighter survey files by aggregating personnel composition and training certification data across divisions.
@@ -37,7 +39,27 @@ def analyze_ff_survey_files(
         out_root: Output directory path relative to base_path
         pattern: Processing pattern for reading Excel files (default: 'default')
         filename: Output filename (default: 'Grouped_data.xlsx')
+        events: Progress events of the run (stage, files read, rows)
     """
+    file_name = filename or "Grouped_data.xlsx"
+    root_data = Path(str(base_path) + str(out_root.parent))
+    inputs = []
+    for folder in list_subfolders(root_data):
+        params = {"path_data": str(base_path), "folder_path": str(folder), "file_name": file_name}
+        inputs += read_data.read_data(params).list_excel_files(folder)
+    size = sum(e.size for e in map(scanner.entry, inputs) if e)
+    with track(events, "analyze_ff_survey_files", len(inputs), size):
+        _analyze_ff_survey_files(base_path, group_specs, out_root, pattern, filename, events)
+
+
+def _analyze_ff_survey_files(
+    base_path: Path,
+    group_specs: list,
+    out_root: Optional[Path],
+    pattern: str,
+    filename: Optional[str],
+    events: Optional[EventBus],
+) -> None:
     file_name = filename or "Grouped_data.xlsx"
     combined = {}
     skipped_folders = []
@@ -66,6 +88,7 @@ def analyze_ff_survey_files(
             "folder_path": str(folder),
             "file_name": file_name,
             "pattern": pattern,
+            "events": events,
         }
         reader = read_data.read_data(params)
         iterator = reader.read_excel_files()
@@ -0,0 +1,161 @@
+"""Timings of past runs, used to project the runtime of the next one."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Resident memory of the interpreter with pandas/openpyxl loaded, before any data
+BASE_MB = 150.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident memory of this process plus its largest finished child
+    process (a ParsePool worker once the pool is shut down), in MB; None where
+    unsupported (Windows).
+
+    Workers still running are not counted yet, and of several workers only the
+    largest is, so with a pool this is a lower bound of the combined peak.
+    """
+    if resource is None:
+        return None
+    peak = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+class RunHistory:
+    """
+    Append-only JSONL log of stage timings (run_history.jsonl next to the checkpoint).
+
+    Every stage of a run appends one record with the size of the job's input
+    workbooks, the wall time and the process's peak memory, so rates() can turn
+    past runs into seconds and memory per input MB.
+    """
+
+    def __init__(self, path, keep: int = 20):
+        """
+        Args:
+            path: History file
+            keep: Number of most recent records per stage used for rates
+        """
+        self.path = Path(path)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def records(self, stage: Optional[str] = None) -> list[dict]:
+        if not self.path.exists():
+            return []
+        out = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if stage is None or rec.get("stage") == stage:
+                    out.append(rec)
+        return out
+
+    def append(self, rec: dict) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    @contextmanager
+    def stage(
+        self,
+        name: str,
+        input_bytes: int,
+        files: int,
+        workers: Union[int, Callable[[], int]] = 1,
+        resumed: bool = False,
+        max_folder_bytes: int = 0,
+    ):
+        """
+        Times the enclosed stage and appends its record (also when it fails).
+
+        Args:
+            name: Stage name, e.g. "chems:process_folder_tree"
+            input_bytes: Total size of the job's input workbooks
+            files: Number of input workbooks
+            workers: Worker count the stage ran with, or a callable returning it
+                     when the stage ends (a pool sized while the stage runs)
+            resumed: True for resumed runs (their timings are not used for rates)
+            max_folder_bytes: Size of the largest folder (for the memory estimate)
+        """
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.append(
+                {
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                    "stage": name,
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "input_bytes": input_bytes,
+                    "files": files,
+                    "max_folder_bytes": max_folder_bytes,
+                    "workers": workers() if callable(workers) else workers,
+                    "peak_mb": peak_rss_mb(),
+                    "resumed": resumed,
+                    "ok": ok,
+                }
+            )
+
+    def rates(self, stage: str) -> Optional[dict]:
+        """
+        Median rates of the recent complete, non-resumed runs of ``stage``.
+
+        Returns:
+            dict: {"seconds_per_mb", "runs"} plus, where memory was measured,
+                  "peak_mb" and "mb_per_folder_mb" (memory above BASE_MB per MB of
+                  the largest folder), or None without usable records
+        """
+        recs = [
+            r
+            for r in self.records(stage)
+            if r.get("ok") and not r.get("resumed") and r.get("input_bytes")
+        ][-self.keep :]
+        if not recs:
+            return None
+        mb = lambda r: r["input_bytes"] / (1024 * 1024)
+        # Time is normalised to one worker
+        rates = {
+            "seconds_per_mb": statistics.median(
+                r["seconds"] * r.get("workers", 1) / mb(r) for r in recs
+            ),
+            "runs": len(recs),
+        }
+        peaks = [r for r in recs if r.get("peak_mb")]
+        if peaks:
+            rates["peak_mb"] = statistics.median(r["peak_mb"] for r in peaks)
+            per_folder = [
+                max(r["peak_mb"] - BASE_MB, 0) / (r["max_folder_bytes"] / (1024 * 1024))
+                for r in peaks
+                if r.get("max_folder_bytes")
+            ]
+            if per_folder:
+                rates["mb_per_folder_mb"] = statistics.median(per_folder)
+        logging.debug(f"Rates for {stage}: {rates}")
+        return rates
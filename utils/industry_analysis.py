@@ -9,6 +9,8 @@ from typing import Callable, Optional
 import pandas as pd
 
 import utils.read_data as read_data
+import utils.scanner as scanner
+from utils.events import EventBus, track
 from utils.output_excel import output_as
 
 
@@ -17,6 +19,7 @@ def analyze_grouped(
     group_specs: list[tuple[str, list[str], str]],
     cleaner: Optional[Callable],
     path_output: Optional[Path],
+    events: Optional[EventBus] = None,
 ) -> None:
     """
     Reads sorted data Excel file and generates grouped analysis reports.
@@ -27,6 +30,7 @@ def analyze_grouped(
                     [(group_column, columns_to_sum, output_filename), ...]
         cleaner: Optional cleaning function to apply to data before grouping
         path_output: Output directory path (defaults to sorted_path parent)
+        events: Progress events of the run (stage, file read, rows)
 
     Process:
         1. Reads all sheets from sorted Excel file
@@ -37,6 +41,20 @@ def analyze_grouped(
             - Sorts by summed values in descending order
             - Outputs to separate Excel file
     """
+    entry = scanner.entry(str(sorted_path))
+    size = entry.size if entry else 0
+    with track(events, "analyze_grouped", 1, size):
+        _analyze_grouped(sorted_path, group_specs, cleaner, path_output, events, size)
+
+
+def _analyze_grouped(
+    sorted_path: Path,
+    group_specs: list[tuple[str, list[str], str]],
+    cleaner: Optional[Callable],
+    path_output: Optional[Path],
+    events: Optional[EventBus],
+    size: int,
+) -> None:
     base_params = {
         "path_data": str(sorted_path.parent.parent),
         "path_output": str(path_output or sorted_path.parent),
@@ -46,6 +64,8 @@ def analyze_grouped(
     }
     reader = read_data.read_data(base_params)
     keys, values = reader.read_one_excel(str(sorted_path))
+    if events is not None:
+        events.file_read(str(sorted_path), sum(len(v) for v in values), size)
 
     for group_col, sum_cols, out_file in group_specs:
         result = {}
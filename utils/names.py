@@ -0,0 +1,170 @@
+"""Normalization of chemical and equipment names against a maintained dictionary."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import pandas as pd
+
+NGRAM = 2
+REVIEW = 0.5  # n-gram similarity from which a name is listed in the review report
+DICTIONARY_COLUMNS = ["kind", "canonical", "alias"]
+REVIEW_COLUMNS = ["kind", "name", "normalized", "suggestion", "score"]
+
+_SPACES = re.compile(r"\s+")
+_SPACE_NEAR_WIDE = re.compile(r" ?([^\x00-\x7f]) ?")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Full-width letters, digits and brackets to half-width (NFKC), runs of
+    whitespace to one space, and no spaces next to CJK characters.
+    """
+    text = _SPACES.sub(" ", unicodedata.normalize("NFKC", name)).strip()
+    return _SPACE_NEAR_WIDE.sub(r"\1", text)
+
+
+def _key(name: str) -> str:
+    return normalize_name(name).replace(" ", "").casefold()
+
+
+def _grams(key: str) -> set[str]:
+    padded = f"^{key}$"
+    return {padded[i : i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+class Match(NamedTuple):
+    name: str  # canonical entry of a dictionary name or alias, else the normalized name
+    suggestion: Optional[str]  # closest canonical entry
+    score: float  # its n-gram similarity (1.0 for a dictionary name or alias)
+
+
+class NameIndex:
+    """
+    Character n-gram index of the names and aliases of one kind of entry.
+
+    A name or alias (after normalize_name) maps to its entry. Any other name is
+    kept, with the closest entry as a suggestion: a lookup only scores the
+    entries that share an n-gram with the name (Dice similarity of the n-gram
+    sets), so it does not compare the name with the whole dictionary. Similar
+    names are not merged, as they are often different substances (TEAH/TMAH,
+    STM80/STM81, 96%/98%).
+    """
+
+    def __init__(self, entries: dict[str, str]):
+        """
+        Args:
+            entries: Name or alias -> canonical entry
+        """
+        self.exact = {_key(name): canonical for name, canonical in entries.items()}
+        self.grams = {key: _grams(key) for key in self.exact}
+        self.postings: dict[str, list[str]] = defaultdict(list)
+        for key, grams in self.grams.items():
+            for gram in grams:
+                self.postings[gram].append(key)
+
+    def match(self, name: str) -> Match:
+        key = _key(name)
+        if key in self.exact:
+            return Match(self.exact[key], self.exact[key], 1.0)
+        grams = _grams(key)
+        shared = Counter(k for gram in grams for k in self.postings.get(gram, ()))
+        best, score = None, 0.0
+        for candidate, n in shared.items():
+            s = 2 * n / (len(grams) + len(self.grams[candidate]))
+            if s > score or (s == score and best is not None and candidate < best):
+                best, score = candidate, s
+        suggestion = self.exact[best] if best is not None else None
+        return Match(normalize_name(name), suggestion, score)
+
+
+class NameNormalizer:
+    """
+    Maps raw names to the canonical entries of a dictionary CSV (kind,
+    canonical, alias; one row per alias, the canonical name matches itself).
+
+    Names of a kind without dictionary entries are only normalized. Lookups are
+    memoized for the run; names that are not in the dictionary but come close
+    to an entry are kept (normalized) and listed by write_report() for review,
+    so the dictionary can be extended with an alias where they are the same.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: Dictionary CSV (None normalizes spelling only)
+        """
+        self.path = Path(path) if path else None
+        entries: dict[str, dict[str, str]] = defaultdict(dict)
+        if self.path is not None:
+            table = pd.read_csv(self.path, dtype=str, encoding="utf-8-sig", keep_default_na=False)
+            for kind, canonical, alias in table[DICTIONARY_COLUMNS].itertuples(index=False):
+                if canonical.strip():
+                    entries[kind.strip()][canonical.strip()] = canonical.strip()
+                    if alias.strip():
+                        entries[kind.strip()][alias.strip()] = canonical.strip()
+        self.indexes = {kind: NameIndex(e) for kind, e in entries.items()}
+        self._memo: dict[tuple[str, str], Match] = {}
+        self._lock = threading.Lock()
+
+    def match(self, kind: str, name: str) -> Match:
+        with self._lock:
+            cached = self._memo.get((kind, name))
+        if cached is not None:
+            return cached
+        index = self.indexes.get(kind)
+        result = index.match(name) if index is not None else Match(normalize_name(name), None, 0.0)
+        with self._lock:
+            self._memo[(kind, name)] = result
+        return result
+
+    def normalize(self, kind: str, values: pd.Series) -> pd.Series:
+        """``values`` with every text mapped by match(); other values are kept."""
+        texts = values.map(lambda v: isinstance(v, str))
+        if not texts.any():
+            return values
+        mapping = {v: self.match(kind, v).name for v in values[texts].unique()}
+        return values.where(~texts, values.map(mapping))
+
+    def cleaner(self, kind: str, columns: list[str], then: Optional[Callable] = None) -> Callable:
+        """
+        A cleaner for analyze_grouped normalizing ``columns`` before ``then``
+        (e.g. clean_chems).
+        """
+
+        def clean(df: pd.DataFrame) -> pd.DataFrame:
+            for c in columns:
+                if c in df:
+                    df[c] = self.normalize(kind, df[c])
+            return then(df) if then is not None else df
+
+        return clean
+
+    def review(self) -> pd.DataFrame:
+        """Names looked up so far that are not in the dictionary but scored REVIEW or more."""
+        with self._lock:
+            items = sorted(self._memo.items())
+        rows = [
+            [kind, name, m.name, m.suggestion, round(m.score, 3)]
+            for (kind, name), m in items
+            if REVIEW <= m.score < 1.0
+        ]
+        return pd.DataFrame(rows, columns=REVIEW_COLUMNS)
+
+    def write_report(self, output_path, file_name: str = "name_review.csv") -> Optional[Path]:
+        """Writes the review report as CSV; returns its path, or None without near-misses."""
+        report = self.review()
+        if report.empty:
+            return None
+        os.makedirs(output_path, exist_ok=True)
+        out = Path(output_path) / file_name
+        report.to_csv(out, index=False, encoding="utf-8-sig")
+        logging.warning(f"⚠️  {len(report)} name(s) close to a dictionary entry, see {out}")
+        return out
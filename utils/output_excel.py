@@ -1,26 +1,161 @@
+import contextlib
+import logging
 import os
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
 
 import pandas as pd
 
+from utils import scanner
 
-def output_as(data, parameters):
+LOCK_TIMEOUT = 600  # seconds to wait for another run writing the same output
+STALE_LOCK = 1800  # a lock older than this is left over from a crashed run
+REPLACE_RETRIES = 5  # Windows refuses to replace a file while it is open elsewhere
+# OpenProcess access right, error and exit code used to check a lock's writer on Windows
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_INVALID_PARAMETER = 87
+STILL_ACTIVE = 259
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether process ``pid`` of this machine still runs (True when it cannot be told)."""
+    if os.name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return ctypes.get_last_error() != ERROR_INVALID_PARAMETER
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _stale_lock(lock: Path, stale: float) -> Optional[str]:
+    """The content of ``lock`` if its writer is gone or it is older than ``stale`` seconds."""
+    try:
+        content = lock.read_text(encoding="utf-8")
+        host, pid, _ = content.split(" ", 2)
+        age = time.time() - lock.stat().st_mtime
+        pid = int(pid)
+    except (OSError, ValueError):
+        return None  # being created or removed right now; look again
+    if age > stale or (host == socket.gethostname() and not _pid_alive(pid)):
+        return content
+    return None
+
+
+def _break_lock(lock: Path, content: str) -> None:
     """
-    Outputs the data to an Excel file with the specified parameters.
+    Removes ``lock`` if it still holds ``content``. The lock is renamed aside
+    first (atomic), so when another waiter has broken it already and taken a
+    fresh lock, that lock is not deleted but put back.
+    """
+    aside = lock.with_name(f"{lock.name}.{os.getpid()}.{threading.get_ident()}.stale")
+    try:
+        os.rename(lock, aside)
+    except OSError:
+        return  # already broken by another waiter
+    try:
+        if aside.read_text(encoding="utf-8") != content:
+            with contextlib.suppress(OSError):
+                os.link(aside, lock)  # fails if yet another lock was taken meanwhile
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(aside)
 
-    :param data: Data to be written to the Excel file.
-    :param paramaters: Dictionary containing parameters for output.
+
+@contextlib.contextmanager
+def output_lock(path, timeout: float = LOCK_TIMEOUT, stale: float = STALE_LOCK):
     """
+    Advisory lock on one output file, held while it is written.
 
-    file_name = parameters.get("file_name", "Aggregated_data.xlsx")
-    output_path = parameters.get(
-        "output_path", os.path.join(parameters["folder_path"], "Output")
+    The lock is a ``.~<name>.lock`` file next to the output, created with O_EXCL,
+    so it works across threads, processes and (on shared drives) machines. A
+    lock whose writer is gone or that is older than ``stale`` seconds is broken.
+    Leftover temporary files of the output are removed once the lock is held.
+
+    Raises:
+        TimeoutError: If another writer holds the lock for more than ``timeout`` seconds
+    """
+    path = Path(path)
+    lock = path.with_name(f"{scanner.WRITE_PREFIX}{path.name}.lock")
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            content = _stale_lock(lock, stale)
+            if content is not None:
+                logging.warning(f"⚠️  Removing stale lock {lock}")
+                _break_lock(lock, content)
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{path} is being written by another run ({lock})")
+            time.sleep(0.1)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(f"{socket.gethostname()} {os.getpid()} {datetime.now().isoformat()}")
+    try:
+        # Temporary files of this output are only written under the lock
+        for tmp in path.parent.glob(f"{scanner.WRITE_PREFIX}{path.name}.*.tmp"):
+            with contextlib.suppress(OSError):
+                tmp.unlink()
+        yield lock
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(lock)
+
+
+def atomic_write(path, write) -> None:
+    """
+    Calls ``write(file)`` on a hidden temporary file next to ``path`` and moves it
+    into place with os.replace, so readers see the old file or the new one, never
+    a partial file. The temporary file is removed if ``write`` fails.
+    """
+    path = Path(path)
+    tmp = path.with_name(
+        f"{scanner.WRITE_PREFIX}{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
     )
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(tmp, path)
+                break
+            except PermissionError:
+                if attempt == REPLACE_RETRIES - 1:
+                    raise
+                time.sleep(0.2 * 2**attempt)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
 
-    # Ensure the directory exists
-    os.makedirs(output_path, exist_ok=True)
-    print(f"Data has been written to {output_path}")
-    # Write the data to an Excel file
-    with pd.ExcelWriter(os.path.join(output_path, file_name), engine="openpyxl") as writer:
+
+def _write_sheets(data, f) -> None:
+    if len(data) == 0:
+        # openpyxl cannot save a workbook without sheets
+        raise ValueError("No sheets to write")
+    with pd.ExcelWriter(f, engine="openpyxl") as writer:
         # data.to_excel(writer, index=False)
 
         for sheet, sheet_data in data.items():
@@ -35,3 +170,32 @@ def output_as(data, parameters):
                 )
 
         # df.to_csv(outdir / f"{safe_sheet}.csv", index=False, encoding="utf-8-sig")
+
+
+def output_as(data, parameters):
+    """
+    Outputs the data to an Excel file with the specified parameters.
+
+    The workbook is written to a temporary file and renamed into place while an
+    advisory lock on the output path is held, so concurrent runs sharing an
+    output root and later stages never see a partial file.
+
+    :param data: Data to be written to the Excel file.
+    :param paramaters: Dictionary containing parameters for output.
+    """
+
+    file_name = parameters.get("file_name", "Aggregated_data.xlsx")
+    output_path = parameters.get(
+        "output_path", os.path.join(parameters["folder_path"], "Output")
+    )
+
+    # Ensure the directory exists
+    os.makedirs(output_path, exist_ok=True)
+    print(f"Data has been written to {output_path}")
+    # Write the data to an Excel file
+    target = os.path.join(output_path, file_name)
+    try:
+        with output_lock(target):
+            atomic_write(target, lambda f: _write_sheets(data, f))
+    finally:
+        scanner.invalidate(output_path)
@@ -0,0 +1,285 @@
+"""Hive-partitioned Parquet datasets of the per-folder outputs, for BI tools."""
+
+from __future__ import annotations
+
+import importlib.util
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from utils.data_cleaners import extract_first_number
+from utils.patterns import locate_region
+
+PARQUET_MODULE = "pyarrow"
+UNKNOWN = "未知"  # partition value for a missing park, city or division
+
+# Sheet column -> (dataset column, "text" | "number"), in dataset order
+CHEMICAL_COLUMNS = {
+    "危險品分類": ("category", "text"),
+    "化學物質名稱": ("name", "text"),
+    "濃度 (w/w %)": ("concentration", "text"),
+    "物質儲存型態": ("state", "text"),
+    "容器材質": ("container", "text"),
+    "管制量倍數": ("control_multiple", "number"),
+    "長(公分)": ("length_cm", "number"),
+    "寬(公分)": ("width_cm", "number"),
+    "高(公分)": ("height_cm", "number"),
+    "直徑(公分)": ("diameter_cm", "number"),
+    "單一容器最大存量(公斤)": ("container_max_kg", "number"),
+    "單一容器最大存量(公升)": ("container_max_l", "number"),
+    "廠內最大儲存量(公斤)": ("max_kg", "number"),
+    "廠內最大儲存量(公升)": ("max_l", "number"),
+    "壓力容器罐裝錶壓(kg/cm2)": ("pressure_kg_cm2", "number"),
+}
+INDUSTRY_PARTITIONS = ["region", "park"]
+FIREFIGHTER_PARTITIONS = ["city", "division"]
+# Table -> key and value columns with their types (partition columns first)
+SCHEMAS = {
+    "industry_chemicals": {
+        "region": "text",
+        "park": "text",
+        "company": "text",
+        **{name: kind for name, kind in CHEMICAL_COLUMNS.values()},
+    },
+    "industry_basic_info": {
+        "region": "text",
+        "park": "text",
+        "company": "text",
+        "field": "text",
+        "value": "text",
+    },
+    "industry_certificates": {
+        "region": "text",
+        "park": "text",
+        "company": "text",
+        "kind": "text",
+        "name": "text",
+        "count": "number",
+    },
+    "industry_equipment": {
+        "region": "text",
+        "park": "text",
+        "company": "text",
+        "name": "text",
+        "quantity": "number",
+        "available": "number",
+    },
+    "firefighter_basic_info": {
+        "city": "text",
+        "division": "text",
+        "field": "text",
+        "value": "text",
+    },
+    "firefighter_staffing": {
+        "city": "text",
+        "division": "text",
+        "role": "text",
+        "count": "number",
+    },
+    "firefighter_certificates": {
+        "city": "text",
+        "division": "text",
+        "kind": "text",
+        "name": "text",
+        "level": "text",
+        "role": "text",
+        "count": "number",
+    },
+    "firefighter_equipment": {
+        "city": "text",
+        "division": "text",
+        "category": "text",
+        "name": "text",
+        "spec": "text",
+        "quantity": "number",
+    },
+}
+JOB_TABLES = {
+    "chems": ("industry_chemicals",),
+    "equipment": ("industry_basic_info", "industry_certificates", "industry_equipment"),
+    "firefighter": (
+        "firefighter_basic_info",
+        "firefighter_staffing",
+        "firefighter_certificates",
+        "firefighter_equipment",
+    ),
+}
+# Generated files next to the per-folder outputs that are not exported
+SKIP_OUTPUTS = ("Sorted_data", "Grouped_data", "hazmat_ranking")
+
+
+def typed(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Orders and types the columns of ``df`` by SCHEMAS[table]; missing columns are null."""
+    out = {}
+    for col, kind in SCHEMAS[table].items():
+        s = df[col] if col in df else pd.Series([None] * len(df), index=df.index, dtype=object)
+        if kind == "number":
+            # "1,200" is one number here; free text such as "約 30 支" keeps its first number
+            plain = pd.to_numeric(s.astype(str).str.replace(",", "", regex=False), errors="coerce")
+            out[col] = plain.fillna(extract_first_number(s)).astype("float64")
+        else:
+            s = s.astype(object).where(s.notna(), None)
+            out[col] = s.map(lambda x: None if x is None else str(x).strip()).astype("string")
+    return pd.DataFrame(out).reset_index(drop=True)
+
+
+def _pairs(df: pd.DataFrame, name_col: str, value_cols: list[str]) -> pd.DataFrame:
+    cols = [c for c in [name_col, *value_cols] if c in df]
+    if name_col not in df:
+        return pd.DataFrame(columns=[name_col, *value_cols])
+    return df[cols][df[name_col].notna()]
+
+
+def output_workbooks(output_dir) -> list[Path]:
+    """Per-folder outputs in ``output_dir``, without the generated summaries."""
+    return sorted(
+        p
+        for p in Path(output_dir).glob("*.xlsx")
+        if p.stem not in SKIP_OUTPUTS and not p.stem.startswith(("sort_by_", "~$"))
+    )
+
+
+def industry_tables(
+    output_dir, job: str, paths: Optional[list] = None
+) -> dict[str, pd.DataFrame]:
+    """
+    Reads the per-company outputs of the chems or equipment job (one sheet per
+    park) into typed tables keyed by region, park and company.
+
+    Args:
+        paths: Company outputs to read (default: every output in ``output_dir``)
+    """
+    rows: dict[str, list[pd.DataFrame]] = {t: [] for t in JOB_TABLES[job]}
+    for path in output_workbooks(output_dir) if paths is None else map(Path, paths):
+        for park, df in pd.read_excel(path, sheet_name=None).items():
+            keys = {"region": locate_region(str(park)), "park": str(park), "company": path.stem}
+            if job == "chems":
+                renamed = df.rename(columns={k: v[0] for k, v in CHEMICAL_COLUMNS.items()})
+                rows["industry_chemicals"].append(renamed.assign(**keys))
+                continue
+            basic = _pairs(df, "基本資料", ["基本資料內容"])
+            rows["industry_basic_info"].append(
+                basic.set_axis(["field", "value"][: basic.shape[1]], axis=1).assign(**keys)
+            )
+            for kind in ("證照", "演練"):
+                certs = _pairs(df, kind, [f"{kind}數量"])
+                rows["industry_certificates"].append(
+                    certs.set_axis(["name", "count"][: certs.shape[1]], axis=1).assign(
+                        kind=kind, **keys
+                    )
+                )
+            equipment = _pairs(df, "應變設備", ["應變設備數量", "應變設備可支援數量"])
+            rows["industry_equipment"].append(
+                equipment.set_axis(
+                    ["name", "quantity", "available"][: equipment.shape[1]], axis=1
+                ).assign(**keys)
+            )
+    return {t: typed(t, pd.concat(dfs) if dfs else pd.DataFrame()) for t, dfs in rows.items()}
+
+
+def firefighter_tables(output_dir) -> dict[str, pd.DataFrame]:
+    """
+    Reads the per-division outputs (Output/<city>/<city>_<division>.xlsx) into
+    typed tables keyed by city and division.
+    """
+    rows: dict[str, list[pd.DataFrame]] = {t: [] for t in JOB_TABLES["firefighter"]}
+    for city_dir in sorted(p for p in Path(output_dir).iterdir() if p.is_dir()):
+        if city_dir.name == "Distribution_by_city":
+            continue
+        for path in output_workbooks(city_dir):
+            division = path.stem.removeprefix(f"{city_dir.name}_")
+            keys = {"city": city_dir.name, "division": division}
+            for sheet, df in pd.read_excel(path, sheet_name=None).items():
+                if "基本資料" in sheet:
+                    basic = _pairs(df, "基本資料", ["基本資料內容"])
+                    rows["firefighter_basic_info"].append(
+                        basic.set_axis(["field", "value"][: basic.shape[1]], axis=1).assign(**keys)
+                    )
+                    staff = _pairs(df, "人員編制", ["編制數量"])
+                    rows["firefighter_staffing"].append(
+                        staff.set_axis(["role", "count"][: staff.shape[1]], axis=1).assign(**keys)
+                    )
+                elif "證書" in sheet and df.shape[1] >= 3:
+                    # Rows are certificate x unit level (大隊/中隊/分隊), columns are roles
+                    long = df.melt(
+                        id_vars=list(df.columns[:2]),
+                        value_vars=list(df.columns[2:]),
+                        var_name="role",
+                        value_name="count",
+                    ).rename(columns={df.columns[0]: "name", df.columns[1]: "level"})
+                    long = long[long["name"].notna() & long["count"].notna()]
+                    rows["firefighter_certificates"].append(long.assign(kind=sheet, **keys))
+                elif "設備" in sheet and df.shape[1] >= 3:
+                    qty = next((c for c in df.columns if "數量" in str(c)), df.columns[-1])
+                    spec = df.iloc[:, 2] if df.shape[1] > 3 else None
+                    equipment = pd.DataFrame(
+                        {"name": df.iloc[:, 1], "spec": spec, "quantity": df[qty]}
+                    )
+                    rows["firefighter_equipment"].append(
+                        equipment[equipment["name"].notna()].assign(category=sheet, **keys)
+                    )
+    return {t: typed(t, pd.concat(dfs) if dfs else pd.DataFrame()) for t, dfs in rows.items()}
+
+
+def write_dataset(tables: dict[str, pd.DataFrame], dataset_dir, partition_cols: list[str]) -> Path:
+    """
+    Writes every table to ``dataset_dir/<table>/<col>=<value>/...parquet``.
+
+    Each table is written to a temporary directory that then replaces the old
+    one, so readers never see a half-written dataset. The table schema is also
+    stored in ``_common_metadata``, so it is known even when a table is empty.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dataset_dir = Path(dataset_dir)
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        df = df.copy()
+        for col in partition_cols:
+            df[col] = df[col].fillna(UNKNOWN).str.replace("/", "_", regex=False)
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        tmp = dataset_dir / f".{name}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        # One file per partition, written directly: pq.write_to_dataset %-escapes
+        # the directory names (region=%E5%8C%97...) instead of region=北部園區
+        file_schema = pa.schema([f for f in schema if f.name not in partition_cols])
+        for values, part in df.groupby(partition_cols, sort=True):
+            folder = tmp.joinpath(*(f"{c}={v}" for c, v in zip(partition_cols, values)))
+            folder.mkdir(parents=True)
+            pq.write_table(
+                pa.Table.from_pandas(
+                    part.drop(columns=partition_cols), schema=file_schema, preserve_index=False
+                ),
+                str(folder / "part-0.parquet"),
+            )
+        pq.write_metadata(schema, str(tmp / "_common_metadata"))
+        target = dataset_dir / name
+        old = dataset_dir / f".{name}.old"
+        if target.exists():
+            os.replace(target, old)
+        os.replace(tmp, target)
+        shutil.rmtree(old, ignore_errors=True)
+        logging.info(f"Wrote {len(df)} row(s) to Parquet dataset {target}")
+    return dataset_dir
+
+
+def export_parquet(output_dir, dataset_dir, job: str) -> Optional[Path]:
+    """
+    Exports the outputs of a job ("chems", "equipment" or "firefighter") as
+    Parquet datasets partitioned by region/park or by city/division.
+
+    Returns:
+        Path: ``dataset_dir``, or None when pyarrow is not installed
+    """
+    if importlib.util.find_spec(PARQUET_MODULE) is None:
+        logging.warning(f"⚠️  Parquet export needs {PARQUET_MODULE} (pip install pyarrow); skipped")
+        return None
+    if job == "firefighter":
+        return write_dataset(firefighter_tables(output_dir), dataset_dir, FIREFIGHTER_PARTITIONS)
+    return write_dataset(industry_tables(output_dir, job), dataset_dir, INDUSTRY_PARTITIONS)
@@ -1,21 +1,30 @@
 import os
-from collections import defaultdict
 from pathlib import Path
 from typing import Optional, Union
 
 import numpy as np
 import pandas as pd
 
+from .columns import ColumnBuilder
+from .templates import find_row
 
-def process_basic_data_sheet(sheet_name, dataframe, dfs_dict, required_key):
+# Numeric fields of the basic-data records
+BASIC_DATA_FLOATS = ("編制數量",)
+
+
+def process_basic_data_sheet(
+    sheet_name, dataframe, dfs_dict, required_key, plans=None, plan=None
+):
     """
     Process basic data sheet and return a DataFrame.
 
     Args:
         sheet_name (str): Name of the sheet
         dataframe (pd.DataFrame): Input dataframe to process
-        dfs_dict (dict): Dictionary to store processed data
+        dfs_dict (ColumnBuilder): Records of the workbook so far, extended in place
         required_key (str): Required key for processing
+        plans (TemplatePlans): Cached row offsets per template; None searches every time
+        plan (dict): Plan of this workbook's template
 
     Returns:
         pd.DataFrame: Processed dataframe or None if skip condition met
@@ -29,19 +38,19 @@ def process_basic_data_sheet(sheet_name, dataframe, dfs_dict, required_key):
         except_str=["E-mail"],
     )
 
-    index_staffs = j.index[j.iloc[:, 0].astype(str).str.contains("救災能量")].astype(
-        int
-    )[0]
+    if plans is not None:
+        index_staffs = plans.row(plan, f"{sheet_name}:救災能量", j, 0, "救災能量")
+    else:
+        index_staffs = find_row(j, 0, "救災能量")
 
-    dfs_dict["基本資料"].extend(j.values[0])
-    dfs_dict["基本資料內容"].extend(
-        j[1:index_staffs].dropna(axis=0, how="all").values.T.tolist()
+    dfs_dict.extend("基本資料", j.values[0])
+    dfs_dict.extend(
+        "基本資料內容", j[1:index_staffs].dropna(axis=0, how="all").values.T.tolist()
     )
-    dfs_dict["人員編制"].extend(j.values[index_staffs + 2 :, 0])
-    dfs_dict["編制數量"].extend(j.values[index_staffs + 2 :, 2].astype(float))
+    dfs_dict.extend("人員編制", j.values[index_staffs + 2 :, 0])
+    dfs_dict.extend("編制數量", j.values[index_staffs + 2 :, 2].astype(float))
 
-    df = pd.DataFrame.from_dict(dfs_dict, orient="index")
-    df = df.transpose()
+    df = dfs_dict.frame()
 
     return (dfs_dict, df)
 
@@ -66,19 +75,36 @@ def drop_cells_with_string(df, string, except_str=None):
     return df_clean
 
 
+MERGE_REQUIRED_KEYS = [
+    "基本資料",
+    "消防車輛設備",
+    "其他救災設備",
+    "國內證書",
+    "國外證書",
+    "火災搶救設備",
+    "個人防護設備",
+    "化災搶救設備",
+    "偵檢警報設備",
+]
+
+
+def sum_group_columns(key: str, required_keys: list = MERGE_REQUIRED_KEYS) -> int:
+    """
+    Number of leading columns merge_sheets_by_group groups a sheet by before summing.
+
+    Returns 0 for sheets that are not reduced by a plain group-sum (基本資料 and
+    any sheet outside required_keys).
+    """
+    if key in required_keys[1:3]:
+        return 3
+    if key in required_keys[3:]:
+        return 2
+    return 0
+
+
 def merge_sheets_by_group(
     dfs: dict,
-    required_keys: list = [
-        "基本資料",
-        "消防車輛設備",
-        "其他救災設備",
-        "國內證書",
-        "國外證書",
-        "火災搶救設備",
-        "個人防護設備",
-        "化災搶救設備",
-        "偵檢警報設備",
-    ],
+    required_keys: list = MERGE_REQUIRED_KEYS,
 ) -> dict:
     df_dict = {}
     for k, v in dfs.items():
@@ -117,16 +143,46 @@ def merge_sheets_by_group(
     return df_dict
 
 
-def other_pattern(self, keys, values, pattern):
+def locate_region(park: str) -> str:
+    """
+    Region (北部園區/中部園區/南部園區/其他) of a science park name.
+
+    Args:
+        park (str): Park name, e.g. the sheet name of a company output.
+    """
+    north_tech = ["竹科", "新竹", "龍潭", "竹南", "銅鑼"]
+    mid_tech = ["中", "台中", "后里", "虎尾", "二林"]
+    south_tech = ["南", "高雄", "楠梓", "嘉義", "樹谷", "路竹"]
+    # North -> Mid -> south
+    # Although 南 is includede in 竹南, it is sorted already, not affected.
+    if any((location in park) & (not "路" in park) for location in north_tech):
+        return "北部園區"
+    elif any(location in park for location in mid_tech):
+        return "中部園區"
+    elif any(location in park for location in south_tech):
+        return "南部園區"
+    return "其他"
+
+
+def other_pattern(self, keys, values, pattern, plan=None):
     """Collect and analysis data from keys and values based on a pattern.
     Args:
         keys (list): List of keys from the DataFrame.
         values (list): List of values corresponding to the keys.
         pattern (str): The pattern to use for reading the data.
+        plan (dict): Extraction plan of the workbook's template (see utils.templates).
 
     Returns:
         pd.DataFrame: Filtered DataFrame.
     """
+    plans = self.parameters.get("template_plans")
+
+    def locate(name, df, col, text):
+        # 以範本快取的列位置為主，找不到時回到逐列搜尋
+        if plans is None:
+            return find_row(df, col, text)
+        return plans.row(plan, name, df, col, text)
+
     # if 'pattern' in df.columns:
     #     return df[df['pattern'].str.contains(pattern, na=False)]
     # else:
@@ -139,12 +195,7 @@ def other_pattern(self, keys, values, pattern):
         print("Pattern is 苗栗縣")
         drop = values[1].columns.tolist()[1]
         values[1] = values[1].drop(drop, axis=1)
-        index_certification = (
-            values[1]
-            .index[values[1].iloc[:, 0].astype(str).str.contains("其它證書")]
-            .astype(int)[0]
-            + 1
-        )
+        index_certification = locate(f"{keys[1]}:其它證書", values[1], 0, "其它證書") + 1
         df_keys = [
             "基本資料",
             "國內證書",
@@ -160,7 +211,7 @@ def other_pattern(self, keys, values, pattern):
         ]
         n_columns = ["項次", "設備名稱", "數量"]
         df_values0 = process_basic_data_sheet(
-            keys[0], values[0], defaultdict(list), []
+            keys[0], values[0], ColumnBuilder(BASIC_DATA_FLOATS), [], plans, plan
         )[1]
         title_name = ["國內專業訓練證書(證照類型)"] + values[1].iloc[0].values.tolist()[
             1:
@@ -277,27 +328,12 @@ def other_pattern(self, keys, values, pattern):
             values (list): table of specified location.
         """
         print("Pattern is sort_by_location")
-        north_tech = ["竹科", "新竹", "龍潭", "竹南", "銅鑼"]
-        mid_tech = ["中", "台中", "后里", "虎尾", "二林"]
-        south_tech = ["南", "高雄", "楠梓", "嘉義", "樹谷", "路竹"]
-        # North -> Mid -> south
-        # Although 南 is includede in 竹南, it is sorted already, not affected.
         print(keys)
-        if any(
-            (location in keys[0]) & (not "路" in keys[0]) for location in north_tech
-        ):
-            print("Location is in 北部園區")
-            region = "北部園區"
-        elif any(location in keys[0] for location in mid_tech):
-            print("Location is in 中部園區")
-            region = "中部園區"
-
-        elif any(location in keys[0] for location in south_tech):
-            print("Location is in 南部園區")
-            region = "南部園區"
-        else:
+        region = locate_region(keys[0])
+        if region == "其他":
             print("Location not found in any region")
-            region = "其他"
+        else:
+            print(f"Location is in {region}")
         return region, values
 
     elif pattern == "industry_rescue_equipment":
@@ -306,9 +342,8 @@ def other_pattern(self, keys, values, pattern):
             keys (list):  sheet names of excel that is read in.
             values (list):  list of dfs correspond to the sheet.
         """
-        dfs = defaultdict(
-            list
-        )  # all keys:['基本資料', '基本資料內容', '證照','證照數量','演練','演練數量','應變設備','應變設備數量']
+        # all keys:['基本資料', '基本資料內容', '證照','證照數量','演練','演練數量','應變設備','應變設備數量']
+        dfs = ColumnBuilder()
         df_keys = []
         df_values = []
         for i, j in zip(keys, values):
@@ -320,15 +355,13 @@ def other_pattern(self, keys, values, pattern):
                 index_title = [[1, 1, 2, 3, 4, 3, 4], [0, 4, 0, 0, 0, 4, 4]]
                 index_value = [[1, 1, 2, 3, 4, 3, 4, 5, 6], [1, 6, 1, 1, 1, 6, 6, 2, 2]]
 
-                dfs["基本資料"].extend(j.values[index_title[0], index_title[1]])
-                dfs["基本資料"].append("經度")
-                dfs["基本資料"].append("緯度")
-                dfs["基本資料內容"].extend(j.values[index_value[0], index_value[1]])
+                dfs.extend("基本資料", j.values[index_title[0], index_title[1]])
+                dfs.append("基本資料", "經度")
+                dfs.append("基本資料", "緯度")
+                dfs.extend("基本資料內容", j.values[index_value[0], index_value[1]])
 
             elif ("證照及演練" in i) & (len(i) < 31):
-                index_training = j.index[
-                    j.iloc[:, 1].astype(str).str.contains("消防法演練")
-                ].astype(int)[0]
+                index_training = locate(f"{i}:消防法演練", j, 1, "消防法演練")
                 print("#################", index_training, j.values[index_training, 1])
                 index_title = [[i for i in range(1, index_training - 1)], [4]]
                 index_value = [[i for i in range(1, index_training - 1)], [7]]
@@ -352,10 +385,10 @@ def other_pattern(self, keys, values, pattern):
                     ],
                     [4, 7, 4, 7, 4],
                 ]
-                dfs["證照"].extend(j.values[*index_title])
-                dfs["證照數量"].extend(j.values[*index_value])
-                dfs["演練"].extend(j.values[*index_title_train])
-                dfs["演練數量"].extend(j.values[*index_value_train])
+                dfs.extend("證照", j.values[*index_title])
+                dfs.extend("證照數量", j.values[*index_value])
+                dfs.extend("演練", j.values[*index_title_train])
+                dfs.extend("演練數量", j.values[*index_value_train])
 
             elif ("應變設備" in i) & (len(i) < 31):
                 drop_rows = [
@@ -370,16 +403,14 @@ def other_pattern(self, keys, values, pattern):
                 df = df.drop(df[drop_rows].index)
                 df = df.dropna(axis=0, how="all")
 
-                dfs["應變設備"] = df.iloc[:, 0].values
-                dfs["應變設備數量"] = df.iloc[:, 1].values
-                dfs["應變設備可支援數量"] = df.iloc[:, 2].values
+                dfs.replace("應變設備", df.iloc[:, 0].values)
+                dfs.replace("應變設備數量", df.iloc[:, 1].values)
+                dfs.replace("應變設備可支援數量", df.iloc[:, 2].values)
             else:
                 pass
 
         if len(df_keys) != 0:
-            df = pd.DataFrame.from_dict(dfs, orient="index")
-            df = df.transpose()
-            df_values = df.dropna(axis=0, how="all")
+            df_values = dfs.frame().dropna(axis=0, how="all")
 
             # stacked_df = stacked_df.drop(stacked_df[a].index)
             # print("df_keys", df_keys)
@@ -400,7 +431,7 @@ def other_pattern(self, keys, values, pattern):
             df_values (list): list of DataFrames extracted from the sheets.
         """
         NUM_RE = r"(\d+)"
-        dfs = defaultdict(list)
+        dfs = ColumnBuilder(BASIC_DATA_FLOATS)
         required_keys = [
             "基本資料",
             "消防車輛設備",
@@ -421,7 +452,9 @@ def other_pattern(self, keys, values, pattern):
         for i, j in zip(keys, values):
             i = typo_map.get(i, i)
             if (required_keys[0] in i) & (len(i) < 31):
-                dfs, df = process_basic_data_sheet(i, j, dfs, required_keys[0])
+                dfs, df = process_basic_data_sheet(
+                    i, j, dfs, required_keys[0], plans, plan
+                )
                 if df is not None:
                     df_keys.append(required_keys[0])
                     df_values.append(df)
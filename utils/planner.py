@@ -0,0 +1,199 @@
+"""Dry-run workload estimate from workbook metadata and past run timings."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from utils import scanner
+from utils.extent import used_ranges
+from utils.history import BASE_MB, RunHistory
+
+# Used until a stage has history: single-worker parse speed and memory per MB of a folder
+DEFAULT_SECONDS_PER_MB = 4.0
+DEFAULT_MB_PER_FOLDER_MB = 40.0
+
+
+class SheetInfo(NamedTuple):
+    name: str
+    rows: int
+    cols: int
+
+
+class WorkbookInfo(NamedTuple):
+    path: str
+    size: int
+    sheets: tuple  # SheetInfo per sheet; empty when the format cannot be probed
+
+
+class FolderPlan(NamedTuple):
+    stage: str
+    folder: str
+    files: int
+    sheets: int
+    rows: int
+    bytes: int
+    seconds: float
+
+
+def workbook_info(path) -> WorkbookInfo:
+    """
+    Sheet names and used-range dimensions of a workbook, read from its metadata.
+
+    For .xlsx/.xlsm the rows and columns are the real data extent from
+    utils.extent (0 where it cannot be measured), so no cell data is parsed.
+    """
+    path = str(path)
+    e = scanner.entry(path)
+    size = e.size if e else 0
+    sheets = ()
+    suffix = Path(path).suffix.lower()
+    try:
+        if suffix in (".xlsx", ".xlsm"):
+            ranges = used_ranges(path) or {}
+            sheets = tuple(
+                SheetInfo(name, r.rows, r.cols) if r else SheetInfo(name, 0, 0)
+                for name, r in ranges.items()
+            )
+        elif suffix == ".xls":
+            import xlrd
+
+            book = xlrd.open_workbook(path, on_demand=True)
+            try:
+                sheets = tuple(
+                    SheetInfo(name, book.sheet_by_name(name).nrows, book.sheet_by_name(name).ncols)
+                    for name in book.sheet_names()
+                )
+            finally:
+                book.release_resources()
+    except Exception as e:
+        logging.warning(f"⚠️  Cannot read metadata of {path}: {type(e).__name__}: {e}")
+    return WorkbookInfo(path, size, sheets)
+
+
+def makespan(durations: Iterable[float], workers: int) -> float:
+    """Longest-processing-time-first schedule length of ``durations`` on ``workers``."""
+    loads = [0.0] * max(workers, 1)
+    for d in sorted(durations, reverse=True):
+        heapq.heapreplace(loads, loads[0] + d)
+    return max(loads)
+
+
+def plan_workload(
+    units: list[tuple[str, str, list[str]]],
+    stages: list[str],
+    history: Optional[RunHistory],
+    workers: int = 1,
+) -> dict:
+    """
+    Estimates a run from metadata only.
+
+    Args:
+        units: (input stage, folder, workbook paths) per folder
+        stages: All stages of the job in order; stages without units (sorting,
+                analysis) read generated outputs and are estimated from history
+        history: Past run timings (None uses the default rates)
+        workers: Worker count to project for (folders of an input stage run in parallel)
+
+    Returns:
+        dict: {"folders": [FolderPlan], "stages": [dict], "seconds": float,
+               "peak_mb": float, "workers": int}
+    """
+    cache = {}  # a workbook read by two stages is probed once
+    folders = [
+        (stage, folder, [cache.get(f) or cache.setdefault(f, workbook_info(f)) for f in files])
+        for stage, folder, files in units
+    ]
+    total_bytes = sum(i.size for i in cache.values())
+    total_mb = total_bytes / (1024 * 1024)
+
+    folder_plans = []
+    stage_rows = []
+    seconds = 0.0
+    peak = BASE_MB
+    for stage in stages:
+        rates = history.rates(stage) if history is not None else None
+        sec_per_mb = rates["seconds_per_mb"] if rates else DEFAULT_SECONDS_PER_MB
+        mem_per_mb = (rates or {}).get("mb_per_folder_mb", DEFAULT_MB_PER_FOLDER_MB)
+        mine = [(folder, infos) for s, folder, infos in folders if s == stage]
+        if mine:
+            durations = []
+            sizes = []
+            for folder, infos in mine:
+                size = sum(i.size for i in infos)
+                fp = FolderPlan(
+                    stage,
+                    folder,
+                    len(infos),
+                    sum(len(i.sheets) for i in infos),
+                    sum(s.rows for i in infos for s in i.sheets),
+                    size,
+                    size / (1024 * 1024) * sec_per_mb,
+                )
+                folder_plans.append(fp)
+                durations.append(fp.seconds)
+                sizes.append(size / (1024 * 1024))
+            stage_seconds = makespan(durations, workers)
+            # Every worker holds one folder at a time; the largest ones may coincide
+            stage_peak = BASE_MB + mem_per_mb * sum(sorted(sizes, reverse=True)[:workers])
+        else:
+            stage_seconds = total_mb * sec_per_mb
+            stage_peak = (rates or {}).get("peak_mb", BASE_MB)
+        seconds += stage_seconds
+        peak = max(peak, stage_peak)
+        stage_rows.append(
+            {
+                "stage": stage,
+                "folders": len(mine),
+                "files": sum(len(infos) for _, infos in mine),
+                "sheets": sum(len(i.sheets) for _, infos in mine for i in infos),
+                "rows": sum(s.rows for _, infos in mine for i in infos for s in i.sheets),
+                "bytes": sum(i.size for _, infos in mine for i in infos),
+                "seconds": stage_seconds,
+                "peak_mb": stage_peak,
+                "history_runs": rates["runs"] if rates else 0,
+            }
+        )
+    return {
+        "folders": folder_plans,
+        "stages": stage_rows,
+        "seconds": seconds,
+        "peak_mb": peak,
+        "workers": workers,
+    }
+
+
+def _label(folder: str) -> str:
+    p = Path(folder)
+    return f"{p.parent.name}/{p.name}"
+
+
+def print_plan(plan: dict) -> None:
+    """Prints the per-folder and per-stage estimate."""
+    width = max((len(_label(f.folder)) for f in plan["folders"]), default=6)
+    print(
+        f"{'Folder'.ljust(width)}  {'Stage':<36} {'Files':>5} {'Sheets':>6} "
+        f"{'Rows':>9} {'MB':>8} {'Est. s':>8}"
+    )
+    for f in plan["folders"]:
+        print(
+            f"{_label(f.folder).ljust(width)}  {f.stage:<36} {f.files:>5} {f.sheets:>6} "
+            f"{f.rows:>9} {f.bytes / 1048576:>8.1f} {f.seconds:>8.1f}"
+        )
+    print()
+    print(
+        f"{'Stage':<36} {'Files':>5} {'Rows':>9} {'MB':>8} {'Est. s':>8} {'Peak MB':>8}  History"
+    )
+    for s in plan["stages"]:
+        history = f"{s['history_runs']} run(s)" if s["history_runs"] else "none (default rates)"
+        print(
+            f"{s['stage']:<36} {s['files']:>5} {s['rows']:>9} {s['bytes'] / 1048576:>8.1f} "
+            f"{s['seconds']:>8.1f} {s['peak_mb']:>8.0f}  {history}"
+        )
+    minutes = plan["seconds"] / 60
+    print(
+        f"Projected with {plan['workers']} worker(s): {minutes:.1f} min, "
+        f"peak memory about {plan['peak_mb']:.0f} MB"
+    )
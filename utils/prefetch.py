@@ -0,0 +1,83 @@
+"""Read-ahead of workbook bytes on background threads."""
+
+from __future__ import annotations
+
+import io
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Union
+
+from utils import scanner
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class Prefetcher:
+    """
+    Iterates over file paths and yields each file as an in-memory buffer.
+
+    While the caller parses one workbook, the next ``depth`` files are read on
+    background threads. Read-ahead stops early when the buffered files, the one
+    being parsed included, would exceed ``max_bytes``; at least one file is
+    always in flight.
+
+    Usage:
+        for path, source in Prefetcher(paths, depth=4):
+            pd.read_excel(source, sheet_name=None)
+
+    ``source`` is an io.BytesIO, or the path itself when reading in the
+    background failed (the parser then opens the file and reports the error).
+    """
+
+    def __init__(self, paths: Iterable[str], depth: int = 2, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            paths: Files to read, in the order they will be consumed
+            depth: Maximum number of files read ahead of the current one
+            max_bytes: Upper bound on the total size of buffered files
+        """
+        self.paths = list(paths)
+        self.depth = max(int(depth), 1)
+        self.max_bytes = max_bytes
+
+    def __iter__(self) -> Iterator[tuple[str, Union[io.BytesIO, str]]]:
+        pending = deque()  # (path, size, future)
+        buffered = 0  # pending files plus the one the caller holds
+        upcoming = iter(self.paths)
+        next_path = next(upcoming, None)
+        executor = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="prefetch")
+
+        def top_up() -> None:
+            nonlocal buffered, next_path
+            while next_path is not None and len(pending) < self.depth:
+                size = _file_size(next_path)
+                if pending and buffered + size > self.max_bytes:
+                    break
+                pending.append((next_path, size, executor.submit(read_bytes, next_path)))
+                buffered += size
+                next_path = next(upcoming, None)
+
+        try:
+            top_up()
+            while pending:
+                path, size, future = pending.popleft()
+                try:
+                    source = io.BytesIO(future.result())
+                except OSError as e:
+                    logging.warning(f"Prefetch failed for {path}: {e}")
+                    source = path
+                top_up()  # before yielding, so the reads overlap the caller's parse
+                yield path, source
+                buffered -= size
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def _file_size(path: str) -> int:
+    e = scanner.entry(path)
+    return e.size if e is not None else 0
@@ -0,0 +1,258 @@
+"""Pre-flight check of workbook structure before a full run."""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+ANCHOR_ROWS = 300  # rows searched for anchor cells such as "救災能量"
+HEAD_ROWS = 6  # rows used to measure the width of a table
+
+FIREFIGHTER_SHEETS = [
+    "基本資料",
+    "消防車輛設備",
+    "其他救災設備",
+    "國內證書",
+    "國外證書",
+    "火災搶救設備",
+    "個人防護設備",
+    "化災搶救設備",
+    "偵檢警報設備",
+]
+TYPO_MAP = {"國內證照": "國內證書", "國外證照": "國外證書"}
+
+
+class CheckResult(NamedTuple):
+    file: str
+    pattern: str
+    status: str  # "pass", "fail", "n/a" (no sheets of this pattern) or "unchecked"
+    problems: tuple
+    headers: Optional[dict] = None  # sheet -> header cells, for HEADER_PATTERNS
+
+
+class Probe:
+    """
+    Opens a workbook in openpyxl read-only mode and reads only the cells asked for.
+
+    Rows and columns are 0-based and follow pandas: row 0 is the header row
+    (Excel row 1), row r of the DataFrame is Excel row r + 2.
+    """
+
+    def __init__(self, path):
+        from openpyxl import load_workbook
+
+        self.wb = load_workbook(path, read_only=True, data_only=True)
+        self.sheet_names = list(self.wb.sheetnames)
+
+    def close(self) -> None:
+        self.wb.close()
+
+    def header(self, sheet: str) -> list:
+        rows = self.wb[sheet].iter_rows(min_row=1, max_row=1, values_only=True)
+        return _trim(next(rows, ()))
+
+    def cell(self, sheet: str, row: int, col: int):
+        rows = self.wb[sheet].iter_rows(
+            min_row=row + 2, max_row=row + 2, min_col=col + 1, max_col=col + 1, values_only=True
+        )
+        values = next(rows, (None,))
+        return values[0] if values else None
+
+    def width(self, sheet: str) -> int:
+        rows = self.wb[sheet].iter_rows(min_row=1, max_row=HEAD_ROWS, values_only=True)
+        return max((len(_trim(r)) for r in rows), default=0)
+
+    def find(self, sheet: str, col: int, text: str) -> Optional[int]:
+        """DataFrame row of the first cell in column ``col`` containing ``text``."""
+        rows = self.wb[sheet].iter_rows(
+            min_row=2, max_row=ANCHOR_ROWS, min_col=col + 1, max_col=col + 1, values_only=True
+        )
+        for r, values in enumerate(rows):
+            if values and values[0] is not None and text in str(values[0]):
+                return r
+        return None
+
+
+def _trim(row) -> list:
+    row = list(row)
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def _blank(value) -> bool:
+    return value is None or str(value).strip() == ""
+
+
+def _sheets(probe: Probe, text: str) -> list[str]:
+    return [s for s in probe.sheet_names if text in s and len(s) < 31]
+
+
+def check_chems(probe: Probe) -> tuple[str, list[str]]:
+    """Sheets and cells read by the top_ten_operating_chemicals pattern."""
+    parks = _sheets(probe, "廠場達管制量30倍")
+    tables = _sheets(probe, "公共危險物品運作資料")
+    if not parks and not tables:
+        return "n/a", []
+    problems = []
+    if not parks:
+        problems.append("missing sheet 廠場達管制量30倍")
+    if not tables:
+        problems.append("missing sheet 公共危險物品運作資料")
+    for s in parks:
+        if _blank(probe.cell(s, 1, 1)) and _blank(probe.cell(s, 1, 2)):
+            problems.append(f"{s}: park name (B3/C3) is empty")
+    for s in tables:
+        width = probe.width(s)
+        if width < 16:
+            problems.append(f"{s}: {width} columns, expected at least 16")
+    return ("fail" if problems else "pass"), problems
+
+
+def check_equipment(probe: Probe) -> tuple[str, list[str]]:
+    """Sheets, anchors and cells read by the industry_rescue_equipment pattern."""
+    basic = _sheets(probe, "基本資料")
+    if not basic:
+        return "n/a", []
+    problems = []
+    for s in basic:
+        if _blank(probe.cell(s, 1, 6)):
+            problems.append(f"{s}: park (G3) is empty")
+        if probe.width(s) < 7:
+            problems.append(f"{s}: expected at least 7 columns")
+    certs = _sheets(probe, "證照及演練")
+    if not certs:
+        problems.append("missing sheet 證照及演練")
+    for s in certs:
+        if probe.find(s, 1, "消防法演練") is None:
+            problems.append(f"{s}: anchor 消防法演練 not found in column B")
+    equipment = _sheets(probe, "應變設備")
+    if not equipment:
+        problems.append("missing sheet 應變設備")
+    for s in equipment:
+        if probe.width(s) < 8:
+            problems.append(f"{s}: expected at least 8 columns (設備名稱/數量/可支援數量)")
+    return ("fail" if problems else "pass"), problems
+
+
+def check_firefighter(probe: Probe) -> tuple[str, list[str]]:
+    """Sheets, anchors and headers read by the firefighter_rescue_survey pattern."""
+    names = {TYPO_MAP.get(s, s): s for s in probe.sheet_names}
+    problems = []
+    for key in FIREFIGHTER_SHEETS:
+        matches = [s for n, s in names.items() if key in n]
+        if not matches:
+            problems.append(f"missing sheet {key}")
+            continue
+        sheet = matches[0]
+        if key == "基本資料":
+            if probe.find(sheet, 0, "救災能量") is None:
+                problems.append(f"{sheet}: anchor 救災能量 not found in column A")
+        elif "設備" in key and not any("數量" in str(h) for h in probe.header(sheet)):
+            problems.append(f"{sheet}: no 數量 column in the header")
+    return ("fail" if problems else "pass"), problems
+
+
+def check_miaoli(probe: Probe) -> tuple[str, list[str]]:
+    """Sheets read by position by the 苗栗縣 pattern."""
+    names = probe.sheet_names
+    if len(names) < 3:
+        return "fail", [f"{len(names)} sheet(s), expected at least 3"]
+    problems = []
+    if probe.find(names[0], 0, "救災能量") is None:
+        problems.append(f"{names[0]}: anchor 救災能量 not found in column A")
+    if probe.find(names[1], 0, "其它證書") is None:
+        problems.append(f"{names[1]}: anchor 其它證書 not found in column A")
+    if probe.width(names[2]) < 17:
+        problems.append(f"{names[2]}: expected at least 17 columns")
+    return ("fail" if problems else "pass"), problems
+
+
+CHECKS = {
+    "top_ten_operating_chemicals": check_chems,
+    "industry_rescue_equipment": check_equipment,
+    "firefighter_rescue_survey": check_firefighter,
+    "苗栗縣": check_miaoli,
+}
+# Patterns whose sheets are read by column name, so every file needs the same headers
+HEADER_PATTERNS = ("firefighter_rescue_survey",)
+
+
+def check_file(path, pattern: str) -> CheckResult:
+    """Checks one workbook against the template of ``pattern``."""
+    path = str(path)
+    if Path(path).suffix.lower() not in (".xlsx", ".xlsm"):
+        return CheckResult(path, pattern, "unchecked", ("only .xlsx/.xlsm are pre-checked",))
+    try:
+        probe = Probe(path)
+    except Exception as e:
+        return CheckResult(path, pattern, "fail", (f"cannot open: {type(e).__name__}: {e}",))
+    headers = None
+    try:
+        status, problems = CHECKS[pattern](probe)
+        if pattern in HEADER_PATTERNS:
+            headers = {
+                TYPO_MAP.get(s, s): tuple(str(h).strip() for h in probe.header(s))
+                for s in probe.sheet_names
+            }
+    except Exception as e:
+        status, problems = "fail", [f"{type(e).__name__}: {e}"]
+    finally:
+        probe.close()
+    return CheckResult(path, pattern, status, tuple(problems), headers)
+
+
+def compare_headers(results: list[CheckResult]) -> list[CheckResult]:
+    """
+    Fails files whose sheet headers differ from the headers most files of the
+    same pattern share (e.g. a renamed role column in 國內證書).
+    """
+    headers = {r.file: r.headers for r in results if r.headers is not None}
+    if len(headers) < 2:
+        return results
+    expected = {}
+    for sheets in headers.values():
+        for s, h in sheets.items():
+            expected.setdefault(s, Counter())[h] += 1
+    expected = {s: c.most_common(1)[0][0] for s, c in expected.items()}
+    checked = []
+    for r in results:
+        problems = list(r.problems)
+        for s, h in headers.get(r.file, {}).items():
+            if h != expected[s]:
+                missing = [c for c in expected[s] if c not in h]
+                extra = [c for c in h if c not in expected[s]]
+                problems.append(
+                    f"{s}: header differs from other files "
+                    f"(missing {missing}, unexpected {extra})"
+                )
+        status = "fail" if problems else r.status
+        checked.append(r._replace(status=status, problems=tuple(problems)))
+    return checked
+
+
+def preflight(files: Iterable[tuple[str, str]]) -> list[CheckResult]:
+    """
+    Checks (path, pattern) pairs without parsing the workbooks.
+
+    Returns:
+        list: One CheckResult per pair, in input order
+    """
+    results = [check_file(path, pattern) for path, pattern in files]
+    return compare_headers(results)
+
+
+def print_table(results: list[CheckResult]) -> None:
+    """Prints a per-file pass/fail table and a summary line."""
+    width = max((len(r.file) for r in results), default=4)
+    print(f"{'File'.ljust(width)}  {'Pattern':<28}  Status     Problems")
+    for r in results:
+        problems = "; ".join(r.problems)
+        print(f"{r.file.ljust(width)}  {r.pattern:<28}  {r.status:<9}  {problems}")
+    counts = Counter(r.status for r in results)
+    summary = ", ".join(f"{n} {s}" for s, n in counts.items())
+    print(f"Pre-flight: {len(results)} file(s) checked: {summary}")
+    if counts.get("fail"):
+        logging.warning(f"⚠️  {counts['fail']} workbook(s) failed the pre-flight check")
@@ -0,0 +1,168 @@
+"""Top-K rankings of hazardous chemical inventories per region, kept per company."""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from utils.parquet_export import CHEMICAL_COLUMNS, typed
+from utils.patterns import locate_region
+
+NATION = "全國"
+# Ranked column -> dataset column of parquet_export.CHEMICAL_COLUMNS
+RANK_MEASURES = {
+    "廠內最大儲存量(公斤)": "max_kg",
+    "廠內最大儲存量(公升)": "max_l",
+    "管制量倍數": "control_multiple",
+}
+REPORT_COLUMNS = ["排名類型", "指標", "名次", "廠商", "園區", "化學物質名稱", "數值"]
+
+
+class HazmatRanking:
+    """
+    Top ``k`` chemical inventories and companies by storage and 管制量倍數, per
+    region and nationwide.
+
+    Each company keeps, per region and measure, its own total and its ``k``
+    largest inventories (a chemical at one park, summed over containers and
+    storage states), selected with a bounded heap while its output is ingested.
+    A region's top ``k`` is always among the union of its companies' top ``k``,
+    so rankings merge these short lists instead of sorting every row, and a
+    company that resubmits only replaces its own lists. Memory grows with ``k``
+    and the number of companies, not with the number of rows.
+    """
+
+    def __init__(self, k: int = 10, path=None):
+        """
+        Args:
+            k: Entries per ranking
+            path: JSON file the lists are kept in between runs (None keeps them in memory)
+        """
+        self.k = int(k)
+        self.path = Path(path) if path else None
+        # company -> region -> measure -> {"total": float, "top": [[value, park, chemical]]}
+        self.companies: dict[str, dict] = {}
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("k", 0) < self.k:
+            # Shorter lists cannot give the new top k; companies are read again instead
+            logging.info(f"Ranking lists in {self.path} hold fewer than {self.k}; rebuilding them")
+            return
+        self.companies = {
+            company: {
+                region: {
+                    m: {"total": v["total"], "top": v["top"][: self.k]} for m, v in measures.items()
+                }
+                for region, measures in regions.items()
+            }
+            for company, regions in state.get("companies", {}).items()
+        }
+
+    def has(self, company: str) -> bool:
+        return company in self.companies
+
+    def ingest(self, company: str, sheets: dict) -> None:
+        """
+        Replaces the lists of ``company`` with those of its output.
+
+        Args:
+            company: Company (folder) name
+            sheets: Park name -> chemical table, as written by the chems job
+        """
+        regions: dict[str, dict] = {}
+        for park, df in sheets.items():
+            if df is None or not len(df):
+                continue
+            renamed = df.rename(columns={k: v[0] for k, v in CHEMICAL_COLUMNS.items()})
+            chems = typed("industry_chemicals", renamed)
+            chems = chems[chems["name"].notna()]
+            region = regions.setdefault(locate_region(str(park)), {})
+            for column in RANK_MEASURES.values():
+                sums = chems.groupby("name", sort=False)[column].sum(min_count=1)
+                entry = region.setdefault(column, {"total": 0.0, "top": []})
+                entry["total"] += float(sums.sum())
+                entry["top"] = heapq.nlargest(
+                    self.k,
+                    entry["top"]
+                    + [[float(v), str(park), str(name)] for name, v in sums.items() if v > 0],
+                    key=lambda e: e[0],
+                )
+        self.companies[company] = regions
+
+    def ingest_file(self, company: str, path) -> None:
+        """ingest() of a company output workbook."""
+        self.ingest(company, pd.read_excel(path, sheet_name=None))
+
+    def retain(self, companies: Iterable[str]) -> None:
+        """Drops the lists of every company not in ``companies`` (e.g. a removed folder)."""
+        keep = set(companies)
+        for company in [c for c in self.companies if c not in keep]:
+            del self.companies[company]
+
+    def _regions(self, region: Optional[str]):
+        for company in sorted(self.companies):
+            for name, measures in self.companies[company].items():
+                if region in (None, NATION, name):
+                    yield company, measures
+
+    def top_chemicals(self, measure: str, region: Optional[str] = None) -> list[tuple]:
+        """
+        Largest inventories as (value, company, park, chemical), largest first.
+
+        Args:
+            measure: One of RANK_MEASURES
+            region: A region of locate_region(); None or NATION ranks all of them
+        """
+        column = RANK_MEASURES[measure]
+        entries = (
+            (top[0], company, top[1], top[2])
+            for company, measures in self._regions(region)
+            for top in measures.get(column, {}).get("top", [])
+        )
+        return heapq.nlargest(self.k, entries, key=lambda e: e[0])
+
+    def top_companies(self, measure: str, region: Optional[str] = None) -> list[tuple]:
+        """Companies as (value, company) by their total in ``region``, largest first."""
+        column = RANK_MEASURES[measure]
+        totals: dict[str, float] = {}
+        for company, measures in self._regions(region):
+            totals[company] = totals.get(company, 0.0) + measures.get(column, {}).get("total", 0.0)
+        entries = ((v, c) for c, v in totals.items() if v > 0)
+        return heapq.nlargest(self.k, entries, key=lambda e: e[0])
+
+    def report(self) -> dict[str, pd.DataFrame]:
+        """One sheet per scope (全國 first, then each region) with every ranking."""
+        regions = sorted({r for regions in self.companies.values() for r in regions})
+        sheets = {}
+        for scope in [NATION, *regions]:
+            rows = []
+            for measure in RANK_MEASURES:
+                for rank, (value, company, park, name) in enumerate(
+                    self.top_chemicals(measure, scope), 1
+                ):
+                    rows.append(["化學物質", measure, rank, company, park, name, value])
+                for rank, (value, company) in enumerate(self.top_companies(measure, scope), 1):
+                    rows.append(["廠商", measure, rank, company, None, None, value])
+            sheets[scope] = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+        return sheets
+
+    def save(self) -> Optional[Path]:
+        """Writes the lists to ``path`` via a temporary file."""
+        if self.path is None:
+            return None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".~{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"k": self.k, "companies": self.companies}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        return self.path
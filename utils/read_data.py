@@ -1,10 +1,19 @@
 import copy
+import io
+import logging
 import os
+import time
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
+from . import scanner
+from .extent import used_ranges
+from .failures import RETRY_DELAY, fallback_engines
+from .prefetch import Prefetcher
+from .templates import PLANNED_PATTERNS
+
 
 class read_data:
     """
@@ -19,8 +28,31 @@ class read_data:
         Args:
         pattern (str): The pattern to use for reading the data in one excel file. Default is "default".
         read_all_sheets (bool): Whether to read all sheets in the Excel files. Default
+        prefetch_depth (int): Number of files read ahead into memory while parsing. Default is 2, 0 disables.
+        prefetch_max_mb (float): Upper bound on the size of read-ahead buffers. Default is 256.
+        content_index (ContentIndex): Shared content-hash index; identical workbooks are parsed once
+            and, with ContentIndex(skip_duplicates=True), left out of the results. Default is None.
+        error_report (ErrorReport): Shared error report whose policy decides what happens when a
+            workbook fails ("skip", "retry" reading it again, "abort"). Default is None.
+        failure_policy (str): Policy used without an error_report. Default is "skip".
+        retry_delay (float): Seconds waited before each retry of a failed read. Default is 2.
+        template_plans (TemplatePlans): Shared extraction plans per template fingerprint, reusing the
+            row offsets found in earlier workbooks of the same template. Default is None.
+        parse_pool (ParsePool): Shared worker pool; workbooks are parsed in worker processes
+            (results come back through shared memory) while patterns run here. Default is None.
+        cost_model (CostModel): Estimated parse cost per workbook; the pool is given the most
+            expensive workbooks first. Default is None (folder order).
+        lookahead (list): Workbooks of the next folder, started in the pool once every workbook
+            of this folder is under way. Default is None.
+        events (EventBus): Shared progress events; every workbook read emits BytesRead,
+            RowsProcessed and FileDone. Default is None.
         """
-        self.parameters = copy.deepcopy(parameters)
+        # Plain containers are copied; shared run objects (error report, indexes,
+        # pools, event bus) are kept by reference so every reader updates the same one
+        self.parameters = {
+            k: copy.deepcopy(v) if isinstance(v, (list, dict, set)) else v
+            for k, v in parameters.items()
+        }
         self.parameters["read_all_sheets"] = self.parameters.get(
             "read_all_sheets", True
         )
@@ -34,6 +66,7 @@ class read_data:
             "sort_by_certificate.xlsx",
             "sort_by_training.xlsx",
             "sort_by_equipment.xlsx",
+            "hazmat_ranking.xlsx",
         )
 
     def get_path(self):
@@ -74,10 +107,9 @@ class read_data:
             # Default to Data subdirectory
             return os.path.join(path, "Data")
 
-    def list_subfiles(self, root: Path, exclude=()) -> list[Path]:
-        root = Path(root)
-        excl = set(exclude)
-        return [str(p) for p in root.iterdir() if p.is_file() and p.name not in excl]
+    def list_subfiles(self, root: Path, exclude=()) -> list[str]:
+        """Lists file paths under root via the shared scanner (exclude entries are glob patterns)."""
+        return [e.path for e in scanner.list_files(root, exclude)]
 
     def stack_tables(self, keys, values):
         """Stacks the tables from the keys and values into a single DataFrame.
@@ -110,21 +142,145 @@ class read_data:
         if pattern == "default":
             # If the pattern is default, return keys and values as is
             return keys, values
-        else:
+        plans = self.parameters.get("template_plans")
+        if plans is None or pattern not in PLANNED_PATTERNS:
             return self.other_pattern(keys, values, pattern)
+        return self.other_pattern(keys, values, pattern, plans.plan(keys, values))
+
+    def read_one_excel(self, file_path, engine=None, name=None):
+        """Reads sheets from a workbook path or an in-memory buffer.
 
-    def read_one_excel(self, file_path):
+        For .xlsx/.xlsm workbooks the real data extent of each sheet is measured
+        first (utils.extent) and only rows up to the last value are parsed, so
+        formatting that reaches down to row 1,048,576 never becomes an all-NaN grid.
+        Args:
+            file_path (str | io.BytesIO): Workbook to read.
+            engine (str): pandas engine; None lets pandas choose from the file type.
+            name (str): File name used in log messages. Default is the path.
+        Returns:
+            tuple: (sheet names, DataFrames)
+        """
         read_all_sheets = self.parameters["read_all_sheets"]
         sheet_names = self.parameters.get("sheet_names", None)
         sheet_name = (
             None if read_all_sheets else sheet_names
         )  # Read all sheets if not specified
-        df = pd.read_excel(file_path, sheet_name=sheet_name, thousands=",")
+        ranges = None
+        if sheet_name is None and engine in (None, "openpyxl"):
+            ranges = used_ranges(file_path, name or str(file_path))
+        if ranges is None:
+            df = pd.read_excel(
+                file_path, sheet_name=sheet_name, thousands=",", engine=engine
+            )
+        else:
+            # Trailing columns need no limit: empty cells at the end of a row are dropped
+            with pd.ExcelFile(file_path, engine=engine) as xl:
+                df = {
+                    sheet: xl.parse(
+                        sheet,
+                        thousands=",",
+                        nrows=ranges[sheet].rows if ranges.get(sheet) else None,
+                    )
+                    for sheet in xl.sheet_names
+                }
         df_keys = []
         df_values = []
         [(df_keys.append(i), df_values.append(j)) for i, j in df.items()]
         return df_keys, df_values
 
+    def process_file(self, file, source, task=None):
+        """Reads one workbook and applies the pattern under the failure policy.
+        Args:
+            file (str): Path of the workbook.
+            source (str | io.BytesIO): The path, or its prefetched bytes.
+            task (ParseTask): The workbook being parsed in the parse pool, used for the
+                first attempt instead of parsing here.
+        Returns:
+            The result of read_with_pattern, or None if the file failed and was skipped.
+        """
+        report = self.parameters.get("error_report")
+        policy = (
+            report.policy
+            if report is not None
+            else self.parameters.get("failure_policy", "skip")
+        )
+        pattern = self.parameters["pattern"]
+        index = self.parameters.get("content_index")
+        events = self.parameters.get("events")
+        # (engine, source) per attempt; retries read the file again from disk
+        attempts = [(None, source)]
+        if policy == "retry":
+            attempts += [(None, file)] + [(e, file) for e in fallback_engines(file)]
+        delay = self.parameters.get("retry_delay", RETRY_DELAY)
+        error = None
+        for attempt, (engine, src) in enumerate(attempts):
+            stage = "read"
+            try:
+                if attempt:
+                    time.sleep(delay)
+                if hasattr(src, "seek"):
+                    src.seek(0)
+                read = lambda: self.read_one_excel(src, name=file)
+                if attempt == 0 and task is not None:
+                    read = task.result
+                if attempt == 0 and index is not None:
+                    df_keys, df_values = index.load(file, read)
+                elif engine is None:
+                    df_keys, df_values = read()
+                else:
+                    df_keys, df_values = self.read_one_excel(src, engine, file)
+                stage = "pattern"
+                result = self.read_with_pattern(df_keys, df_values, pattern)
+            except Exception as e:
+                error = e
+                # The same sheets would fail the pattern again, so only reads are retried
+                last = attempt == len(attempts) - 1 or stage == "pattern"
+                if policy == "abort":
+                    action = "aborted"
+                else:
+                    action = "skipped" if last else "retrying"
+                self._record_failure(report, file, stage, e, action, pattern, engine)
+                if policy == "abort":
+                    raise
+                if last:
+                    break
+                continue
+            if error is not None:
+                self._record_failure(
+                    report, file, stage, error, "recovered", pattern, engine
+                )
+            if events is not None:
+                e = scanner.entry(file)
+                rows = sum(len(v) for v in df_values if hasattr(v, "__len__"))
+                events.file_read(file, rows, e.size if e else 0)
+            return result
+        if events is not None:
+            events.file_failed(file)
+        return None
+
+    def _record_failure(self, report, file, stage, error, action, pattern, engine):
+        if report is not None:
+            report.record(file, stage, error, action, pattern=pattern, engine=engine)
+        else:
+            logging.error(
+                f"{stage} failed for {file} ({type(error).__name__}: {error}); {action}"
+            )
+
+    def list_excel_files(self, folder_path):
+        """Lists the Excel files in a folder that read_excel_files would read.
+        Args:
+            folder_path (str): Directory containing Excel files
+        Returns:
+            list: Paths of the Excel files
+        """
+        # files = os.listdir(folder_path)
+        files = self.list_subfiles(folder_path, self.exclude_files)
+        if self.parameters.get("file_name") in files:
+            files.remove(
+                self.parameters["file_name"]
+            )  # Remove the Output file if it exists
+        return [f for f in files if f.endswith((".xlsx", ".xls", ".xlsm", "ods"))]
+
     def read_excel_files(self):
         """
         Reads and processes all Excel files from specified directory.
@@ -139,25 +295,103 @@ class read_data:
             tuple: (file_name, keys, values) for each processed Excel file
         """
         folder_path = self.parameters["folder_path"]
-        pattern = self.parameters["pattern"]
-        # files = os.listdir(folder_path)
-        files = self.list_subfiles(folder_path, self.exclude_files)
         print(f"Folder path: {folder_path}")
-
-        if self.parameters["file_name"] in files:
-            files.remove(
-                self.parameters["file_name"]
-            )  # Remove the Output file if it exists
-        excel_files = [
-            f for f in files if f.endswith((".xlsx", ".xls", ".xlsm", "ods"))
-        ]
+        excel_files = self.list_excel_files(folder_path)
         print("excel_files", excel_files)
+        file_paths = [os.path.join(folder_path, file) for file in excel_files]
+        depth = self.parameters.get("prefetch_depth", 2)
+        pool = self.parameters.get("parse_pool")
+        if pool is not None:
+            # Workers open the files themselves
+            yield from self._read_in_pool(pool, excel_files)
+            return
+        if depth:
+            max_bytes = int(self.parameters.get("prefetch_max_mb", 256) * 1024 * 1024)
+            sources = Prefetcher(file_paths, depth=depth, max_bytes=max_bytes)
+        else:
+            sources = zip(file_paths, file_paths)
+        index = self.parameters.get("content_index")
         dfs = {}
-        for file in excel_files:
+        for file, (_, source) in zip(excel_files, sources):
+            if index is not None:
+                data = source.getvalue() if isinstance(source, io.BytesIO) else None
+                index.add(file, data)
+                if index.skip_duplicates and index.is_duplicate(file):
+                    logging.info(
+                        f"Skipping duplicate {file} (same content as {index.canonical(file)})"
+                    )
+                    continue
             print(f"Reading file: {file}")
-            file_path = os.path.join(folder_path, file)
-            df_keys, df_values = self.read_one_excel(file_path)
+            result = self.process_file(file, source)
+            if result is None:
+                continue  # failed and skipped; see the error report
             # dfs[file] = self.read_with_pattern(df_keys, df_values, pattern)
-            yield file, self.read_with_pattern(df_keys, df_values, pattern)
+            yield file, result
+
+    def _read_in_pool(self, pool, excel_files):
+        """read_excel_files with parsing in the worker pool, keeping the file order.
+
+        Workbooks are dispatched by descending cost_model cost, so a large workbook
+        does not start last and keep one worker busy while the others idle; results
+        are still yielded in file order. At most two workbooks per worker are in
+        flight, so finished results waiting in shared memory stay bounded. Once this
+        folder is dispatched, free slots start the lookahead workbooks. Duplicates
+        served from the content index are not sent to the pool.
+        """
+        index = self.parameters.get("content_index")
+        parse_params = {
+            "read_all_sheets": self.parameters["read_all_sheets"],
+            "sheet_names": self.parameters.get("sheet_names"),
+        }
+        files = []
+        for file in excel_files:
+            if index is not None:
+                index.add(file)
+                if index.skip_duplicates and index.is_duplicate(file):
+                    logging.info(
+                        f"Skipping duplicate {file} (same content as {index.canonical(file)})"
+                    )
+                    continue
+            files.append(file)
+        model = self.parameters.get("cost_model")
+        pending = iter(model.largest_first(files) if model is not None else files)
+        lookahead = iter(self.parameters.get("lookahead") or ())
+        tasks = {}
+        consumed = set()
+
+        def parsed_here(file):
+            return index is None or not index.is_duplicate(file)
+
+        def submit():
+            for file in pending:
+                if file not in consumed and parsed_here(file):
+                    tasks[file] = pool.submit(file, parse_params)
+                    return
+            for file in lookahead:
+                if parsed_here(file):
+                    pool.prefetch(file, parse_params)
+                    return
+
+        try:
+            for _ in range(2 * pool.workers):
+                submit()
+            for file in files:
+                print(f"Reading file: {file}")
+                task = tasks.pop(file, None)
+                consumed.add(file)
+                if task is None and model is not None and parsed_here(file):
+                    # Cheap workbooks queued behind expensive ones are needed now
+                    task = pool.submit(file, parse_params)
+                try:
+                    result = self.process_file(file, file, task)
+                finally:
+                    if task is not None:
+                        task.release()
+                        submit()
+                if result is not None:
+                    yield file, result
+        finally:
+            for task in tasks.values():
+                task.release()
         # dfs = pd.DataFrame(dfs) # Print sheet names if reading all sheets
         # return dfs  # Return the dictionary of DataFrames
@@ -0,0 +1,149 @@
+"""Shared directory scanner with glob rules and a per-run listing cache."""
+
+from __future__ import annotations
+
+import os
+import stat
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+PathLike = Union[str, os.PathLike]
+
+
+class Entry(NamedTuple):
+    """
+    One directory entry.
+
+    size and mtime come from entry() only; directory listings leave them None,
+    as os.scandir gives names and types without a stat per entry.
+    """
+
+    path: str
+    name: str
+    is_dir: bool
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+
+
+# Glob rules from config.yaml (scan.include / scan.exclude), set by configure()
+_rules = {"include": [], "exclude": []}
+# Temporary and lock files of writes in progress (utils.output_excel); never listed
+WRITE_PREFIX = ".~"
+# Absolute directory path -> (directory mtime_ns, root as given, entries);
+# revalidated by one stat of the directory, which catches added, removed and
+# renamed entries (files rewritten in place are seen by entry(), which stats
+# the file itself)
+_cache: dict[str, tuple[int, str, list[Entry]]] = {}
+_lock = threading.Lock()
+
+
+def configure(include: Optional[Iterable[str]] = None, exclude: Optional[Iterable[str]] = None) -> None:
+    """
+    Sets the run-wide glob rules.
+
+    Args:
+        include: File name patterns to keep (e.g. ["*.xlsx"]); empty keeps every file
+        exclude: File or folder name patterns to drop everywhere (e.g. ["~$*"])
+    """
+    _rules["include"] = list(include or [])
+    _rules["exclude"] = list(exclude or [])
+
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def invalidate(path: PathLike) -> None:
+    """Drops cached listings of ``path`` and its parents (call after writing into it)."""
+    p = Path(os.path.abspath(path))
+    with _lock:
+        for d in (p, *p.parents):
+            _cache.pop(str(d), None)
+
+
+def scan_dir(root: PathLike) -> list[Entry]:
+    """Lists one directory with os.scandir, reusing the cached listing while it is unchanged."""
+    root = str(Path(root))
+    key = os.path.abspath(root)
+    mtime_ns = os.stat(root).st_mtime_ns
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == mtime_ns:
+        cached_root, entries = cached[1], cached[2]
+        if cached_root != root:
+            entries = [e._replace(path=os.path.join(root, e.name)) for e in entries]
+        return entries
+
+    entries = []
+    with os.scandir(root) as it:
+        for d in it:
+            try:
+                is_dir = d.is_dir()
+            except OSError:
+                continue  # removed or unreadable while scanning
+            entries.append(Entry(d.path, d.name, is_dir))
+    with _lock:
+        _cache[key] = (mtime_ns, root, entries)
+    return entries
+
+
+def _excluded(name: str, exclude: Iterable[str]) -> bool:
+    return name.startswith(WRITE_PREFIX) or any(fnmatch(name, pat) for pat in (*_rules["exclude"], *exclude))
+
+
+def _included(name: str, include: Optional[Iterable[str]]) -> bool:
+    patterns = list(include) if include is not None else _rules["include"]
+    return not patterns or any(fnmatch(name, pat) for pat in patterns)
+
+
+def list_files(
+    root: PathLike, exclude: Iterable[str] = (), include: Optional[Iterable[str]] = None
+) -> list[Entry]:
+    """
+    Files directly under ``root``.
+
+    Args:
+        root: Directory to list
+        exclude: Extra name patterns to drop, on top of the configured ones
+        include: Name patterns to keep (default: the configured include rules)
+    """
+    return [
+        e
+        for e in scan_dir(root)
+        if not e.is_dir and not _excluded(e.name, exclude) and _included(e.name, include)
+    ]
+
+
+def list_dirs(root: PathLike, exclude: Iterable[str] = ()) -> list[Entry]:
+    """Subfolders directly under ``root``, without excluded names."""
+    return [e for e in scan_dir(root) if e.is_dir and not _excluded(e.name, exclude)]
+
+
+def walk(
+    root: PathLike, exclude: Iterable[str] = (), include: Optional[Iterable[str]] = None
+) -> Iterator[Entry]:
+    """Yields every file below ``root``, skipping excluded folders."""
+    exclude = tuple(exclude)
+    yield from list_files(root, exclude, include)
+    for d in list_dirs(root, exclude):
+        yield from walk(d.path, exclude, include)
+
+
+def entry(path: PathLike) -> Optional[Entry]:
+    """
+    Entry for a single path from a fresh stat, or None if missing.
+
+    Listings carry no stat data: a workbook overwritten in place leaves its
+    folder's mtime unchanged, so a cached size and mtime could be stale, and
+    fingerprints, content hashes and cost estimates are built from this entry.
+    """
+    path = str(Path(path))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    is_dir = stat.S_ISDIR(st.st_mode)
+    return Entry(path, os.path.basename(path), is_dir, st.st_size, st.st_mtime)
@@ -0,0 +1,134 @@
+"""Cost estimates that order parallel parsing largest first and size the worker pool."""
+
+from __future__ import annotations
+
+import ctypes
+import logging
+import os
+import threading
+from typing import Iterable, Optional
+
+from utils import scanner
+from utils.extent import sheet_count
+from utils.history import BASE_MB, RunHistory
+from utils.planner import DEFAULT_MB_PER_FOLDER_MB, DEFAULT_SECONDS_PER_MB
+
+# Fixed cost of every sheet (opening it, header detection), independent of its size
+DEFAULT_SECONDS_PER_SHEET = 0.05
+# Memory left to the parent process and the rest of the machine when sizing the pool
+RESERVED_MB = 1024.0
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class _MemoryStatusEx(ctypes.Structure):
+    """MEMORYSTATUSEX of the Windows API."""
+
+    _fields_ = [
+        ("dwLength", ctypes.c_ulong),
+        ("dwMemoryLoad", ctypes.c_ulong),
+        ("ullTotalPhys", ctypes.c_ulonglong),
+        ("ullAvailPhys", ctypes.c_ulonglong),
+        ("ullTotalPageFile", ctypes.c_ulonglong),
+        ("ullAvailPageFile", ctypes.c_ulonglong),
+        ("ullTotalVirtual", ctypes.c_ulonglong),
+        ("ullAvailVirtual", ctypes.c_ulonglong),
+        ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+    ]
+
+
+def _kernel32():
+    return ctypes.WinDLL("kernel32", use_last_error=True)
+
+
+def _windows_available_mb() -> Optional[float]:
+    status = _MemoryStatusEx()
+    status.dwLength = ctypes.sizeof(_MemoryStatusEx)
+    if not _kernel32().GlobalMemoryStatusEx(ctypes.byref(status)):
+        return None
+    return status.ullAvailPhys / (1024 * 1024)
+
+
+def available_memory_mb() -> Optional[float]:
+    """Memory available to new processes, in MB (None where it cannot be read)."""
+    if os.name == "nt":
+        return _windows_available_mb()
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class CostModel:
+    """
+    Estimated parse time of workbooks, for dispatching the most expensive first.
+
+    A workbook costs its size times the stage's seconds per MB (the median of
+    past runs in the RunHistory, or the planner's default) plus a fixed cost per
+    sheet, so a workbook with many small sheets is not mistaken for a cheap one.
+    """
+
+    def __init__(self, history: Optional[RunHistory] = None, stage: Optional[str] = None):
+        """
+        Args:
+            history: Past run timings (None uses the default rates)
+            stage: Stage whose rates apply, e.g. "chems:process_folder_tree"
+        """
+        rates = history.rates(stage) if history is not None and stage else None
+        self.seconds_per_mb = rates["seconds_per_mb"] if rates else DEFAULT_SECONDS_PER_MB
+        self.mb_per_mb = (rates or {}).get("mb_per_folder_mb", DEFAULT_MB_PER_FOLDER_MB)
+        self._costs: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def cost(self, path) -> float:
+        """Estimated single-worker seconds to parse ``path``."""
+        path = str(path)
+        with self._lock:
+            cached = self._costs.get(path)
+        if cached is not None:
+            return cached
+        e = scanner.entry(path)
+        mb = (e.size if e else 0) / (1024 * 1024)
+        cost = mb * self.seconds_per_mb + sheet_count(path) * DEFAULT_SECONDS_PER_SHEET
+        with self._lock:
+            self._costs[path] = cost
+        return cost
+
+    def folder_cost(self, paths: Iterable) -> float:
+        return sum(self.cost(p) for p in paths)
+
+    def largest_first(self, paths: Iterable) -> list:
+        """``paths`` by descending cost; equal costs keep their order."""
+        return sorted(paths, key=self.cost, reverse=True)
+
+    def workers(self, paths: Iterable, limit: Optional[int] = None) -> int:
+        """
+        Worker count for parsing ``paths``: one per CPU, as many as the available
+        memory allows if every worker held the largest workbook, and no more than
+        there are workbooks.
+        """
+        paths = list(paths)
+        sizes = [e.size for e in map(scanner.entry, paths) if e]
+        per_worker = BASE_MB + self.mb_per_mb * max(sizes, default=0) / (1024 * 1024)
+        cpus = cpu_count()
+        available = available_memory_mb()
+        by_memory = cpus if available is None else int((available - RESERVED_MB) // per_worker)
+        n = max(1, min(cpus, by_memory, len(paths) or 1, limit or cpus))
+        logging.info(
+            f"Using {n} parse worker(s): {cpus} CPU(s), "
+            f"{'unknown' if available is None else f'{available:.0f} MB'} available, "
+            f"about {per_worker:.0f} MB per worker"
+        )
+        return n
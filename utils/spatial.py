@@ -0,0 +1,306 @@
+"""Grid index of company sites and their inventories, for radius and nearest queries."""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.names import normalize_name
+from utils.parquet_export import industry_tables
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.2
+CELL_KM = 5.0
+SITE_COLUMNS = ["company", "park", "region", "lat", "lon"]
+INVENTORY_COLUMNS = [*SITE_COLUMNS, "kind", "name", "quantity", "available", "max_kg", "max_l"]
+CAPACITY_COLUMNS = ["quantity", "available", "max_kg", "max_l"]
+
+_NUMBERS = re.compile(r"\d+(?:\.\d+)?")
+# Park name fragments -> park, most specific first (竹南 before 新竹: 新竹科學園區竹南園區)
+PARK_NAMES = (
+    ("竹南", "竹南"),
+    ("龍潭", "龍潭"),
+    ("銅鑼", "銅鑼"),
+    ("宜蘭", "宜蘭"),
+    ("后里", "后里"),
+    ("虎尾", "虎尾"),
+    ("二林", "二林"),
+    ("路竹", "高雄"),
+    ("橋頭", "高雄"),
+    ("高雄", "高雄"),
+    ("楠梓", "楠梓"),
+    ("嘉義", "嘉義"),
+    ("樹谷", "樹谷"),
+    ("台中", "台中"),
+    ("中科", "台中"),
+    ("中部科學", "台中"),
+    ("台南", "台南"),
+    ("南科", "台南"),
+    ("南部科學", "台南"),
+    ("新竹", "新竹"),
+    ("竹科", "新竹"),
+)
+
+
+def parse_coordinate(value) -> Optional[float]:
+    """
+    Degrees of a coordinate cell: decimal (121.0236) or degrees, minutes and
+    seconds (121°01'25.0", 121度01分25秒). None when the cell holds no number.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = [float(p) for p in _NUMBERS.findall(str(value))[:3]]
+    if not parts:
+        return None
+    return sum(p / 60**i for i, p in enumerate(parts))
+
+
+def park_key(park: str) -> str:
+    """Park of a sheet name, so the surveys' 竹科 and 新竹科學園區 compare equal."""
+    name = normalize_name(str(park)).replace("臺", "台")
+    for fragment, key in PARK_NAMES:
+        if fragment in name:
+            return key
+    return name
+
+
+def _chemical_sites(sites: pd.DataFrame, chems: pd.DataFrame) -> pd.Series:
+    """
+    Park of the site each chemical row belongs to: the company's site in the
+    same park, else its only site in the region. When the region has several
+    sites and none in the chemical's park, the first is taken with a warning.
+    Rows of companies without a site in the region get None.
+    """
+    by_park, by_region = {}, defaultdict(list)
+    for company, park, region in sites[["company", "park", "region"]].itertuples(index=False):
+        by_park.setdefault((company, region, park_key(park)), park)
+        by_region[(company, region)].append(park)
+    target = {}
+    groups = chems[["company", "region", "park"]].drop_duplicates()
+    for company, region, park in groups.itertuples(index=False):
+        site = by_park.get((company, region, park_key(park)))
+        candidates = sorted(set(by_region.get((company, region), ())))
+        if site is None and candidates:
+            site = candidates[0]
+            if len(candidates) > 1:
+                logging.warning(
+                    f"⚠️  Chemicals of {company} at {park} match none of its sites "
+                    f"{candidates}; assigned to {site}"
+                )
+        target[(company, region, park)] = site
+    keys = zip(chems["company"], chems["region"], chems["park"])
+    return pd.Series([target[k] for k in keys], index=chems.index, dtype=object)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments in degrees, scalars or numpy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def site_inventory(equipment_dir, chems_dir=None) -> pd.DataFrame:
+    """
+    Long table of every located site (a park sheet of a company) with its
+    equipment and chemicals, from the per-company outputs of the equipment job
+    and, if given, the chems job.
+
+    Coordinates come from 經度 / 緯度 of 基本資料. Surveys that entered the two
+    the other way round (a latitude above 90) are swapped; sites without both
+    coordinates are left out. The two surveys name parks differently (竹科,
+    新竹科學園區), so chemicals are joined to the company's site in the same park
+    by park_key (see _chemical_sites for chemicals of a park without a site).
+    """
+    tables = industry_tables(equipment_dir, "equipment")
+    keys = ["company", "park", "region"]
+    basic = tables["industry_basic_info"]
+    coords = basic[basic["field"].isin(["經度", "緯度"])]
+    coords = coords.pivot_table(
+        index=keys, columns="field", values="value", aggfunc="first", dropna=False
+    ).reindex(columns=["經度", "緯度"])
+    sites = coords.reset_index()
+    lon = sites["經度"].astype(object).map(parse_coordinate).astype("float64")
+    lat = sites["緯度"].astype(object).map(parse_coordinate).astype("float64")
+    swapped = lat > 90
+    sites["lat"] = lat.where(~swapped, lon)
+    sites["lon"] = lon.where(~swapped, lat)
+    located = sites["lat"].between(-90, 90) & sites["lon"].between(-180, 180)
+    if (~located).any():
+        logging.warning(f"⚠️  {int((~located).sum())} site(s) without coordinates left out")
+    sites = sites.loc[located, SITE_COLUMNS]
+
+    sites = sites.astype({k: object for k in keys})
+    equipment = tables["industry_equipment"].astype({k: object for k in keys})
+    equipment = equipment[equipment["name"].notna()]
+    equipment = equipment[[*keys, "name", "quantity", "available"]]
+    parts = [sites.merge(equipment, on=keys).assign(kind="equipment")]
+    if chems_dir is not None:
+        chems = industry_tables(chems_dir, "chems")["industry_chemicals"]
+        chems = chems[chems["name"].notna()].astype({k: object for k in keys})
+        chems = chems.assign(park=_chemical_sites(sites, chems))
+        chems = chems.loc[chems["park"].notna(), [*keys, "name", "max_kg", "max_l"]]
+        parts.append(sites.merge(chems, on=keys).assign(kind="chemical"))
+    out = pd.concat(parts, ignore_index=True)
+    return out.reindex(columns=INVENTORY_COLUMNS).reset_index(drop=True)
+
+
+def write_site_inventory(equipment_dir, chems_dir, path) -> Path:
+    """Writes site_inventory() as UTF-8 CSV via a temporary file."""
+    table = site_inventory(equipment_dir, chems_dir)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".~{path.name}.{os.getpid()}.tmp")
+    table.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, path)
+    logging.info(f"Wrote {table[SITE_COLUMNS].drop_duplicates().shape[0]} site(s) to {path}")
+    return path
+
+
+class Nearby(NamedTuple):
+    sites: pd.DataFrame  # SITE_COLUMNS, distance_km and matched CAPACITY_COLUMNS, nearest first
+    totals: dict  # CAPACITY_COLUMNS summed over the sites
+
+
+class SiteIndex:
+    """
+    Sites bucketed into a grid of ``cell_km`` cells, with their inventories.
+
+    A radius query only measures the sites of the cells overlapping the
+    circle's bounding box; a k-nearest query widens the radius until k matching
+    sites are inside it. Per-item capacities are summed per site once and kept
+    for later queries of the same item.
+    """
+
+    def __init__(self, inventory: pd.DataFrame, cell_km: float = CELL_KM):
+        """
+        Args:
+            inventory: Table of site_inventory() (or a site_inventory.csv)
+            cell_km: Grid cell size
+        """
+        self.inventory = inventory
+        sites = inventory[SITE_COLUMNS].drop_duplicates(["company", "park"])
+        self.sites = sites.reset_index(drop=True)
+        site_of = {k: i for i, k in enumerate(zip(self.sites["company"], self.sites["park"]))}
+        self.site_ids = np.fromiter(
+            (site_of[k] for k in zip(inventory["company"], inventory["park"])),
+            dtype=np.int64,
+            count=len(inventory),
+        )
+        self.lat = self.sites["lat"].to_numpy(dtype="float64")
+        self.lon = self.sites["lon"].to_numpy(dtype="float64")
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self.cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for i, (lat, lon) in enumerate(zip(self.lat, self.lon)):
+            self.cells[self._cell(lat, lon)].append(i)
+        self._keys = inventory["name"].astype(str).map(lambda n: normalize_name(n).casefold())
+        self._capacities: dict[tuple, pd.DataFrame] = {}
+
+    @classmethod
+    def load(cls, path, cell_km: float = CELL_KM) -> "SiteIndex":
+        inventory = pd.read_csv(
+            path,
+            dtype={c: "object" for c in ("company", "park", "region", "kind", "name")},
+            encoding="utf-8-sig",
+        )
+        return cls(inventory, cell_km)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def capacity(self, kind: Optional[str] = None, item: Optional[str] = None) -> pd.DataFrame:
+        """
+        CAPACITY_COLUMNS summed per site over the items of ``kind`` ("equipment"
+        or "chemical") whose name contains ``item``; sites without such items
+        with quantity or storage above zero are left out.
+        """
+        key = (kind, item)
+        if key not in self._capacities:
+            mask = pd.Series(True, index=self.inventory.index)
+            if kind is not None:
+                mask &= self.inventory["kind"] == kind
+            if item is not None:
+                needle = normalize_name(item).casefold()
+                mask &= self._keys.str.contains(needle, regex=False)
+            rows = self.inventory.loc[mask, CAPACITY_COLUMNS]
+            rows = rows.assign(site=self.site_ids[mask.to_numpy()])
+            sums = rows.groupby("site")[CAPACITY_COLUMNS].sum(min_count=1)
+            held = sums[["quantity", "max_kg", "max_l"]].fillna(0).gt(0).any(axis=1)
+            self._capacities[key] = sums[held] if item is not None else sums
+        return self._capacities[key]
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        top = min(abs(lat) + dlat, 89.9)
+        dlon = radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(top)))
+        (r0, c0), (r1, c1) = self._cell(lat - dlat, lon - dlon), self._cell(lat + dlat, lon + dlon)
+        if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self.cells):
+            # A box wider than the occupied cells: filter those instead of walking the box
+            cells = [(r, c) for r, c in self.cells if r0 <= r <= r1 and c0 <= c <= c1]
+        else:
+            cells = [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+        found = [i for cell in cells for i in self.cells.get(cell, ())]
+        return np.asarray(found, dtype=np.int64)
+
+    def _result(self, ids: np.ndarray, distances: np.ndarray, capacity: pd.DataFrame) -> Nearby:
+        order = np.argsort(distances, kind="stable")
+        ids, distances = ids[order], distances[order]
+        sites = self.sites.iloc[ids].reset_index(drop=True).assign(distance_km=distances)
+        values = capacity.reindex(ids).reset_index(drop=True)
+        sites = pd.concat([sites, values], axis=1)
+        return Nearby(sites, {c: float(sites[c].sum()) for c in CAPACITY_COLUMNS})
+
+    def within(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        kind: Optional[str] = None,
+        item: Optional[str] = None,
+    ) -> Nearby:
+        """
+        Sites within ``radius_km`` of (lat, lon) holding ``item`` (any site without one).
+
+        Args:
+            kind: "equipment" or "chemical" (None: both)
+            item: Part of the equipment or chemical name, e.g. "空氣呼吸器"
+        """
+        capacity = self.capacity(kind, item)
+        ids = self._candidates(lat, lon, radius_km)
+        if item is not None:
+            ids = ids[np.isin(ids, capacity.index.to_numpy())]
+        distances = haversine_km(lat, lon, self.lat[ids], self.lon[ids])
+        inside = distances <= radius_km
+        return self._result(ids[inside], distances[inside], capacity)
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 5,
+        kind: Optional[str] = None,
+        item: Optional[str] = None,
+    ) -> Nearby:
+        """The ``k`` sites nearest to (lat, lon) holding ``item``, as within() returns them."""
+        capacity = self.capacity(kind, item)
+        total = len(capacity) if item is not None else len(self.sites)
+        radius = self.cell_deg * KM_PER_DEGREE_LAT
+        while True:
+            found = self.within(lat, lon, radius, kind, item)
+            # Every site within the radius is found, so k of them are the k nearest
+            if len(found.sites) >= min(k, total) or radius > math.pi * EARTH_RADIUS_KM:
+                sites = found.sites.head(k)
+                return Nearby(sites, {c: float(sites[c].sum()) for c in CAPACITY_COLUMNS})
+            radius *= 2
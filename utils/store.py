@@ -0,0 +1,400 @@
+"""Local SQLite store of ingested survey data for ad-hoc and report queries."""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from utils.checkpoint import fingerprint
+from utils.data_cleaners import extract_first_number
+from utils.patterns import locate_region
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    folder TEXT,
+    ingested TEXT NOT NULL,
+    UNIQUE (path, pattern)
+);
+CREATE TABLE IF NOT EXISTS regions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,  -- "park" (北部園區/中部園區/南部園區/其他) or "city"
+    name TEXT NOT NULL,
+    UNIQUE (kind, name)
+);
+CREATE TABLE IF NOT EXISTS companies (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL UNIQUE,
+    name TEXT,
+    park TEXT,
+    region_id INTEGER REFERENCES regions(id)
+);
+CREATE TABLE IF NOT EXISTS divisions (
+    id INTEGER PRIMARY KEY,
+    region_id INTEGER NOT NULL REFERENCES regions(id),
+    name TEXT NOT NULL,
+    UNIQUE (region_id, name)
+);
+CREATE TABLE IF NOT EXISTS chemicals (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    company_id INTEGER NOT NULL REFERENCES companies(id),
+    category TEXT,
+    name TEXT,
+    concentration TEXT,
+    state TEXT,
+    container TEXT,
+    max_kg REAL,
+    max_l REAL,
+    location TEXT
+);
+CREATE TABLE IF NOT EXISTS certificates (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    company_id INTEGER REFERENCES companies(id),
+    division_id INTEGER REFERENCES divisions(id),
+    kind TEXT NOT NULL,  -- 證照 / 演練 (companies), 國內證書 / 國外證書 (divisions)
+    name TEXT,
+    role TEXT,
+    count REAL
+);
+CREATE TABLE IF NOT EXISTS equipment (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    company_id INTEGER REFERENCES companies(id),
+    division_id INTEGER REFERENCES divisions(id),
+    category TEXT NOT NULL,
+    name TEXT,
+    spec TEXT,
+    quantity REAL,
+    available REAL
+);
+CREATE TABLE IF NOT EXISTS staffing (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    division_id INTEGER NOT NULL REFERENCES divisions(id),
+    role TEXT,
+    count REAL
+);
+CREATE INDEX IF NOT EXISTS idx_files_folder ON files(folder);
+CREATE INDEX IF NOT EXISTS idx_companies_region ON companies(region_id);
+CREATE INDEX IF NOT EXISTS idx_divisions_region ON divisions(region_id);
+CREATE INDEX IF NOT EXISTS idx_chemicals_file ON chemicals(file_id);
+CREATE INDEX IF NOT EXISTS idx_chemicals_company ON chemicals(company_id);
+CREATE INDEX IF NOT EXISTS idx_chemicals_name ON chemicals(name);
+CREATE INDEX IF NOT EXISTS idx_chemicals_container ON chemicals(container);
+CREATE INDEX IF NOT EXISTS idx_chemicals_state ON chemicals(state);
+CREATE INDEX IF NOT EXISTS idx_certificates_file ON certificates(file_id);
+CREATE INDEX IF NOT EXISTS idx_certificates_kind ON certificates(kind, name);
+CREATE INDEX IF NOT EXISTS idx_certificates_company ON certificates(company_id);
+CREATE INDEX IF NOT EXISTS idx_certificates_division ON certificates(division_id);
+CREATE INDEX IF NOT EXISTS idx_equipment_file ON equipment(file_id);
+CREATE INDEX IF NOT EXISTS idx_equipment_name ON equipment(category, name);
+CREATE INDEX IF NOT EXISTS idx_equipment_company ON equipment(company_id);
+CREATE INDEX IF NOT EXISTS idx_equipment_division ON equipment(division_id);
+CREATE INDEX IF NOT EXISTS idx_staffing_file ON staffing(file_id);
+CREATE INDEX IF NOT EXISTS idx_staffing_division ON staffing(division_id);
+"""
+
+STORE_PATTERNS = (
+    "top_ten_operating_chemicals",
+    "industry_rescue_equipment",
+    "firefighter_rescue_survey",
+    "苗栗縣",
+)
+
+STORAGE_COLS = ("廠內最大儲存量(公斤)", "廠內最大儲存量(公升)")
+# report -> (table, group column, summed columns, filter, output column labels)
+GROUPED_REPORTS = {
+    "sort_by_hazmat": ("chemicals", "name", ("max_kg", "max_l"), None, ("化學物質名稱",) + STORAGE_COLS),
+    "sort_by_container": ("chemicals", "container", ("max_kg", "max_l"), None, ("容器材質",) + STORAGE_COLS),
+    "sort_by_state": ("chemicals", "state", ("max_kg", "max_l"), None, ("物質儲存型態",) + STORAGE_COLS),
+    "sort_by_certificate": ("certificates", "name", ("count",), "t.kind = '證照'", ("證照", "證照數量")),
+    "sort_by_training": ("certificates", "name", ("count",), "t.kind = '演練'", ("演練", "演練數量")),
+    "sort_by_equipment": (
+        "equipment",
+        "name",
+        ("quantity", "available"),
+        "t.category = '應變設備'",
+        ("應變設備", "應變設備數量", "應變設備可支援數量"),
+    ),
+}
+PARK_REGIONS = ("北部園區", "中部園區", "南部園區")
+
+
+def _text(s: pd.Series) -> list:
+    return [None if pd.isna(x) else str(x) for x in s]
+
+
+def _number(s: pd.Series) -> list:
+    return [None if pd.isna(x) else float(x) for x in extract_first_number(s)]
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    return df[name] if name in df else pd.Series([None] * len(df), index=df.index)
+
+
+class SurveyStore:
+    """
+    SQLite database of the per-file results of the input patterns.
+
+    Tables: files, regions, companies, divisions, chemicals, certificates,
+    equipment and staffing, indexed for the usual group-by questions. Loading is
+    incremental: a workbook whose fingerprint (path, size, mtime) is unchanged
+    since it was ingested with the same pattern is skipped, a changed one
+    replaces its previous rows.
+
+    Usage:
+        store = SurveyStore("Output/survey.sqlite")
+        store.report("sort_by_hazmat")["北部園區"]
+        store.query("SELECT name, SUM(max_kg) FROM chemicals GROUP BY name")
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._current: dict[tuple[str, str], str] = {
+            (path, pattern): fp
+            for path, pattern, fp in self._conn.execute(
+                "SELECT path, pattern, fingerprint FROM files"
+            )
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # -------------------- 載入 --------------------
+    def is_current(self, path, pattern: str) -> bool:
+        """True when ``path`` was ingested with ``pattern`` and has not changed since."""
+        if pattern not in STORE_PATTERNS:
+            return True
+        return self._current.get((str(path), pattern)) == fingerprint([path])
+
+    def has_all(self, paths, pattern: str) -> bool:
+        return all(self.is_current(p, pattern) for p in paths)
+
+    def ingest(self, path, pattern: str, folder, keys, values) -> bool:
+        """
+        Loads one workbook's read_with_pattern result; returns False when skipped.
+
+        Args:
+            path: Workbook path
+            pattern: Pattern the result was read with (see STORE_PATTERNS)
+            folder: Company folder, or division folder (city/division) for firefighters
+            keys: Keys returned by the pattern
+            values: Values returned by the pattern
+        """
+        path = str(path)
+        if pattern not in STORE_PATTERNS:
+            return False
+        fp = fingerprint([path])
+        if self._current.get((path, pattern)) == fp:
+            return False
+        folder = Path(folder)
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            cur.execute("DELETE FROM files WHERE path = ? AND pattern = ?", (path, pattern))
+            cur.execute(
+                "INSERT INTO files (path, fingerprint, pattern, folder, ingested) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, fp, pattern, str(folder), datetime.now().isoformat(timespec="seconds")),
+            )
+            file_id = cur.lastrowid
+            if pattern == "top_ten_operating_chemicals":
+                self._ingest_chems(cur, file_id, folder, keys, values)
+            elif pattern == "industry_rescue_equipment":
+                self._ingest_equipment(cur, file_id, folder, keys, values)
+            else:
+                self._ingest_division(cur, file_id, folder, keys, values)
+        self._current[(path, pattern)] = fp
+        return True
+
+    def prune(self) -> int:
+        """Removes the rows of workbooks that no longer exist; returns their number."""
+        gone = [key for key in list(self._current) if not Path(key[0]).exists()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM files WHERE path = ? AND pattern = ?", gone
+            )
+        for key in gone:
+            self._current.pop(key, None)
+        if gone:
+            logging.info(f"Removed {len(gone)} deleted workbook(s) from {self.path}")
+        return len(gone)
+
+    def _region(self, cur, kind: str, name: str) -> int:
+        cur.execute("INSERT OR IGNORE INTO regions (kind, name) VALUES (?, ?)", (kind, name))
+        cur.execute("SELECT id FROM regions WHERE kind = ? AND name = ?", (kind, name))
+        return cur.fetchone()[0]
+
+    def _company(self, cur, folder: Path, park: Optional[str], name: Optional[str] = None) -> int:
+        region_id = self._region(cur, "park", locate_region(park)) if park else None
+        cur.execute(
+            "INSERT INTO companies (folder, name, park, region_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(folder) DO UPDATE SET "
+            "name = COALESCE(excluded.name, name), "
+            "park = COALESCE(excluded.park, park), "
+            "region_id = COALESCE(excluded.region_id, region_id)",
+            (str(folder), name, park, region_id),
+        )
+        cur.execute("SELECT id FROM companies WHERE folder = ?", (str(folder),))
+        return cur.fetchone()[0]
+
+    def _ingest_chems(self, cur, file_id, folder, keys, values) -> None:
+        if not keys or not isinstance(values, pd.DataFrame):
+            return
+        company_id = self._company(cur, folder, str(keys[0]))
+        df = values
+        rows = zip(
+            _text(_column(df, "危險品分類")),
+            _text(_column(df, "化學物質名稱")),
+            _text(_column(df, "濃度 (w/w %)")),
+            _text(_column(df, "物質儲存型態")),
+            _text(_column(df, "容器材質")),
+            _number(_column(df, STORAGE_COLS[0])),
+            _number(_column(df, STORAGE_COLS[1])),
+            _text(_column(df, "存放位置")),
+        )
+        cur.executemany(
+            "INSERT INTO chemicals (file_id, company_id, category, name, concentration, "
+            "state, container, max_kg, max_l, location) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(file_id, company_id, *r) for r in rows],
+        )
+
+    def _ingest_equipment(self, cur, file_id, folder, keys, values) -> None:
+        if not keys or not isinstance(values, pd.DataFrame):
+            return
+        df = values
+        info = dict(zip(_text(_column(df, "基本資料")), _text(_column(df, "基本資料內容"))))
+        company_id = self._company(cur, folder, str(keys[0]), info.get("廠場名稱"))
+        for kind in ("證照", "演練"):
+            rows = [
+                (file_id, company_id, kind, name, count)
+                for name, count in zip(
+                    _text(_column(df, kind)), _number(_column(df, f"{kind}數量"))
+                )
+                if name is not None
+            ]
+            cur.executemany(
+                "INSERT INTO certificates (file_id, company_id, kind, name, count) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        rows = [
+            (file_id, company_id, name, qty, avail)
+            for name, qty, avail in zip(
+                _text(_column(df, "應變設備")),
+                _number(_column(df, "應變設備數量")),
+                _number(_column(df, "應變設備可支援數量")),
+            )
+            if name is not None
+        ]
+        cur.executemany(
+            "INSERT INTO equipment (file_id, company_id, category, name, quantity, available) "
+            "VALUES (?, ?, '應變設備', ?, ?, ?)",
+            rows,
+        )
+
+    def _ingest_division(self, cur, file_id, folder, keys, values) -> None:
+        region_id = self._region(cur, "city", folder.parent.name)
+        cur.execute(
+            "INSERT OR IGNORE INTO divisions (region_id, name) VALUES (?, ?)",
+            (region_id, folder.name),
+        )
+        cur.execute(
+            "SELECT id FROM divisions WHERE region_id = ? AND name = ?",
+            (region_id, folder.name),
+        )
+        division_id = cur.fetchone()[0]
+        for key, df in zip(keys, values):
+            if not isinstance(df, pd.DataFrame) or df.empty:
+                continue
+            if "基本資料" in key:
+                rows = [
+                    (file_id, division_id, role, count)
+                    for role, count in zip(
+                        _text(_column(df, "人員編制")), _number(_column(df, "編制數量"))
+                    )
+                    if role is not None
+                ]
+                cur.executemany(
+                    "INSERT INTO staffing (file_id, division_id, role, count) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            elif "證書" in key:
+                names = _text(df.iloc[:, 0])
+                rows = []
+                for role in df.columns[2:]:
+                    for name, count in zip(names, _number(df[role])):
+                        if name is not None and count is not None:
+                            rows.append((file_id, division_id, key, name.strip(), str(role), count))
+                cur.executemany(
+                    "INSERT INTO certificates (file_id, division_id, kind, name, role, count) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            elif "設備" in key and df.shape[1] >= 3:
+                qty_col = next((c for c in df.columns if "數量" in str(c)), df.columns[-1])
+                spec = _text(df.iloc[:, 2]) if df.shape[1] > 3 else [None] * len(df)
+                rows = [
+                    (file_id, division_id, key, name, s, qty)
+                    for name, s, qty in zip(_text(df.iloc[:, 1]), spec, _number(df[qty_col]))
+                    if name is not None
+                ]
+                cur.executemany(
+                    "INSERT INTO equipment (file_id, division_id, category, name, spec, quantity) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    # -------------------- 查詢 --------------------
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        """Runs a read-only SQL query and returns the result as a DataFrame."""
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def report(self, name: str) -> dict[str, pd.DataFrame]:
+        """
+        One of the analyze_grouped reports (see GROUPED_REPORTS) as an indexed query.
+
+        The values are grouped as loaded, not through clean_chems/clean_equipment:
+        where analyze_grouped has a "nan" row, unnamed chemicals form a None group
+        and unnamed certificates/equipment are left out. Totals are floats and the
+        order of equal totals is SQLite's.
+
+        Returns:
+            dict: region -> DataFrame with the report's column names, summed columns
+                  descending (last one first)
+        """
+        table, group, sums, where, labels = GROUPED_REPORTS[name]
+        select = ", ".join(f"TOTAL(t.{c}) AS {c}" for c in sums)
+        order = ", ".join(f"{c} DESC" for c in sums[::-1])
+        sql = (
+            f"SELECT r.name AS region, t.{group} AS grp, {select} FROM {table} t "
+            "JOIN companies c ON c.id = t.company_id "
+            "JOIN regions r ON r.id = c.region_id "
+            f"WHERE r.name != '其他'{f' AND {where}' if where else ''} "
+            f"GROUP BY r.name, t.{group} ORDER BY r.name, {order}"
+        )
+        df = self.query(sql)
+        df.columns = ["region", *labels]
+        return {
+            region: df[df["region"] == region].drop(columns="region").reset_index(drop=True)
+            for region in PARK_REGIONS
+            if (df["region"] == region).any()
+        }
@@ -0,0 +1,124 @@
+"""Template fingerprints and cached extraction plans for survey workbooks."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+# Patterns that read the same firefighter survey in different template versions
+FIREFIGHTER_PATTERNS = ("firefighter_rescue_survey", "苗栗縣")
+# Patterns that locate their data by searching for marker cells
+PLANNED_PATTERNS = FIREFIGHTER_PATTERNS + ("industry_rescue_equipment",)
+
+
+def template_fingerprint(keys: list, values: list) -> str:
+    """
+    Hash of the sheet names and the header cells of every sheet.
+
+    Workbooks filled in from the same template version share a fingerprint,
+    whatever data was entered below the headers.
+    """
+    h = hashlib.sha1()
+    for k, v in zip(keys, values):
+        h.update(f"{k}\x1f".encode())
+        if isinstance(v, pd.DataFrame):
+            h.update("\x1f".join(str(c) for c in v.columns).encode())
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+def find_row(df: pd.DataFrame, col: int, text: str) -> int:
+    """Index label of the first row whose cell in column ``col`` contains ``text``."""
+    return int(df.index[df.iloc[:, col].astype(str).str.contains(text)][0])
+
+
+class TemplatePlans:
+    """
+    Extraction plans per template fingerprint.
+
+    A plan holds the row offsets a pattern found by searching for marker cells
+    (e.g. "救災能量" in 基本資料, "消防法演練" in 證照及演練). Later workbooks with
+    the same fingerprint reuse the offsets: a cached offset is used if the marker
+    is still in that cell, otherwise the normal search runs and the plan is
+    updated. Unknown templates therefore always fall back to detection. Which
+    pattern reads a workbook is not part of the plan; the 苗栗縣 layout is still
+    chosen by its folder.
+
+    Plans can be saved to JSON so known template versions are ready on the next run.
+    """
+
+    def __init__(self, path: Optional[os.PathLike] = None):
+        """
+        Args:
+            path: JSON file to load plans from and save them to (None keeps them in memory)
+        """
+        self.path = Path(path) if path else None
+        self._plans: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None and self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._plans = json.load(f)
+                logging.info(f"Loaded {len(self._plans)} template plan(s) from {self.path}")
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"⚠️  Ignoring unreadable template plans {self.path}: {e}")
+
+    def __len__(self):
+        return len(self._plans)
+
+    def plan(self, keys: list, values: list) -> dict:
+        """Returns the (possibly new, empty) plan for the template of this workbook."""
+        fp = template_fingerprint(keys, values)
+        with self._lock:
+            return self._plans.setdefault(fp, {"offsets": {}})
+
+    def row(self, plan: Optional[dict], name: str, df: pd.DataFrame, col: int, text: str) -> int:
+        """
+        Row offset of marker ``name`` (first row of column ``col`` containing ``text``).
+
+        Args:
+            plan: Plan from plan(); None always searches
+            name: Key of the offset in the plan
+            df: Sheet to search
+            col: Column position holding the marker
+            text: Marker text
+        """
+        if plan is None:
+            return find_row(df, col, text)
+        cached = plan["offsets"].get(name)
+        if cached is not None and cached in df.index:
+            # Only the cached cell is checked; scanning the rows above it would cost
+            # as much as the search the plan saves
+            if text in str(df.iloc[df.index.get_loc(cached), col]):
+                self.hits += 1
+                return cached
+        self.misses += 1
+        found = find_row(df, col, text)
+        with self._lock:
+            plan["offsets"][name] = found
+        return found
+
+    def save(self) -> Optional[Path]:
+        """Writes the plans to ``path``; returns it, or None for in-memory plans."""
+        if self.path is None:
+            return None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._plans, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        logging.info(
+            f"Saved {len(self._plans)} template plan(s) to {self.path} "
+            f"(offset cache hits: {self.hits}, misses: {self.misses})"
+        )
+        return self.path
@@ -0,0 +1,116 @@
+"""Polling watcher that batches workbook changes under the data roots."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from utils import scanner
+
+EXCEL_SUFFIXES = (".xlsx", ".xls", ".xlsm", ".ods")
+
+
+class Watcher:
+    """
+    Polls directory trees for new, changed and removed Excel files.
+
+    Uses plain os.scandir polling (no platform file-notification service), so it
+    also works on network shares. Changes that arrive close together are handled
+    as one batch: after the first change is seen, the watcher waits until the
+    tree has been quiet for ``settle`` seconds before calling ``on_batch``.
+
+    Usage:
+        Watcher(["../Data/科技廠救災能量"], on_batch=rerun).run()
+    """
+
+    def __init__(
+        self,
+        roots: Iterable,
+        on_batch: Callable[[list[str]], None],
+        interval: float = 5.0,
+        settle: float = 10.0,
+        exclude: Iterable[str] = (),
+    ):
+        """
+        Args:
+            roots: Data directories to watch (recursively)
+            on_batch: Called with the sorted list of changed paths of each batch
+            interval: Seconds between polls
+            settle: Quiet period that closes a batch
+            exclude: Folder/file name patterns to ignore (e.g. output folders)
+        """
+        self.roots = [str(r) for r in roots]
+        self.on_batch = on_batch
+        self.interval = interval
+        self.settle = settle
+        self.exclude = tuple(exclude)
+        self.stop_event = threading.Event()
+
+    def snapshot(self) -> dict[str, tuple[int, float]]:
+        """Path -> (size, mtime) of every watched Excel file, freshly scanned."""
+        scanner.clear_cache()
+        snap = {}
+        for root in self.roots:
+            for e in scanner.walk(root, self.exclude):
+                if e.name.lower().endswith(EXCEL_SUFFIXES):
+                    st = scanner.entry(e.path)
+                    if st is not None:
+                        snap[e.path] = (st.size, st.mtime)
+        return snap
+
+    @staticmethod
+    def diff(old: dict, new: dict) -> set[str]:
+        return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+    def poll_batch(self, previous: dict) -> tuple[set[str], dict]:
+        """Blocks until a settled batch of changes is seen; returns (changes, snapshot)."""
+        changed: set[str] = set()
+        last_change = None
+        while not self.stop_event.is_set():
+            current = self.snapshot()
+            delta = self.diff(previous, current)
+            if delta:
+                changed |= delta
+                last_change = time.monotonic()
+                previous = current
+            elif changed and time.monotonic() - last_change >= self.settle:
+                return changed, current
+            self.stop_event.wait(self.interval)
+        return changed, previous
+
+    def run(self, max_batches: Optional[int] = None) -> None:
+        """
+        Watches until stop() is called (or ``max_batches`` batches were handled).
+
+        The snapshot a batch was detected in stays the baseline, so files that
+        arrive while on_batch runs form the next batch. The paths of a batch
+        whose on_batch raised are handled again with the next batch.
+        """
+        snap = self.snapshot()
+        logging.info(f"Watching {len(snap)} workbook(s) under {', '.join(self.roots)}")
+        handled = 0
+        failed: set[str] = set()
+        while not self.stop_event.is_set():
+            changed, snap = self.poll_batch(snap)
+            if not changed:
+                break
+            batch = sorted(changed | failed)
+            logging.info(f"Detected {len(changed)} changed workbook(s); updating outputs")
+            for p in batch:
+                logging.info(f"   - {p}")
+            try:
+                self.on_batch(batch)
+                failed = set()
+            except Exception as e:
+                logging.error(
+                    f"Update failed: {type(e).__name__}: {e}; retrying with the next batch"
+                )
+                failed = set(batch)
+            handled += 1
+            if max_batches is not None and handled >= max_batches:
+                break
+
+    def stop(self) -> None:
+        self.stop_event.set()
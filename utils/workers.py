@@ -0,0 +1,329 @@
+"""Parsing workbooks in worker processes, with results returned through shared memory."""
+
+from __future__ import annotations
+
+import contextlib
+import itertools
+import logging
+import os
+import pickle
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+SEGMENT_PREFIX = "rxl"
+_task_ids = itertools.count()  # unique segment names across the pools of this process
+
+
+class SharedResult(NamedTuple):
+    """What a worker sends back through the pipe: only metadata, no array data."""
+
+    name: Optional[str]  # shared memory segment (None when nothing was out of band)
+    header: bytes  # pickle protocol 5 stream without the array buffers
+    sizes: tuple  # byte length of each out-of-band buffer, in segment order
+
+
+# Kinds of cell values in a packed text column
+_NONE, _STR, _FLOAT, _INT, _OTHER = range(5)
+
+
+class _PackedFrame(NamedTuple):
+    """A DataFrame whose object and python-string columns are packed into arrays."""
+
+    rest: pd.DataFrame  # the other columns, whose blocks pickle out of band as they are
+    columns: pd.Index  # all column labels, in order
+    positions: tuple  # column position of each packed column
+    dtypes: tuple  # dtype of each packed column
+    packed: tuple  # _pack_values of each packed column
+
+
+def _packable(dtype) -> bool:
+    """Columns whose values are Python objects, which pickle inline and one by one."""
+    if isinstance(dtype, pd.StringDtype):
+        return dtype.storage == "python"
+    return dtype == object
+
+
+def _pack_values(values: np.ndarray) -> tuple:
+    """
+    Packs an object array of cell values into numpy arrays: a kind tag per cell,
+    for the strings a code into a table of the distinct ones (their UTF-8 text
+    and lengths), and the floats and ints. Other values (dates, bools, big ints,
+    ...) are kept as a list.
+    """
+    types = np.fromiter(map(type, values), dtype=object, count=len(values))
+    tags = np.full(len(values), _OTHER, dtype=np.uint8)
+    tags[types == type(None)] = _NONE
+    tags[types == float] = _FLOAT
+    tags[types == str] = _STR
+    ints = values[types == int]
+    try:
+        ints = ints.astype(np.int64)
+        tags[types == int] = _INT
+    except OverflowError:
+        ints = np.array([], dtype=np.int64)
+    codes, uniques = pd.factorize(values[tags == _STR])
+    texts = uniques.tolist()
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    chars = np.frombuffer("".join(texts).encode("utf-8", "surrogatepass"), dtype=np.uint8)
+    floats = values[tags == _FLOAT].astype(np.float64)
+    others = values[tags == _OTHER].tolist()
+    return tags, codes.astype(np.int32), lengths, chars, floats, ints, others
+
+
+def _unpack_values(tags, codes, lengths, chars, floats, ints, others) -> np.ndarray:
+    """Reverses _pack_values: the cell values as an object array."""
+    out = np.empty(len(tags), dtype=object)
+    text = chars.tobytes().decode("utf-8", "surrogatepass")
+    ends = np.cumsum(lengths).tolist()
+    texts = np.empty(len(ends), dtype=object)
+    texts[:] = [text[a:b] for a, b in zip([0] + ends[:-1], ends)]
+    out[tags == _STR] = texts[codes]
+    out[tags == _FLOAT] = floats.astype(object)
+    out[tags == _INT] = ints.astype(object)
+    for i, v in zip(np.flatnonzero(tags == _OTHER).tolist(), others):
+        out[i] = v
+    return out
+
+
+def _pack(obj):
+    """``obj`` with every DataFrame (also inside tuples, lists and dicts) packed."""
+    if isinstance(obj, pd.DataFrame):
+        positions = tuple(i for i, dtype in enumerate(obj.dtypes) if _packable(dtype))
+        if not positions:
+            return obj
+        kept = [i for i in range(obj.shape[1]) if i not in set(positions)]
+        return _PackedFrame(
+            obj.iloc[:, kept],
+            obj.columns,
+            positions,
+            tuple(obj.dtypes.iloc[list(positions)]),
+            tuple(_pack_values(obj.iloc[:, i].to_numpy(dtype=object)) for i in positions),
+        )
+    if type(obj) in (list, tuple):
+        return type(obj)(_pack(x) for x in obj)
+    if type(obj) is dict:
+        return {k: _pack(v) for k, v in obj.items()}
+    return obj
+
+
+def _unpack(obj):
+    """Reverses _pack."""
+    if isinstance(obj, _PackedFrame):
+        kept = [i for i in range(len(obj.columns)) if i not in set(obj.positions)]
+        columns = {i: obj.rest.iloc[:, n] for n, i in enumerate(kept)}
+        for i, dtype, packed in zip(obj.positions, obj.dtypes, obj.packed):
+            columns[i] = pd.Series(_unpack_values(*packed), index=obj.rest.index, dtype=dtype)
+        df = pd.DataFrame({i: columns[i] for i in range(len(obj.columns))}, copy=False)
+        df.columns = obj.columns
+        return df
+    if type(obj) in (list, tuple):
+        return type(obj)(_unpack(x) for x in obj)
+    if type(obj) is dict:
+        return {k: _unpack(v) for k, v in obj.items()}
+    return obj
+
+
+def export(obj, name: str) -> SharedResult:
+    """
+    Pickles ``obj`` with protocol 5 and moves every out-of-band buffer (the data
+    of DataFrame blocks and numpy arrays) into the shared memory segment ``name``.
+    Object and python-string columns are packed into arrays first (see
+    _pack_values), so their text goes out of band too and the pickle header only
+    holds the frame layout and values of other types.
+    """
+    obj = _pack(obj)
+    buffers = []
+    header = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [b.raw() for b in buffers]
+    sizes = tuple(r.nbytes for r in raws)
+    if not sum(sizes):
+        header = pickle.dumps(obj, protocol=5)
+        return SharedResult(None, header, ())
+    shm = shared_memory.SharedMemory(name=name, create=True, size=sum(sizes))
+    try:
+        offset = 0
+        for r in raws:
+            shm.buf[offset : offset + r.nbytes] = r
+            offset += r.nbytes
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return SharedResult(name, header, sizes)
+
+
+def load(result: SharedResult):
+    """
+    Rebuilds the object of a SharedResult and removes its segment.
+
+    Array data is copied once out of the segment (a plain memory copy, no
+    unpickling), so the segment can be unlinked right away.
+    """
+    if result.name is None:
+        return _unpack(pickle.loads(result.header))
+    shm = shared_memory.SharedMemory(name=result.name)
+    try:
+        buffers = []
+        offset = 0
+        for n in result.sizes:
+            buffers.append(bytearray(shm.buf[offset : offset + n]))
+            offset += n
+        return _unpack(pickle.loads(result.header, buffers=buffers))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def discard(name: str) -> None:
+    """Removes segment ``name`` if a worker created it (e.g. before crashing)."""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _parse(path: str, parameters: dict, name: str) -> SharedResult:
+    """Worker side: parses one workbook and exports its sheets to shared memory."""
+    from utils.read_data import read_data
+
+    return export(read_data(parameters).read_one_excel(path, name=path), name)
+
+
+class ParseTask:
+    """A workbook being parsed in the pool; result() returns (sheet names, DataFrames)."""
+
+    def __init__(self, pool: "ParsePool", executor, path: str, future: Future, name: str):
+        self.pool = pool
+        self.executor = executor
+        self.path = path
+        self.future = future
+        self.name = name
+        self.done = False
+
+    def result(self):
+        self.done = True
+        try:
+            shared = self.future.result()
+        except BrokenProcessPool:
+            discard(self.name)
+            self.pool.reset(self.executor)
+            raise
+        except BaseException:
+            discard(self.name)
+            raise
+        return load(shared)
+
+    def release(self) -> None:
+        """Drops a result that was never asked for (e.g. a duplicate served from cache)."""
+        if self.done:
+            return
+        self.done = True
+        if not self.future.cancel():
+            with contextlib.suppress(BaseException):
+                self.future.result()
+        discard(self.name)
+
+
+class ParsePool:
+    """
+    Process pool that parses workbooks (read_data.read_one_excel) in parallel.
+
+    Workers return DataFrames through shared memory: the block data, text
+    included (see export), is written once into a segment named after this process and the task, and only
+    a small pickle header travels through the pipe. The parent copies the data
+    out and unlinks the segment. Segment names are chosen by the parent, so the
+    segment of a task whose worker crashed is still removed; a crashed pool is
+    replaced on the next submit.
+
+    Workbooks of the next folder can be started with prefetch() while the current
+    folder finishes; submit() then returns the task already under way.
+    """
+
+    def __init__(self, workers):
+        """
+        Args:
+            workers: Number of worker processes, or "auto" to size the pool with
+                     autosize() before its first use
+        """
+        self.auto = workers == "auto"
+        self.workers = 1 if self.auto else max(int(workers), 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._prefetched: dict[str, tuple[dict, ParseTask]] = {}
+        self._lock = threading.Lock()
+        # Tasks started so far, to tell which stages used the pool
+        self.submitted = 0
+
+    def autosize(self, workers: int) -> None:
+        """Sets the worker count of an "auto" pool that has not started yet."""
+        with self._lock:
+            if self.auto and self._executor is None:
+                self.workers = max(int(workers), 1)
+                self.auto = False
+
+    def submit(self, path: str, parameters: dict) -> ParseTask:
+        """
+        Starts parsing ``path`` (or returns its prefetched task).
+
+        Args:
+            path: Workbook path
+            parameters: read_data parameters relevant to parsing (read_all_sheets, sheet_names)
+        """
+        with self._lock:
+            params, task = self._prefetched.pop(str(path), (None, None))
+        if task is not None:
+            if params == parameters:
+                return task
+            task.release()
+        with self._lock:
+            if self._executor is None:
+                if os.name == "posix":
+                    # Workers must share this process's tracker, so a segment
+                    # registered by a worker is released by the parent's unlink
+                    resource_tracker.ensure_running()
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            executor = self._executor
+            name = f"{SEGMENT_PREFIX}_{os.getpid()}_{next(_task_ids)}"
+            future = executor.submit(_parse, str(path), parameters, name)
+            self.submitted += 1
+        return ParseTask(self, executor, str(path), future, name)
+
+    def prefetch(self, path: str, parameters: dict) -> None:
+        """Starts parsing ``path`` ahead of the submit() that will ask for it."""
+        if str(path) not in self._prefetched:
+            task = self.submit(path, parameters)
+            with self._lock:
+                self._prefetched[str(path)] = (parameters, task)
+
+    def cancel(self, paths: Iterable[str]) -> None:
+        """Drops prefetched tasks of ``paths`` (e.g. a folder skipped on resume)."""
+        for path in paths:
+            with self._lock:
+                _, task = self._prefetched.pop(str(path), (None, None))
+            if task is not None:
+                task.release()
+
+    def reset(self, executor: ProcessPoolExecutor) -> None:
+        """Replaces ``executor`` after a worker died; the next submit starts a new one."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # already replaced for another task of the same pool
+            self._executor = None
+        if executor is not None:
+            logging.warning("⚠️  A parse worker died; starting a new worker pool")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        self.cancel(list(self._prefetched))
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)